@@ -1,8 +1,15 @@
-from datetime import datetime, timedelta
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+from cache import TTLCache
 
 # パスワードハッシュ化の設定
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -20,6 +27,94 @@ def get_password_hash(password: str) -> str:
     """パスワードをハッシュ化"""
     return pwd_context.hash(password)
 
+
+# パスワードハッシュ用ワーカープールの設定
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))        # 同時に計算するハッシュ数
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))   # 待機できる最大件数
+
+
+class PasswordHasher:
+    """
+    bcryptの計算を専用スレッドプールで実行する
+
+    bcryptはGILを解放して計算するため、イベントループを止めずに並列で処理できる。
+    実行中＋待機中の件数が上限に達した場合は503を返して過負荷を防ぐ。
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._in_flight = 0  # イベントループ上でのみ更新
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._hash_total = 0.0
+        self._hash_max = 0.0
+
+    async def hash(self, password: str) -> str:
+        """パスワードをハッシュ化（ワーカープールで実行）"""
+        return await self._submit(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """パスワードを検証（ワーカープールで実行）"""
+        return await self._submit(pwd_context.verify, plain_password, hashed_password)
+
+    async def _submit(self, func, *args):
+        if self._in_flight >= self.max_workers + self.max_queue:
+            with self._lock:
+                self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="認証処理が混み合っています。しばらくしてから再度お試しください",
+                headers={"Retry-After": "1"},
+            )
+
+        submitted_at = time.perf_counter()
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, submitted_at, func, *args)
+        finally:
+            self._in_flight -= 1
+
+    def _timed(self, submitted_at: float, func, *args):
+        started_at = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished_at = time.perf_counter()
+            wait = started_at - submitted_at
+            elapsed = finished_at - started_at
+            with self._lock:
+                self._completed += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._hash_total += elapsed
+                self._hash_max = max(self._hash_max, elapsed)
+
+    def metrics(self) -> dict:
+        """キュー待ち時間・ハッシュ計算時間などの統計"""
+        with self._lock:
+            completed = self._completed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.max_workers),
+                "completed": completed,
+                "rejected": self._rejected,
+                "queue_wait_avg_ms": round(self._wait_total / completed * 1000, 1) if completed else 0,
+                "queue_wait_max_ms": round(self._wait_max * 1000, 1),
+                "hash_time_avg_ms": round(self._hash_total / completed * 1000, 1) if completed else 0,
+                "hash_time_max_ms": round(self._hash_max * 1000, 1),
+            }
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """JWTアクセストークンを作成"""
     to_encode = data.copy()
@@ -32,8 +127,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
-    """JWTトークンを検証"""
+def create_user_access_token(user) -> str:
+    """ユーザーID・データバージョンを含むアクセストークンを作成"""
+    return create_access_token(data={"sub": user.email, "uid": user.id, "ver": user.data_version})
+
+def verify_token_claims(token: str) -> dict:
+    """JWTトークンを検証してクレームを返す（sub: メールアドレス, uid: ユーザーID, ver: データバージョン）"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -43,10 +142,80 @@ def verify_token(token: str):
                 detail="無効なトークンです",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return email
+        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="無効なトークンです",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+
+def verify_token(token: str):
+    """JWTトークンを検証"""
+    return verify_token_claims(token)["sub"]
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """認証済みユーザーの読み取り専用スナップショット（リクエスト間でキャッシュする）"""
+    id: int
+    email: str
+    username: Optional[str]
+    birth_date: Optional[date]
+    gender: Optional[str]
+    created_at: datetime
+    data_version: int
+    timezone: str
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            birth_date=user.birth_date,
+            gender=user.gender,
+            created_at=user.created_at,
+            data_version=user.data_version,
+            timezone=user.timezone,
+        )
+
+
+# 検証済みユーザーのキャッシュ（ユーザーID → UserSnapshot）
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_ENTRIES, ttl_seconds=USER_CACHE_TTL_SECONDS)
+
+# 読み込み中にユーザー情報が変更された場合に古いスナップショットをキャッシュしないための世代番号
+_user_generations: dict = {}
+_user_generations_lock = threading.Lock()
+
+
+def cached_user(claims: dict) -> Optional[UserSnapshot]:
+    """トークンのクレームに一致するキャッシュ済みユーザーを返す（古いバージョンは使わない）"""
+    user_id = claims.get("uid")
+    if user_id is None:
+        return None
+    snapshot = user_cache.get(user_id)
+    if snapshot is None or snapshot.email != claims["sub"] or snapshot.data_version < claims.get("ver", 0):
+        return None
+    return snapshot
+
+def user_generation(user_id: int) -> int:
+    """ユーザーを読み込む前に取得し、cache_user に渡す世代番号"""
+    with _user_generations_lock:
+        return _user_generations.get(user_id, 0)
+
+def cache_user(user, generation: Optional[int]) -> UserSnapshot:
+    """ユーザーのスナップショットを作成し、読み込み後に変更がなければキャッシュする（世代番号がなければしない）"""
+    snapshot = UserSnapshot.from_user(user)
+    with _user_generations_lock:
+        if generation is not None and _user_generations.get(snapshot.id, 0) == generation:
+            user_cache.set(snapshot.id, snapshot)
+    return snapshot
+
+def invalidate_cached_user(user_id: int) -> None:
+    """ユーザー情報の変更（コミット）後に呼び、キャッシュを破棄する"""
+    with _user_generations_lock:
+        _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+        user_cache.pop(user_id)
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""
+パフォーマンス計測スクリプト群
+
+backend ディレクトリから `python -m benchmarks.<name>` で実行する。
+"""
@@ -0,0 +1,108 @@
+"""
+BMI履歴のベンチマーク（長期間の全件返却と、件数上限・集約・間引きの比較）
+
+    cd backend
+    python -m benchmarks.bmi_history [--years 10] [--per-day 1] [--iterations 10]
+
+--years 年分の体重記録（1日 --per-day 件）を持つユーザーについて、全期間の BMI 履歴を
+  - 従来方式: 期間内の記録を全件読み込み、1件ずつBMIを計算して全件返す
+  - 件数上限: GET /analytics/body/bmi-history（新しい方から limit 件と next_cursor）
+  - 週単位: bucket=week（週ごとの平均体重）
+  - 間引き: max_points=200（LTTB）
+で取得し、レイテンシとレスポンスのサイズを比較する。スナップショットのキャッシュがない場合（初回）も測る。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from benchmarks.common import asgi_request, format_latencies, seed_body_metrics
+
+
+async def _legacy_history(db, models, user_id: int, days: int):
+    """従来の実装（期間内の記録を全件読み込んで全件返す）"""
+    height_cm = await db.scalar(select(models.HeightRecord.height_cm).where(
+        models.HeightRecord.user_id == user_id
+    ).order_by(models.HeightRecord.date.desc()).limit(1))
+    metrics = (await db.scalars(select(models.BodyMetric).where(
+        models.BodyMetric.user_id == user_id,
+        models.BodyMetric.date >= datetime.now() - timedelta(days=days),
+        models.BodyMetric.body_weight.isnot(None)
+    ).order_by(models.BodyMetric.date.desc()))).all()
+    return [
+        {"date": metric.date.isoformat(), "weight": metric.body_weight,
+         "bmi": round(metric.body_weight / ((height_cm / 100) ** 2), 1), "note": metric.note}
+        for metric in metrics
+    ]
+
+
+async def _measure(label: str, compute, iterations: int):
+    samples = []
+    result = None
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        result = await compute()
+        samples.append(time.perf_counter() - t0)
+    size = len(json.dumps(result, default=str).encode())
+    print(format_latencies(label, samples) + f" size={size / 1024:8.1f}KiB")
+    return result
+
+
+async def _run(args, db_path: str):
+    import body_snapshot
+    import main
+    import models
+    from database import AsyncSessionLocal
+
+    status, _, data = await asgi_request(main.app, "POST", "/auth/signup",
+                                         body={"email": "bmi@example.com", "password": "benchmark-pass"})
+    if status != 200:
+        raise RuntimeError(f"signup failed: {status} {data}")
+    user_id, token = data["user"]["id"], data["access_token"]
+    days = args.years * 365
+    records = seed_body_metrics(db_path, user_id, days=days, per_day=args.per_day)
+    print(f"{args.years}年分の体重記録: {records} 件")
+
+    async def legacy():
+        async with AsyncSessionLocal() as db:
+            return await _legacy_history(db, models, user_id, days + 1)
+
+    def endpoint(query: str, cold: bool = False):
+        async def call():
+            if cold:
+                body_snapshot.invalidate_body_snapshot(user_id)
+            _, _, body = await asgi_request(
+                main.app, "GET", f"/analytics/body/bmi-history?days={days + 1}{query}", token)
+            return body
+        return call
+
+    legacy_rows = await _measure("従来方式（全件）", legacy, args.iterations)
+    await _measure("件数上限（初回、キャッシュなし）", endpoint("", cold=True), args.iterations)
+    page = await _measure("件数上限（limit=500）", endpoint(""), args.iterations)
+    weekly = await _measure("週単位（bucket=week）", endpoint("&bucket=week"), args.iterations)
+    sampled = await _measure("間引き（max_points=200）", endpoint("&max_points=200"), args.iterations)
+    print(f"全件: {len(legacy_rows)} 件 / 1ページ: {len(page['history'])} 件 / 週: {len(weekly['history'])} 点 / "
+          f"間引き: {len(sampled['history'])} 点（対象 {sampled['total_records']} 件）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--per-day", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="myfit-bmi-")
+    db_path = os.path.join(workdir, "bmi.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+    asyncio.run(_run(args, db_path))
+
+
+if __name__ == "__main__":
+    main()
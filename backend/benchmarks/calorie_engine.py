@@ -0,0 +1,138 @@
+"""
+消費カロリー計算ベンチマーク（ワークアウトごとの計算とバッチ計算の比較）
+
+    cd backend
+    python -m benchmarks.calorie_engine [--years 2] [--iterations 5]
+
+--years 年分の合成履歴を持つユーザーについて、今週分と全期間の消費カロリーを
+  - 従来方式: ワークアウトごとにセットを取得し、セットごとにMETs値を解決（1 + ワークアウト数 クエリ）
+  - バッチ計算: calories.calculate_calories（1クエリ、METs値は種目IDでキャッシュから取得）
+  - 台帳: calorie_ledger.get_ledger（完了時に保存した workout_calories を読むだけ、ダッシュボードの現行方式）
+で計算し、クエリ数・レイテンシと結果の一致を表示する。最後にワークアウト別内訳の例を表示する。
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from benchmarks.common import asgi_request, format_latencies, rebuild_read_models, seed_training_history
+
+BODY_WEIGHT = 70.0
+
+
+async def _legacy_calories(db, models, calories, user_id: int, date_from=None) -> float:
+    """従来の実装（ワークアウトごとのクエリ、セットごとの種目名照合によるMETs解決と辞書の再構築）"""
+    from comprehensive_seed_data import BUILTIN_EXERCISE_METS
+    from mets_registry import DEFAULT_METS, DEFAULT_METS_BY_TYPE
+
+    conditions = [models.Workout.user_id == user_id, models.Workout.is_completed == True]
+    if date_from is not None:
+        conditions.append(models.Workout.date >= date_from)
+    workouts = (await db.scalars(select(models.Workout).where(*conditions))).all()
+
+    total = 0.0
+    for workout in workouts:
+        builtin_mets = dict(BUILTIN_EXERCISE_METS)  # 呼び出しごとに辞書を作り直していた
+        sets = (await db.execute(
+            select(models.Set, models.Exercise).select_from(models.Set)
+            .join(models.WorkoutExercise).join(models.Exercise).where(
+                models.WorkoutExercise.workout_id == workout.id,
+                models.Set.is_warmup == False
+            )
+        )).all()
+        for set_data, exercise in sets:
+            if exercise.custom_mets_value and exercise.custom_mets_value > 0:
+                mets = exercise.custom_mets_value
+            elif exercise.is_builtin and exercise.name in builtin_mets:
+                mets = builtin_mets[exercise.name]
+            else:
+                mets = DEFAULT_METS_BY_TYPE.get(exercise.exercise_type, DEFAULT_METS)
+            total += calories.set_calories(exercise.exercise_type, mets, set_data.duration_seconds,
+                                           set_data.avg_heart_rate, BODY_WEIGHT)
+    return total
+
+
+async def _batched_calories(db, calories, user_id: int, date_from=None) -> float:
+    results = await calories.calculate_calories(db, BODY_WEIGHT, user_id=user_id, date_from=date_from)
+    return calories.total_calories(results)
+
+
+async def _ledger_calories(db, calorie_ledger, user_id: int, date_from=None) -> float:
+    return calorie_ledger.total_calories(await calorie_ledger.get_ledger(db, user_id, date_from=date_from))
+
+
+async def _measure(label, session_factory, compute, iterations: int):
+    from query_metrics import capture_queries
+
+    samples = []
+    result = None
+    for _ in range(iterations):
+        async with session_factory() as db:
+            with capture_queries() as stats:
+                t0 = time.perf_counter()
+                result = await compute(db)
+                samples.append(time.perf_counter() - t0)
+    print(format_latencies(label, samples) + f" queries={stats.count}")
+    return result
+
+
+async def _run(args, db_path: str):
+    import calorie_ledger
+    import calories
+    import main
+    import models
+    from database import AsyncSessionLocal
+
+    status, _, data = await asgi_request(main.app, "POST", "/auth/signup",
+                                         body={"email": "calories@example.com", "password": "benchmark-pass"})
+    if status != 200:
+        raise RuntimeError(f"signup failed: {status} {data}")
+    user_id = data["user"]["id"]
+    workouts = seed_training_history(db_path, user_id, days=args.years * 365)
+    # 体重は一定（台帳の結果を他の方式と比較できるように）
+    status, _, data = await asgi_request(main.app, "POST", "/body-metrics", data["access_token"],
+                                         body={"date": "2000-01-01T00:00:00", "body_weight": BODY_WEIGHT})
+    if status != 200:
+        raise RuntimeError(f"body metric failed: {status} {data}")
+    await rebuild_read_models()
+    print(f"{args.years}年分の履歴: 完了済みワークアウト {workouts} 件")
+
+    today = datetime.now().date()
+    week_start = today - timedelta(days=today.weekday())
+    for period, date_from in (("今週", week_start), ("全期間", None)):
+        legacy = await _measure(f"従来方式（{period}）", AsyncSessionLocal,
+                                lambda db: _legacy_calories(db, models, calories, user_id, date_from), args.iterations)
+        batched = await _measure(f"バッチ計算（{period}）", AsyncSessionLocal,
+                                 lambda db: _batched_calories(db, calories, user_id, date_from), args.iterations)
+        ledger = await _measure(f"台帳（{period}）", AsyncSessionLocal,
+                                lambda db: _ledger_calories(db, calorie_ledger, user_id, date_from), args.iterations)
+        matches = abs(legacy - batched) < 1e-6 and abs(batched - ledger) < 1e-6
+        print(f"  結果の一致: {matches} ({round(batched, 1)} kcal)")
+
+    async with AsyncSessionLocal() as db:
+        results = await calories.calculate_calories(db, BODY_WEIGHT, user_id=user_id)
+    print("ワークアウト別内訳（直近3件）:")
+    for workout in sorted(results.values(), key=lambda w: w.date, reverse=True)[:3]:
+        split = ", ".join(f"種目{exercise_id}={kcal:.1f}" for exercise_id, kcal in workout.by_exercise.items())
+        print(f"  {workout.date:%Y-%m-%d} workout {workout.workout_id}: {workout.total:.1f} kcal ({split})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="myfit-calories-")
+    db_path = os.path.join(workdir, "calories.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+    asyncio.run(_run(args, db_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+ベンチマーク共通ユーティリティ
+
+- 一時ディレクトリでuvicornを起動（./myfit.db はそのディレクトリに作成される）
+- 標準ライブラリのみでHTTPリクエストを送信
+- サーバーを起動せずプロセス内でASGIアプリを直接呼び出す（SQLの記録・検査用）
+- sqlite3で大量の合成トレーニング履歴を直接投入
+"""
+
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+from local_time import iso_week_key
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def running_server(env: dict = None):
+    """一時ディレクトリをカレントにしてAPIサーバーを起動し、(base_url, workdir) を返す"""
+    workdir = tempfile.mkdtemp(prefix="myfit-bench-")
+    port = _free_port()
+    server_env = dict(os.environ)
+    server_env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + server_env.get("PYTHONPATH", "")
+    server_env.update(env or {})
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=server_env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(200):
+            try:
+                request_json("GET", base_url + "/health")
+                break
+            except OSError:
+                time.sleep(0.05)
+        else:
+            raise RuntimeError("サーバーが起動しませんでした")
+        yield base_url, workdir
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def request_json(method: str, url: str, token: str = None, body: dict = None, timeout: float = 60):
+    """JSONリクエストを送信し (status, data) を返す"""
+    data = json.dumps(body).encode() if body is not None else None
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, _decode(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, _decode(e.read())
+
+
+def _decode(payload: bytes):
+    if not payload:
+        return None
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return payload.decode(errors="replace")
+
+
+async def asgi_request(app, method: str, path: str, token: str = None, body: dict = None, headers: dict = None):
+    """ASGIアプリをプロセス内で呼び出し (status, response_headers, data) を返す"""
+    path, _, query = path.partition("?")
+    payload = json.dumps(body).encode() if body is not None else b""
+    request_headers = {"content-type": "application/json", **(headers or {})}
+    if token:
+        request_headers["authorization"] = f"Bearer {token}"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(k.lower().encode(), str(v).encode()) for k, v in request_headers.items()],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    sent = False
+    response = {"status": None, "headers": {}, "body": b""}
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode().lower(): v.decode() for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["headers"], _decode(response["body"])
+
+
+async def rebuild_read_models():
+    """sqlite3で直接投入した履歴をユーザー統計（user_stats）・消費カロリー台帳・自己ベスト・トレーニング集計・
+    体重のトレンドに反映する"""
+    import body_trends
+    import calorie_ledger
+    import models
+    import personal_records
+    import training_rollups
+    import user_stats
+    from database import AsyncSessionLocal
+    from sqlalchemy import select
+
+    async with AsyncSessionLocal() as db:
+        for user_id in (await db.scalars(select(models.User.id))).all():
+            await user_stats.rebuild_user_stats(db, user_id)
+            await calorie_ledger.rebuild_ledger(db, user_id)
+            await personal_records.recompute_exercise_records(db, user_id)
+            await training_rollups.rebuild_rollups(db, user_id)
+            await body_trends.refresh_body_trends(db, user_id)
+        await db.commit()
+
+
+async def exercise_all_endpoints(app, db_path: str, around=None):
+    """
+    合成データを投入したうえで全エンドポイントを一通りプロセス内で呼び出す
+
+    around にはルート名（"GET /workouts/{workout_id}" など）を受け取るコンテキストマネージャーの
+    ファクトリを渡せる。各リクエストはその中で実行される（クエリ数の計測など）。
+    """
+
+    async def call(method, path, token=None, body=None, expected=(200, 204), route=None, headers=None):
+        with around(f"{method} {route or path}") if around else nullcontext():
+            status, response_headers, data = await asgi_request(app, method, path, token, body, headers)
+        if status not in expected:
+            raise RuntimeError(f"{method} {path} -> {status} {data}")
+        return data if headers is None else response_headers
+
+    data = await call("POST", "/auth/signup", body={"email": "plans@example.com", "password": "plans-pass"})
+    token, user_id = data["access_token"], data["user"]["id"]
+    await call("POST", "/auth/login", body={"email": "plans@example.com", "password": "plans-pass"})
+
+    # 他ユーザーのデータも混ぜて、user_id での絞り込みが効いているかを見る
+    other = await call("POST", "/auth/signup", body={"email": "other@example.com", "password": "plans-pass"})
+    seed_training_history(db_path, other["user"]["id"], days=120)
+    seed_training_history(db_path, user_id, days=120)
+    seed_body_metrics(db_path, user_id, days=120)
+    await rebuild_read_models()
+
+    now = datetime.now().replace(microsecond=0)
+    exercise = await call("POST", "/exercises", token, {"name": "インクラインベンチプレス", "muscle_group": "胸"})
+    cardio = await call("POST", "/exercises", token,
+                        {"name": "ランニング", "muscle_group": "有酸素運動", "exercise_type": "cardio"})
+    exercises = await call("GET", "/exercises", token)
+    await call("GET", f"/exercises/{exercise['id']}", token, route="/exercises/{exercise_id}")
+
+    metric = await call("POST", "/body-metrics", token,
+                        {"date": now.isoformat(), "body_weight": 72.5, "body_fat_percent": 16})
+    await call("PUT", f"/body-metrics/{metric['id']}", token, {"body_weight": 72.0},
+               route="/body-metrics/{metric_id}")
+    await call("POST", "/height-records", token, {"height_cm": 172, "date": (now - timedelta(days=1)).isoformat()})
+    page = await call("GET", "/body-metrics?limit=10", token, route="/body-metrics")
+    await call("GET", f"/body-metrics?limit=10&cursor={page['next_cursor']}", token, route="/body-metrics")
+    await call("GET", "/height-records", token)
+    await call("PUT", "/profile", token, {"username": "plans", "birth_date": "1990-01-01", "gender": "male",
+                                            "timezone": "Asia/Tokyo"})
+    await call("GET", "/profile", token)
+
+    workout = await call("POST", "/workouts", token, {"date": now.isoformat()})
+    strength = await call("POST", f"/workouts/{workout['id']}/exercises", token,
+                          {"exercise_id": exercise["id"], "order_index": 0, "selected_angle": "インクライン"},
+                          route="/workouts/{workout_id}/exercises")
+    running = await call("POST", f"/workouts/{workout['id']}/exercises", token,
+                         {"exercise_id": cardio["id"], "order_index": 1}, route="/workouts/{workout_id}/exercises")
+    sets_route = "/workout-exercises/{workout_exercise_id}/sets"
+    first_set = await call("POST", f"/workout-exercises/{strength['id']}/sets", token, {"weight": 80, "reps": 8},
+                           route=sets_route)
+    await call("POST", f"/workout-exercises/{strength['id']}/sets", token, {"weight": 85, "reps": 6},
+               route=sets_route)
+    await call("POST", f"/workout-exercises/{running['id']}/sets", token,
+               {"duration_seconds": 1800, "avg_heart_rate": 150}, route=sets_route)
+    await call("GET", f"/workout-exercises/{strength['id']}/sets", token, route=sets_route)
+    await call("GET", f"/workouts/{workout['id']}/exercises", token, route="/workouts/{workout_id}/exercises")
+    await call("PATCH", f"/workouts/{workout['id']}/complete", token, route="/workouts/{workout_id}/complete")
+    # 一括更新（完了済みのワークアウトへの種目・セットの追加、記録を持つセットの更新・削除、並べ替え）
+    batch = await call("POST", f"/workouts/{workout['id']}/batch", token, {"operations": [
+        {"op": "add_exercise", "ref": "extra", "exercise_id": exercise["id"], "selected_grip": "ワイド"},
+        *({"op": "add_set", "ref": f"set{i}", "workout_exercise_ref": "extra", "weight": 60 + i * 5, "reps": 10 - i}
+          for i in range(10)),
+        {"op": "add_set", "workout_exercise_id": strength["id"], "weight": 90, "reps": 5},
+        {"op": "update_set", "set_id": first_set["id"], "weight": 82.5},
+        {"op": "update_set", "set_ref": "set9", "reps": 3},
+        {"op": "delete_set", "set_ref": "set8"},
+        {"op": "reorder", "workout_exercises": [running["id"], "extra", strength["id"]]},
+    ]}, route="/workouts/{workout_id}/batch")
+    await call("PUT", f"/sets/{batch['refs']['set0']}", token, {"weight": 100}, route="/sets/{set_id}")
+
+    await call("GET", f"/workouts/calendar?month={now:%Y-%m}", token, route="/workouts/calendar")
+    await call("GET", f"/workouts/calendar?year={now.year}", token, route="/workouts/calendar")
+    page = await call("GET", "/workouts?limit=10", token, route="/workouts")
+    await call("GET", f"/workouts?limit=10&cursor={page['next_cursor']}", token, route="/workouts")
+    await call("GET", f"/workouts?from_date={(now - timedelta(days=30)).date()}&to_date={now.date()}"
+               "&include_completed=false&unbounded=true", token, route="/workouts")
+    await call("GET", "/workouts/recent", token)
+    await call("GET", f"/workouts/{workout['id']}", token, route="/workouts/{workout_id}")
+    await call("GET", f"/analytics/exercise/{exercise['id']}/1rm", token,
+               route="/analytics/exercise/{exercise_id}/1rm")
+    # 履歴のある種目で、2ページ目と月単位（Lombardi式）も確認する
+    seeded = next(e for e in exercises if e["exercise_type"] == "strength" and e["id"] != exercise["id"])
+    page = await call("GET", f"/analytics/exercise/{seeded['id']}/1rm?limit=10", token,
+                      route="/analytics/exercise/{exercise_id}/1rm")
+    await call("GET", f"/analytics/exercise/{seeded['id']}/1rm?limit=10&cursor={page['next_cursor']}", token,
+               route="/analytics/exercise/{exercise_id}/1rm")
+    await call("GET", f"/analytics/exercise/{seeded['id']}/1rm?bucket=month&formula=lombardi", token,
+               route="/analytics/exercise/{exercise_id}/1rm")
+    await call("GET", "/analytics/prs", token)
+    await call("GET", f"/analytics/workout/{workout['id']}/volume", token,
+               route="/analytics/workout/{workout_id}/volume")
+    await call("GET", "/analytics/volume?start_date=2000-01-01", token, route="/analytics/volume")
+    await call("GET", "/analytics/timeseries", token)
+    await call("GET", f"/analytics/timeseries?group_by=muscle_group&muscle_group={quote(seeded['muscle_group'])}"
+               "&start_date=2000-01-01", token, route="/analytics/timeseries")
+    await call("GET", "/analytics/timeseries?granularity=month&group_by=exercise", token,
+               route="/analytics/timeseries")
+    await call("GET", "/analytics/user/summary", token)
+    await call("GET", "/analytics/body/summary", token)
+    await call("GET", "/analytics/body/bmi-history", token)
+    await call("GET", "/analytics/body/bmi-history?days=365&bucket=week&max_points=20", token,
+               route="/analytics/body/bmi-history")
+    await call("GET", "/analytics/body/advanced-summary", token)
+    # 条件付きGET: 変更がなければ ETag の一致で 304 を返す
+    stats_headers = await call("GET", "/dashboard/stats", token, headers={})
+    await call("GET", "/dashboard/stats", token, expected=(304,), headers={"if-none-match": stats_headers["etag"]})
+    await call("GET", "/dashboard/calorie-goal", token)
+    await call("GET", "/analytics/calories", token)
+    await call("GET", "/auth/me", token)
+    await call("GET", "/settings", token)
+    await call("PUT", "/settings/dashboard", token, {"selectedWidgets": ["weekly_volume"]})
+
+    await call("DELETE", f"/sets/{first_set['id']}", token, route="/sets/{set_id}")
+    await call("DELETE", f"/workout-exercises/{running['id']}", token,
+               route="/workout-exercises/{workout_exercise_id}")
+
+    # 同期: 最初から少しずつ（ページング）と、最後のバージョンからの差分
+    page = await call("GET", "/sync?limit=5", token, route="/sync")
+    await call("GET", f"/sync?since={page['version']}", token, route="/sync")
+
+
+def signup(base_url: str, email: str, password: str = "benchmark-pass"):
+    """ユーザーを作成し (user_id, token) を返す"""
+    status, data = request_json("POST", base_url + "/auth/signup", body={"email": email, "password": password})
+    if status != 200:
+        raise RuntimeError(f"signup failed: {status} {data}")
+    return data["user"]["id"], data["access_token"]
+
+
+def percentile(values: list, pct: float) -> float:
+    """最近傍法によるパーセンタイル"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def format_latencies(label: str, samples: list) -> str:
+    """秒単位のサンプルをミリ秒のサマリ文字列にする"""
+    ms = [s * 1000 for s in samples]
+    return (
+        f"{label:<32} n={len(ms):<5} "
+        f"p50={percentile(ms, 50):8.1f}ms p95={percentile(ms, 95):8.1f}ms "
+        f"p99={percentile(ms, 99):8.1f}ms max={max(ms) if ms else 0:8.1f}ms"
+    )
+
+
+def seed_training_history(
+    db_path: str,
+    user_id: int,
+    days: int,
+    workouts_per_week: int = 4,
+    exercises_per_workout: int = 4,
+    sets_per_exercise: int = 4,
+    seed: int = 42,
+):
+    """
+    指定ユーザーに合成トレーニング履歴を投入する
+
+    内蔵種目がなければカスタム種目を作成して使う。完了済みワークアウト数を返す。
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        cur = conn.cursor()
+        exercise_ids = [row[0] for row in cur.execute(
+            "SELECT id FROM exercises WHERE exercise_type = 'strength' AND (is_builtin = 1 OR user_id = ?)",
+            (user_id,),
+        )]
+        if not exercise_ids:
+            for name, group in [("ベンチプレス", "胸"), ("スクワット", "脚"), ("デッドリフト", "背中"),
+                                ("ショルダープレス", "肩"), ("バーベルカール", "腕"), ("ラットプルダウン", "背中")]:
+                cur.execute(
+                    "INSERT INTO exercises (user_id, name, muscle_group, exercise_type, is_builtin) "
+                    "VALUES (?, ?, ?, 'strength', 0)",
+                    (user_id, name, group),
+                )
+                exercise_ids.append(cur.lastrowid)
+
+        start = datetime.now() - timedelta(days=days)
+        workout_count = 0
+        for day in range(days):
+            if rng.random() > workouts_per_week / 7:
+                continue
+            workout_date = (start + timedelta(days=day)).replace(hour=18, minute=0, second=0, microsecond=0)
+            cur.execute(
+                "INSERT INTO workouts (user_id, date, local_date, local_week, note, is_completed, completed_at) "
+                "VALUES (?, ?, ?, ?, NULL, 1, ?)",
+                (user_id, workout_date.isoformat(" "), workout_date.date().isoformat(),
+                 iso_week_key(workout_date.date()), (workout_date + timedelta(hours=1)).isoformat(" ")),
+            )
+            workout_id = cur.lastrowid
+            workout_count += 1
+            for order_index, exercise_id in enumerate(rng.sample(exercise_ids, min(exercises_per_workout, len(exercise_ids)))):
+                cur.execute(
+                    "INSERT INTO workout_exercises (workout_id, exercise_id, order_index) VALUES (?, ?, ?)",
+                    (workout_id, exercise_id, order_index),
+                )
+                workout_exercise_id = cur.lastrowid
+                base_weight = rng.choice([40, 60, 80, 100])
+                cur.executemany(
+                    "INSERT INTO sets (workout_exercise_id, set_index, weight, reps, rpe, is_warmup) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (workout_exercise_id, i + 1, base_weight + rng.choice([-5, 0, 5]),
+                         rng.randint(5, 12), rng.randint(6, 9), 1 if i == 0 else 0)
+                        for i in range(sets_per_exercise)
+                    ],
+                )
+        conn.commit()
+        return workout_count
+    finally:
+        conn.close()
+
+
+def seed_body_metrics(db_path: str, user_id: int, days: int, per_day: int = 1, seed: int = 7):
+    """体重記録と身長記録を投入する"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        cur = conn.cursor()
+        start = datetime.now() - timedelta(days=days)
+        cur.execute(
+            "INSERT INTO height_records (user_id, height_cm, date, local_date) VALUES (?, ?, ?, ?)",
+            (user_id, 172.0, start.isoformat(" "), start.date().isoformat()),
+        )
+        weight = 75.0
+        rows = []
+        for day in range(days):
+            for slot in range(per_day):
+                weight += rng.uniform(-0.3, 0.3)
+                when = start + timedelta(days=day, hours=7 + slot * (16 // max(per_day, 1)))
+                rows.append((user_id, when.isoformat(" "), when.date().isoformat(),
+                             round(weight, 1), round(rng.uniform(14, 20), 1)))
+        cur.executemany(
+            "INSERT INTO body_metrics (user_id, date, local_date, body_weight, body_fat_percent) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+        return len(rows)
+    finally:
+        conn.close()
@@ -0,0 +1,94 @@
+"""
+並行負荷ベンチマーク: /dashboard/stats を叩き続けている間のセット記録レイテンシ
+
+    cd backend
+    python -m benchmarks.concurrency [--days 1500] [--hammer-threads 8] [--samples 200]
+
+長い履歴を持つユーザーで GET /dashboard/stats を複数スレッドから連続で呼び出しつつ、
+別ユーザーの POST /workout-exercises/{id}/sets のレイテンシ（p50/p95/p99）を計測する。
+同じ計測を負荷なしでも行い、イベントループのブロッキングの影響を比較する。
+"""
+
+import argparse
+import os
+import threading
+import time
+
+from benchmarks.common import (
+    format_latencies,
+    request_json,
+    running_server,
+    seed_training_history,
+    signup,
+)
+
+
+def _prepare_logger(base_url: str):
+    """セット記録用ユーザーとワークアウト種目を作成"""
+    _, token = signup(base_url, "logger@example.com")
+    _, exercise = request_json("POST", base_url + "/exercises", token,
+                               {"name": "ベンチ計測用", "muscle_group": "胸", "exercise_type": "strength"})
+    _, workout = request_json("POST", base_url + "/workouts", token, {"date": "2025-01-01T10:00:00"})
+    _, workout_exercise = request_json("POST", f"{base_url}/workouts/{workout['id']}/exercises", token,
+                                       {"exercise_id": exercise["id"], "order_index": 0})
+    return token, workout_exercise["id"]
+
+
+def _measure_set_logging(base_url: str, token: str, workout_exercise_id: int, samples: int) -> list:
+    latencies = []
+    url = f"{base_url}/workout-exercises/{workout_exercise_id}/sets"
+    for i in range(samples):
+        started = time.perf_counter()
+        status, _ = request_json("POST", url, token, {"weight": 60 + i % 10, "reps": 8})
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            raise RuntimeError(f"add_set failed: {status}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=1500, help="ダッシュボード対象ユーザーの履歴日数")
+    parser.add_argument("--hammer-threads", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    with running_server() as (base_url, workdir):
+        heavy_user_id, heavy_token = signup(base_url, "heavy@example.com")
+        workouts = seed_training_history(os.path.join(workdir, "myfit.db"), heavy_user_id, args.days)
+        request_json("POST", base_url + "/body-metrics", heavy_token,
+                     {"date": "2025-01-01T07:00:00", "body_weight": 75.0})
+        token, workout_exercise_id = _prepare_logger(base_url)
+
+        started = time.perf_counter()
+        request_json("GET", base_url + "/dashboard/stats", heavy_token)
+        print(f"履歴: 完了ワークアウト {workouts} 件 / 単発 /dashboard/stats "
+              f"{(time.perf_counter() - started) * 1000:.1f}ms")
+
+        idle = _measure_set_logging(base_url, token, workout_exercise_id, args.samples)
+
+        stop = threading.Event()
+        dashboard_latencies = []
+
+        def hammer():
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                request_json("GET", base_url + "/dashboard/stats", heavy_token)
+                dashboard_latencies.append(time.perf_counter() - t0)
+
+        threads = [threading.Thread(target=hammer, daemon=True) for _ in range(args.hammer_threads)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        loaded = _measure_set_logging(base_url, token, workout_exercise_id, args.samples)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    print(format_latencies("POST sets (負荷なし)", idle))
+    print(format_latencies("POST sets (dashboard負荷中)", loaded))
+    print(format_latencies("GET /dashboard/stats", dashboard_latencies))
+
+
+if __name__ == "__main__":
+    main()
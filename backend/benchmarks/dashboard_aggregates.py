@@ -0,0 +1,127 @@
+"""
+ダッシュボード集計ベンチマーク（Python側で合計する方式とSQL集計の比較）
+
+    cd backend
+    python -m benchmarks.dashboard_aggregates [--years 5] [--iterations 20]
+
+--years 年分の合成トレーニング履歴を持つユーザーについて、
+総ボリューム・今週のボリュームを
+  - 従来方式: 全セットをORMオブジェクトとして読み込みPythonで weight * reps を合計（2クエリ）
+  - SQL集計: main._strength_set_totals の条件付き集計（1クエリ）
+  - 読み取りモデル: user_stats / user_weekly_stats の主キー参照（ダッシュボードの現行方式）
+で求め、1回あたりのレイテンシとピークメモリ（tracemalloc）を比較する。
+最後に GET /dashboard/stats 全体のレイテンシも表示する。
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from benchmarks.common import asgi_request, format_latencies, rebuild_read_models, seed_training_history
+
+
+async def _legacy_volumes(db, models, user_id: int, week_start):
+    """従来の実装（全セットを読み込んでPythonで合計）"""
+
+    def strength_sets(*conditions):
+        return (
+            select(models.Set).join(models.WorkoutExercise).join(models.Workout).where(
+                models.Workout.user_id == user_id,
+                models.Set.is_warmup == False,
+                *conditions
+            ).join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id).where(
+                models.Exercise.exercise_type == 'strength',
+                models.Set.weight.isnot(None),
+                models.Set.reps.isnot(None)
+            )
+        )
+
+    total_sets = (await db.scalars(strength_sets())).all()
+    total_volume = sum(s.weight * s.reps for s in total_sets if s.weight and s.reps)
+    week_sets = (await db.scalars(strength_sets(models.Workout.date >= week_start))).all()
+    week_volume = sum(s.weight * s.reps for s in week_sets if s.weight and s.reps)
+    return total_volume, week_volume
+
+
+async def _sql_volumes(db, main, user_id: int, week_start):
+    totals = await main._strength_set_totals(db, user_id, week_start)
+    return totals.volume, totals.week_volume
+
+
+async def _stats_volumes(db, user_stats, user_id: int, week_start):
+    stats, week_stats = await user_stats.get_dashboard_stats(db, user_id, week_start)
+    return stats.total_volume, week_stats.volume if week_stats else 0
+
+
+async def _measure(label, session_factory, compute, iterations: int):
+    samples = []
+    peak = 0
+    result = None
+    for _ in range(iterations):
+        async with session_factory() as db:
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            result = await compute(db)
+            samples.append(time.perf_counter() - t0)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    print(format_latencies(label, samples) + f" peak={peak / 1024 / 1024:7.2f}MiB")
+    return result
+
+
+async def _run(args, db_path: str):
+    import main
+    import models
+    import user_stats
+    from database import AsyncSessionLocal
+
+    status, _, data = await asgi_request(main.app, "POST", "/auth/signup",
+                                         body={"email": "history@example.com", "password": "benchmark-pass"})
+    if status != 200:
+        raise RuntimeError(f"signup failed: {status} {data}")
+    user_id, token = data["user"]["id"], data["access_token"]
+    workouts = seed_training_history(db_path, user_id, days=args.years * 365, exercises_per_workout=5,
+                                     sets_per_exercise=5)
+    await rebuild_read_models()
+    print(f"{args.years}年分の履歴: 完了済みワークアウト {workouts} 件 / セット 約{workouts * 25} 件")
+
+    today = datetime.now().date()
+    week_start = today - timedelta(days=today.weekday())
+    legacy = await _measure("従来方式（Pythonで合計）", AsyncSessionLocal,
+                            lambda db: _legacy_volumes(db, models, user_id, week_start), args.iterations)
+    current = await _measure("SQL集計（条件付き集計）", AsyncSessionLocal,
+                             lambda db: _sql_volumes(db, main, user_id, week_start), args.iterations)
+    read_model = await _measure("読み取りモデル（user_stats）", AsyncSessionLocal,
+                                lambda db: _stats_volumes(db, user_stats, user_id, week_start), args.iterations)
+    results = [tuple(round(v, 1) for v in r) for r in (legacy, current, read_model)]
+    print(f"結果の一致: {results[0] == results[1] == results[2]} "
+          f"(総ボリューム {results[1][0]}, 今週 {results[1][1]})")
+
+    samples = []
+    for _ in range(args.iterations):
+        t0 = time.perf_counter()
+        await asgi_request(main.app, "GET", "/dashboard/stats", token)
+        samples.append(time.perf_counter() - t0)
+    print(format_latencies("GET /dashboard/stats", samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="myfit-dashboard-")
+    db_path = os.path.join(workdir, "dashboard.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+    asyncio.run(_run(args, db_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+エンジンプロファイル別の読み書き混在ベンチマーク
+
+    cd backend
+    python -m benchmarks.engine_profiles [--seconds 10] [--readers 8] [--writers 4]
+
+database.ENGINE_PROFILES の各プロファイルで、書き込みスレッド（セット追加を1件ずつコミット）と
+読み取りスレッド（ユーザーの総ボリューム集計）を同時に走らせ、
+スループットと "database is locked" エラー数を報告する。
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import ENGINE_PROFILES, Base, create_db_engine
+
+
+def _prepare(session_factory):
+    with session_factory() as db:
+        user = models.User(email="bench@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        exercise = models.Exercise(user_id=user.id, name="ベンチプレス", muscle_group="胸", exercise_type="strength")
+        workout = models.Workout(user_id=user.id, date=models.func.now(), local_date=models.func.current_date(), is_completed=True)
+        db.add_all([exercise, workout])
+        db.flush()
+        workout_exercise = models.WorkoutExercise(workout_id=workout.id, exercise_id=exercise.id, order_index=0)
+        db.add(workout_exercise)
+        db.flush()
+        db.add_all([
+            models.Set(workout_exercise_id=workout_exercise.id, set_index=i + 1, weight=60, reps=10)
+            for i in range(5000)
+        ])
+        db.commit()
+        return user.id, workout_exercise.id
+
+
+def run_profile(profile_name: str, seconds: float, readers: int, writers: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="myfit-profile-")
+    engine = create_db_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}", profile_name)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    user_id, workout_exercise_id = _prepare(session_factory)
+
+    counters = {"reads": 0, "writes": 0, "read_lock_errors": 0, "write_lock_errors": 0, "other_errors": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def count(key):
+        with lock:
+            counters[key] += 1
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with session_factory() as db:
+                    db.execute(
+                        select(func.sum(models.Set.weight * models.Set.reps))
+                        .join(models.WorkoutExercise).join(models.Workout)
+                        .where(models.Workout.user_id == user_id)
+                    ).scalar()
+                count("reads")
+            except OperationalError as e:
+                count("read_lock_errors" if "locked" in str(e) else "other_errors")
+
+    def writer():
+        index = 0
+        while not stop.is_set():
+            index += 1
+            try:
+                with session_factory() as db:
+                    db.add(models.Set(workout_exercise_id=workout_exercise_id, set_index=index, weight=80, reps=5))
+                    db.commit()
+                count("writes")
+            except OperationalError as e:
+                count("write_lock_errors" if "locked" in str(e) else "other_errors")
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    counters["reads_per_sec"] = round(counters["reads"] / elapsed, 1)
+    counters["writes_per_sec"] = round(counters["writes"] / elapsed, 1)
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+
+    for profile_name in ENGINE_PROFILES:
+        result = run_profile(profile_name, args.seconds, args.readers, args.writers)
+        print(
+            f"{profile_name:<12} reads/s={result['reads_per_sec']:8.1f} writes/s={result['writes_per_sec']:8.1f} "
+            f"lock errors (read/write)={result['read_lock_errors']}/{result['write_lock_errors']} "
+            f"other errors={result['other_errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+一覧エンドポイントの期間指定の整合性チェック
+
+    cd backend
+    python -m benchmarks.list_consistency
+
+一時データベースに記録を作成し、GET /body-metrics・/height-records の from_date・to_date が
+ユーザーのタイムゾーンでの日付で境界の日を含めて絞り込むか（to_date の日の0時以降の記録が漏れないか）と、
+同じ日時の記録（書式の異なる保存値を含む）を持つ GET /workouts・/height-records を小さい limit で
+next_cursor をたどって全ページ読んだときに、全件（unbounded=true）と比べて重複や漏れがないかを確認する。
+違反があれば終了コード1で終了する。
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+from benchmarks.common import asgi_request
+
+# (一覧のパス, 作成する記録の本文)
+BODY_LISTS = (
+    ("/body-metrics", {"body_weight": 70.0}),
+    ("/height-records", {"height_cm": 170.0}),
+)
+
+
+async def _check_date_boundaries(app, token: str) -> list:
+    """to_date・from_date の日の0時以外の記録がその日に含まれるかを確認し、問題の一覧を返す"""
+    problems = []
+    for path, body in BODY_LISTS:
+        # 体重・体脂肪率は1日1件まで
+        for when in ("2026-03-09T23:30:00", "2026-03-10T23:59:59", "2026-03-11T00:00:00"):
+            status, _, data = await asgi_request(app, "POST", path, token, body={**body, "date": when})
+            if status != 200:
+                raise RuntimeError(f"POST {path} -> {status} {data}")
+
+        for query, expected in (
+            ("from_date=2026-03-10&to_date=2026-03-10", 1),
+            ("to_date=2026-03-10", 2),
+            ("from_date=2026-03-10", 2),
+            ("from_date=2026-03-11&to_date=2026-03-11", 1),
+        ):
+            status, _, data = await asgi_request(app, "GET", f"{path}?{query}&unbounded=true", token)
+            if status != 200:
+                problems.append(f"GET {path}?{query} -> {status} {data}")
+            elif len(data["items"]) != expected:
+                problems.append(f"GET {path}?{query}: {len(data['items'])} 件（期待値 {expected} 件）")
+    return problems
+
+
+# 同じ日時の保存値（SQLAlchemy の書式、秒まで、"T" 区切り）
+EQUAL_TIMESTAMPS = ("2026-04-01 07:00:00.000000", "2026-04-01 07:00:00", "2026-04-01T07:00:00")
+PAGE_LIMIT = 2
+
+
+async def _check_page_walk(app, token: str, user_id: int, db_path: str) -> list:
+    """同じ日時の記録をページをたどって読み、重複・漏れがないかを確認して問題の一覧を返す"""
+    with sqlite3.connect(db_path) as conn:
+        for stored in EQUAL_TIMESTAMPS * 3:
+            conn.execute(
+                "INSERT INTO workouts (user_id, date, local_date, local_week, is_completed) VALUES (?, ?, ?, ?, 0)",
+                (user_id, stored, "2026-04-01", "2026-W14"),
+            )
+            conn.execute(
+                "INSERT INTO height_records (user_id, height_cm, date, local_date) VALUES (?, ?, ?, ?)",
+                (user_id, 171.0, stored, "2026-04-01"),
+            )
+
+    problems = []
+    for path in ("/workouts", "/height-records"):
+        _, _, everything = await asgi_request(app, "GET", f"{path}?unbounded=true", token)
+        expected = [item["id"] for item in everything["items"]]
+        walked, cursor = [], None
+        while True:
+            query = f"?limit={PAGE_LIMIT}" + (f"&cursor={cursor}" if cursor else "")
+            status, _, page = await asgi_request(app, "GET", path + query, token)
+            if status != 200:
+                problems.append(f"GET {path}{query} -> {status} {page}")
+                break
+            walked += [item["id"] for item in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None or len(walked) > len(expected):
+                break
+        if walked != expected:
+            duplicated = len(walked) - len(set(walked))
+            missing = len(set(expected) - set(walked))
+            problems.append(f"GET {path}: ページをたどった結果が全件と一致しません（重複 {duplicated} 件 / 漏れ {missing} 件）")
+    return problems
+
+
+async def _run(db_path: str) -> list:
+    import main
+
+    status, _, data = await asgi_request(main.app, "POST", "/auth/signup",
+                                         body={"email": "lists@example.com", "password": "benchmark-pass"})
+    if status != 200:
+        raise RuntimeError(f"signup failed: {status} {data}")
+    user_id, token = data["user"]["id"], data["access_token"]
+    problems = await _check_date_boundaries(main.app, token)
+    problems += await _check_page_walk(main.app, token, user_id, db_path)
+    return problems
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="myfit-lists-")
+    db_path = os.path.join(workdir, "lists.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+    problems = asyncio.run(_run(db_path))
+
+    print(f"違反: {len(problems)} 件")
+    for problem in problems:
+        print(f"  {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+一覧エンドポイントのキーセットページネーションのベンチマーク（1ページ目と100ページ目の比較）
+
+    cd backend
+    python -m benchmarks.list_pagination [--years 20] [--limit 50] [--iterations 20]
+
+--years 年分の毎日のワークアウトと体重記録（1日2件）を持つユーザーについて、
+  - GET /workouts・/body-metrics の1ページ目と100ページ目（next_cursor をたどって得たカーソル）
+  - 参考: 同じページを OFFSET で読む場合（DBのみ）
+  - unbounded=true（全件）
+のレイテンシを比較する。キーセットならページの深さによらずほぼ一定になる。
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+
+from benchmarks.common import asgi_request, format_latencies, seed_body_metrics, seed_training_history
+
+PAGE = 100
+
+
+async def _measure(label: str, compute, iterations: int):
+    samples = []
+    result = None
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        result = await compute()
+        samples.append(time.perf_counter() - t0)
+    print(format_latencies(label, samples))
+    return result
+
+
+async def _run(args, db_path: str):
+    import main
+    import models
+    from database import AsyncSessionLocal
+
+    status, _, data = await asgi_request(main.app, "POST", "/auth/signup",
+                                         body={"email": "pages@example.com", "password": "benchmark-pass"})
+    if status != 200:
+        raise RuntimeError(f"signup failed: {status} {data}")
+    user_id, token = data["user"]["id"], data["access_token"]
+    days = args.years * 365
+    workouts = seed_training_history(db_path, user_id, days=days, workouts_per_week=7,
+                                     exercises_per_workout=1, sets_per_exercise=1)
+    metrics = seed_body_metrics(db_path, user_id, days=days, per_day=2)
+    print(f"ワークアウト: {workouts} 件 / 体重記録: {metrics} 件 / limit={args.limit}")
+
+    for path, model in (("/workouts", models.Workout), ("/body-metrics", models.BodyMetric)):
+        # next_cursor をたどって100ページ目のカーソルを得る
+        cursor = None
+        for _ in range(PAGE - 1):
+            query = f"?limit={args.limit}" + (f"&cursor={cursor}" if cursor else "")
+            _, _, body = await asgi_request(main.app, "GET", path + query, token)
+            cursor = body["next_cursor"]
+            if cursor is None:
+                raise RuntimeError(f"{path}: {PAGE}ページ分の記録がありません（--years を増やしてください）")
+
+        def endpoint(query: str):
+            async def call():
+                status, _, body = await asgi_request(main.app, "GET", path + query, token)
+                if status != 200:
+                    raise RuntimeError(f"GET {path}{query} -> {status} {body}")
+                return body
+            return call
+
+        def offset(page: int):
+            async def call():
+                async with AsyncSessionLocal() as db:
+                    return (await db.scalars(
+                        select(model).where(model.user_id == user_id)
+                        .order_by(model.date.desc(), model.id.desc())
+                        .offset((page - 1) * args.limit).limit(args.limit)
+                    )).all()
+            return call
+
+        print(f"--- GET {path}")
+        first = await _measure("1ページ目", endpoint(f"?limit={args.limit}"), args.iterations)
+        deep = await _measure(f"{PAGE}ページ目（cursor）", endpoint(f"?limit={args.limit}&cursor={cursor}"),
+                              args.iterations)
+        await _measure("1ページ目（OFFSET、DBのみ）", offset(1), args.iterations)
+        await _measure(f"{PAGE}ページ目（OFFSET、DBのみ）", offset(PAGE), args.iterations)
+        everything = await _measure("全件（unbounded=true）", endpoint("?unbounded=true"), max(1, args.iterations // 5))
+        print(f"1ページ目: {len(first['items'])} 件 / {PAGE}ページ目: {len(deep['items'])} 件 / "
+              f"全件: {len(everything['items'])} 件")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="myfit-pages-")
+    db_path = os.path.join(workdir, "pages.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+    asyncio.run(_run(args, db_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+ログイン集中時の応答性ベンチマーク
+
+    cd backend
+    python -m benchmarks.login_burst [--users 100]
+
+--users 人のユーザーを作成し、全員が同時にログインしている間に
+GET /health と認証付き GET /exercises のレイテンシを計測する。
+bcryptの計算がイベントループ上で行われていると、他のエンドポイントも巻き添えで停止する。
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+from benchmarks.common import format_latencies, request_json, running_server, signup
+
+PASSWORD = "benchmark-pass"
+
+
+def _create_users(db_path: str, count: int):
+    """同じパスワードハッシュでユーザーを直接作成（事前準備のハッシュ計算を1回にする）"""
+    from auth import pwd_context
+
+    password_hash = pwd_context.hash(PASSWORD)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executemany(
+            "INSERT INTO users (email, password_hash) VALUES (?, ?)",
+            [(f"burst{i}@example.com", password_hash) for i in range(count)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    with running_server() as (base_url, workdir):
+        _, token = signup(base_url, "observer@example.com", PASSWORD)
+        _create_users(os.path.join(workdir, "myfit.db"), args.users)
+
+        login_latencies = []
+        login_statuses = {}
+        probe_latencies = {"GET /health": [], "GET /exercises": []}
+        lock = threading.Lock()
+        start_gate = threading.Event()
+        done = threading.Event()
+
+        def login(index: int):
+            start_gate.wait()
+            t0 = time.perf_counter()
+            status, _ = request_json("POST", base_url + "/auth/login",
+                                     body={"email": f"burst{index}@example.com", "password": PASSWORD})
+            elapsed = time.perf_counter() - t0
+            with lock:
+                login_latencies.append(elapsed)
+                login_statuses[status] = login_statuses.get(status, 0) + 1
+
+        def probe():
+            start_gate.wait()
+            while not done.is_set():
+                for label, path, auth in (("GET /health", "/health", None), ("GET /exercises", "/exercises", token)):
+                    t0 = time.perf_counter()
+                    request_json("GET", base_url + path, auth)
+                    probe_latencies[label].append(time.perf_counter() - t0)
+                time.sleep(0.02)
+
+        logins = [threading.Thread(target=login, args=(i,)) for i in range(args.users)]
+        prober = threading.Thread(target=probe)
+        for thread in logins + [prober]:
+            thread.start()
+        burst_started = time.perf_counter()
+        start_gate.set()
+        for thread in logins:
+            thread.join()
+        burst_elapsed = time.perf_counter() - burst_started
+        done.set()
+        prober.join()
+
+        status, metrics = request_json("GET", base_url + "/metrics/password-hashing")
+
+    print(f"{args.users} 件の同時ログイン: 所要 {burst_elapsed:.2f}s / ステータス {login_statuses}")
+    print(format_latencies("POST /auth/login", login_latencies))
+    for label, samples in probe_latencies.items():
+        print(format_latencies(label + " (ログイン集中中)", samples))
+    if status == 200:
+        print(f"ハッシュワーカー統計: {metrics}")
+
+
+if __name__ == "__main__":
+    main()
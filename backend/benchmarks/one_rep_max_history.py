@@ -0,0 +1,109 @@
+"""
+推定1RM履歴のベンチマーク（全セットをPythonで計算する方式とSQL側での集計の比較）
+
+    cd backend
+    python -m benchmarks.one_rep_max_history [--years 5] [--iterations 10]
+
+--years 年分の合成履歴を持つユーザーについて、1種目の推定1RM履歴を
+  - 従来方式: 対象セットを全件読み込み、Pythonで Epley 式を計算して最大値と最新20件を取り出す
+  - 現行方式: GET /analytics/exercise/{id}/1rm（SQLで推定1RMを計算し、ワークアウトごとの最高セットを選ぶ）
+  - 月単位: 同エンドポイントの bucket=month（複数年のグラフ用）
+で取得し、レイテンシとピークメモリ（tracemalloc）を比較する。
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import select
+
+from benchmarks.common import asgi_request, format_latencies, seed_training_history
+
+
+async def _legacy_history(db, models, user_id: int, exercise_id: int):
+    """従来の実装（全セットを読み込んでPythonで計算）"""
+    rows = (await db.execute(
+        select(models.Set, models.Workout.date, models.WorkoutExercise.workout_id)
+        .select_from(models.Set)
+        .join(models.WorkoutExercise).join(models.Workout).join(models.Exercise).where(
+            models.WorkoutExercise.exercise_id == exercise_id,
+            models.Workout.user_id == user_id,
+            models.Set.is_warmup == False,
+            models.Exercise.exercise_type == 'strength',
+            models.Set.weight.isnot(None),
+            models.Set.reps.isnot(None)
+        ).order_by(models.Workout.date.desc())
+    )).all()
+    history = [
+        {"date": workout_date, "estimated_1rm": round(set_data.weight * (1 + set_data.reps / 30), 1),
+         "workout_id": workout_id}
+        for set_data, workout_date, workout_id in rows
+    ]
+    return max(item["estimated_1rm"] for item in history), len(rows)
+
+
+async def _measure(label: str, compute, iterations: int):
+    samples = []
+    peak = 0
+    result = None
+    for _ in range(iterations):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        result = await compute()
+        samples.append(time.perf_counter() - t0)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    print(format_latencies(label, samples) + f" peak={peak / 1024 / 1024:7.2f}MiB")
+    return result
+
+
+async def _run(args, db_path: str):
+    import main
+    import models
+    from database import AsyncSessionLocal
+
+    status, _, data = await asgi_request(main.app, "POST", "/auth/signup",
+                                         body={"email": "onerm@example.com", "password": "benchmark-pass"})
+    if status != 200:
+        raise RuntimeError(f"signup failed: {status} {data}")
+    user_id, token = data["user"]["id"], data["access_token"]
+    workouts = seed_training_history(db_path, user_id, days=args.years * 365, exercises_per_workout=3,
+                                     sets_per_exercise=6)
+    _, _, exercises = await asgi_request(main.app, "GET", "/exercises", token)
+    exercise_id = next(e["id"] for e in exercises if e["exercise_type"] == "strength")
+    print(f"{args.years}年分の履歴: 完了済みワークアウト {workouts} 件（種目 {exercise_id}）")
+
+    async def legacy():
+        async with AsyncSessionLocal() as db:
+            return await _legacy_history(db, models, user_id, exercise_id)
+
+    def endpoint(query: str):
+        async def call():
+            _, _, body = await asgi_request(main.app, "GET", f"/analytics/exercise/{exercise_id}/1rm{query}", token)
+            return body
+        return call
+
+    legacy_max, set_count = await _measure("従来方式（全セット）", legacy, args.iterations)
+    current = await _measure("現行方式（SQL、20件）", endpoint(""), args.iterations)
+    monthly = await _measure("月単位（bucket=month）", endpoint("?bucket=month&limit=100"), args.iterations)
+    print(f"対象セット: {set_count} 件 / 月数: {len(monthly['history'])}")
+    print(f"最大推定1RMの一致: {legacy_max == current['max_estimated_1rm']} ({current['max_estimated_1rm']} kg)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="myfit-1rm-")
+    db_path = os.path.join(workdir, "onerm.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+    asyncio.run(_run(args, db_path))
+
+
+if __name__ == "__main__":
+    main()
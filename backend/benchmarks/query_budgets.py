@@ -0,0 +1,143 @@
+"""
+ルート別クエリ数の上限チェック
+
+    cd backend
+    python -m benchmarks.query_budgets [--report]
+
+合成データを投入した一時データベースで全エンドポイントをプロセス内で呼び出し、
+1リクエストあたりのSQL実行数が QUERY_BUDGETS の上限以内か、N+1（同じSQLをパラメータだけ変えて
+繰り返す実行）がないかを query_metrics.check_query_budget で確認する。
+あわせて、一連の更新後のユーザー統計（user_stats）・自己ベスト（personal_records）・
+トレーニング集計（training_rollups）・体重のトレンド（body_trends）が全件再計算と一致するかも確認する。
+違反があれば終了コード1で終了する。
+上限はデータ量に依存しない値であること（ループ内でクエリを発行すると件数に比例して超過する）。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from benchmarks.common import exercise_all_endpoints
+
+# ルートごとの1リクエストあたりの最大クエリ数（認証のユーザー参照と、条件付きGET・更新系のデータバージョンの参照・更新、
+# 更新系の変更ログの記録を含む）
+QUERY_BUDGETS = {
+    "POST /auth/signup": 6,
+    "POST /auth/login": 3,
+    "POST /exercises": 6,
+    "GET /exercises": 3,
+    "GET /exercises/{exercise_id}": 3,
+    "POST /body-metrics": 11,   # トレンドの計算と消費カロリー台帳のバックグラウンド再計算を含む
+    "PUT /body-metrics/{metric_id}": 11,
+    "POST /height-records": 4,
+    "GET /body-metrics": 3,
+    "GET /height-records": 3,
+    "PUT /profile": 6,
+    "GET /profile": 4,
+    "POST /workouts": 4,
+    "POST /workouts/{workout_id}/exercises": 9,
+    "POST /workout-exercises/{workout_exercise_id}/sets": 12,
+    "GET /workout-exercises/{workout_exercise_id}/sets": 4,
+    "GET /workouts/{workout_id}/exercises": 5,
+    "PATCH /workouts/{workout_id}/complete": 11,
+    "POST /workouts/{workout_id}/batch": 40,   # セットの追加は件数によらず1回の INSERT（更新・削除は1件ごとに数クエリ）
+    "PUT /sets/{set_id}": 17,
+    "GET /workouts": 3,
+    "GET /workouts/calendar": 3,
+    "GET /workouts/recent": 5,   # ワークアウト・種目・セットの3クエリ（件数によらない）
+    "GET /workouts/{workout_id}": 5,
+    "GET /analytics/exercise/{exercise_id}/1rm": 5,
+    "GET /analytics/prs": 3,
+    "GET /analytics/workout/{workout_id}/volume": 4,
+    "GET /analytics/volume": 3,
+    "GET /analytics/timeseries": 3,
+    "GET /analytics/user/summary": 5,
+    "GET /analytics/body/summary": 4,   # 身体データのスナップショットがキャッシュにない場合は2クエリ
+    "GET /analytics/body/bmi-history": 4,
+    "GET /analytics/body/advanced-summary": 4,
+    "GET /dashboard/stats": 7,
+    "GET /analytics/calories": 5,
+    "GET /dashboard/calorie-goal": 8,
+    "GET /auth/me": 2,
+    "GET /settings": 5,
+    "PUT /settings/dashboard": 5,
+    "DELETE /sets/{set_id}": 16,   # 推定1RMの最高値を持つセットなら集計の最高値を求め直す
+    "DELETE /workout-exercises/{workout_exercise_id}": 18,
+    "GET /sync": 12,   # 同期するテーブルごとに1クエリ（件数によらない）
+}
+
+
+async def _check_read_models() -> list:
+    """差分更新されたユーザー統計・自己ベスト・トレーニング集計・体重のトレンドと全件再計算を比較する"""
+    import body_trends
+    import models
+    import personal_records
+    import training_rollups
+    import user_stats
+    from database import AsyncSessionLocal
+    from sqlalchemy import select
+
+    problems = []
+    async with AsyncSessionLocal() as db:
+        for user_id in (await db.scalars(select(models.User.id))).all():
+            problems += [f"user_stats (user {user_id}): {p}" for p in await user_stats.check_user_stats(db, user_id)]
+            problems += [f"personal_records (user {user_id}): {p}"
+                         for p in await personal_records.check_personal_records(db, user_id)]
+            problems += [f"training_rollups (user {user_id}): {p}"
+                         for p in await training_rollups.check_rollups(db, user_id)]
+            problems += [f"body_trends (user {user_id}): {p}" for p in await body_trends.check_body_trends(db, user_id)]
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--report", action="store_true", help="全ルートの実測値を表示する")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="myfit-budgets-")
+    db_path = os.path.join(workdir, "budgets.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    from main import app
+    from query_metrics import QueryBudgetExceeded, capture_queries, check_query_budget
+
+    measured = []
+
+    @contextmanager
+    def measure(route: str):
+        with capture_queries() as stats:
+            yield
+        measured.append((route, stats))
+
+    async def run_scenario():
+        await exercise_all_endpoints(app, db_path, around=measure)
+        return await _check_read_models()
+
+    stats_problems = asyncio.run(run_scenario())
+
+    failures = []
+    for route, stats in measured:
+        budget = QUERY_BUDGETS.get(route)
+        if budget is None:
+            failures.append(f"{route}: 上限が未設定です（QUERY_BUDGETS に追加してください）")
+            continue
+        try:
+            check_query_budget(stats, budget, label=route)
+        except QueryBudgetExceeded as e:
+            failures.append(str(e))
+        if args.report:
+            print(f"{route:<52} queries={stats.count:<3} budget={budget:<3} db={stats.total_ms:7.1f}ms")
+
+    failures += stats_problems
+    print(f"検査したリクエスト: {len(measured)} 件 / 違反: {len(failures)} 件")
+    for failure in failures:
+        print(f"  {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
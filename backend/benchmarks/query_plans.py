@@ -0,0 +1,90 @@
+"""
+クエリプラン検査
+
+    cd backend
+    python -m benchmarks.query_plans [--verbose]
+
+一時データベースにマイグレーションを適用して合成データを投入し、main.py の全エンドポイントを
+プロセス内で呼び出して発行されたSQLを記録する。記録した各クエリに EXPLAIN QUERY PLAN を実行し、
+テーブルのフルスキャン（インデックスを使わない SCAN）があれば一覧を表示して終了コード1で終了する。
+インデックスを追加・変更したときやクエリを書き換えたときに実行する。
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+from sqlalchemy import event
+
+from benchmarks.common import exercise_all_endpoints
+
+# "SCAN workouts" / "SCAN TABLE workouts" / "SCAN sets_1"（USING INDEX が付かないもの）
+FULL_SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+# SQLAlchemyが付けるテーブル別名（sets_1 など）
+ALIAS_SUFFIX_PATTERN = re.compile(r"_\d+$")
+
+
+def _explain(db_path: str, statements: dict) -> list:
+    """各クエリのプランを取得し (statement, plan_details, full_scans) のリストを返す"""
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        results = []
+        for statement, parameters in statements.items():
+            rows = conn.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+            details = [row[-1] for row in rows]
+            full_scans = []
+            for match in filter(None, map(FULL_SCAN_PATTERN.match, details)):
+                # サブクエリ（anon_1 などのコルーチン）の走査は対象外
+                table = ALIAS_SUFFIX_PATTERN.sub("", match.group(1))
+                if table in tables:
+                    full_scans.append(table)
+            results.append((statement, details, full_scans))
+        return results
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="全クエリのプランを表示する")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="myfit-plans-")
+    db_path = os.path.join(workdir, "plans.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    import database
+    from main import app
+
+    statements = {}
+
+    @event.listens_for(database.async_engine.sync_engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")) and not executemany:
+            statements.setdefault(statement, parameters)
+
+    asyncio.run(exercise_all_endpoints(app, db_path))
+    results = _explain(db_path, statements)
+
+    failures = [result for result in results if result[2]]
+    for statement, details, full_scans in results:
+        if args.verbose or full_scans:
+            print("-" * 80)
+            print(" ".join(statement.split()))
+            for detail in details:
+                print(f"    {detail}")
+    print("=" * 80)
+    print(f"検査したクエリ: {len(results)} 件 / フルスキャンを含むクエリ: {len(failures)} 件")
+    if failures:
+        tables = sorted({table for _, _, full_scans in failures for table in full_scans})
+        print(f"フルスキャンされたテーブル: {', '.join(tables)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+トレーニング時系列のベンチマーク（セットからの都度集計と training_rollups の読み出しの比較）
+
+    cd backend
+    python -m benchmarks.training_timeseries [--years 3] [--iterations 10]
+
+--years 年分の合成履歴を持つユーザーについて、直近1年の部位（胸）ごとの週次ボリュームを
+  - 都度集計: セット・ワークアウト種目・ワークアウト・種目を結合して週ごとに GROUP BY する
+  - 集計表: training_rollups の索引範囲読み出し（同じ条件の GROUP BY）
+  - エンドポイント: GET /analytics/timeseries?group_by=muscle_group&muscle_group=胸（認証などを含む）
+で取得し、レイテンシと結果の一致を比較する。集計表側のクエリプラン（EXPLAIN QUERY PLAN）も表示する。
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from urllib.parse import quote
+
+from sqlalchemy import func, select, text
+
+from benchmarks.common import asgi_request, format_latencies, rebuild_read_models, seed_training_history
+
+MUSCLE_GROUP = "胸"
+
+
+async def _direct_weekly_volume(db, models, training_rollups, user_id: int, start: date):
+    """セットから直接、週ごとの胸のボリュームを集計する"""
+    week = training_rollups.BUCKET_STARTS["week"](models.Workout.date)
+    rows = (await db.execute(
+        select(week, func.count(models.Set.id), func.sum(models.Set.weight * models.Set.reps))
+        .select_from(models.Set)
+        .join(models.WorkoutExercise).join(models.Workout)
+        .join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .where(
+            models.Workout.user_id == user_id,
+            models.Workout.date >= start,
+            models.Exercise.muscle_group == MUSCLE_GROUP,
+            models.Exercise.exercise_type == 'strength',
+            models.Set.is_warmup == False,
+        )
+        .group_by(week).order_by(week)
+    )).all()
+    return [(bucket, sets, volume or 0) for bucket, sets, volume in rows]
+
+
+async def _rollup_weekly_volume(db, models, user_id: int, start: date):
+    """training_rollups から週ごとの胸のボリュームを読み出す"""
+    rollup = models.TrainingRollup
+    rows = (await db.execute(
+        select(rollup.bucket_start, func.sum(rollup.set_count), func.sum(rollup.volume))
+        .where(
+            rollup.user_id == user_id,
+            rollup.granularity == "week",
+            rollup.muscle_group == MUSCLE_GROUP,
+            rollup.bucket_start >= start,
+        )
+        .group_by(rollup.bucket_start).order_by(rollup.bucket_start)
+    )).all()
+    return rows
+
+
+async def _measure(label: str, compute, iterations: int):
+    samples = []
+    result = None
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        result = await compute()
+        samples.append(time.perf_counter() - t0)
+    print(format_latencies(label, samples))
+    return result
+
+
+async def _run(args, db_path: str):
+    import main
+    import models
+    import training_rollups
+    from database import AsyncSessionLocal
+
+    status, _, data = await asgi_request(main.app, "POST", "/auth/signup",
+                                         body={"email": "timeseries@example.com", "password": "benchmark-pass"})
+    if status != 200:
+        raise RuntimeError(f"signup failed: {status} {data}")
+    user_id, token = data["user"]["id"], data["access_token"]
+    workouts = seed_training_history(db_path, user_id, days=args.years * 365, exercises_per_workout=3,
+                                     sets_per_exercise=6)
+    await rebuild_read_models()
+    start = training_rollups.bucket_start("week", date.today() - timedelta(days=364))
+    print(f"{args.years}年分の履歴: 完了済みワークアウト {workouts} 件 / 集計開始週 {start}")
+
+    async def direct():
+        async with AsyncSessionLocal() as db:
+            return await _direct_weekly_volume(db, models, training_rollups, user_id, start)
+
+    async def rollups():
+        async with AsyncSessionLocal() as db:
+            return await _rollup_weekly_volume(db, models, user_id, start)
+
+    async def endpoint():
+        _, _, body = await asgi_request(
+            main.app, "GET",
+            f"/analytics/timeseries?granularity=week&group_by=muscle_group&muscle_group={quote(MUSCLE_GROUP)}"
+            f"&start_date={start.isoformat()}", token)
+        return body["series"]
+
+    expected = await _measure("都度集計（セットを結合）", direct, args.iterations)
+    await _measure("集計表（training_rollups）", rollups, args.iterations)
+    series = await _measure("エンドポイント（/analytics/timeseries）", endpoint, args.iterations)
+    matches = len(expected) == len(series) and all(
+        bucket == point["bucket_start"] and sets == point["sets"]
+        and math.isclose(round(volume, 1), point["total_volume"], abs_tol=0.05)
+        for (bucket, sets, volume), point in zip(expected, series)
+    )
+    print(f"週数: {len(series)} / 結果の一致: {matches}")
+
+    async with AsyncSessionLocal() as db:
+        rollup_rows = await db.scalar(select(func.count()).select_from(models.TrainingRollup).where(
+            models.TrainingRollup.user_id == user_id,
+            models.TrainingRollup.granularity == "week",
+            models.TrainingRollup.muscle_group == MUSCLE_GROUP,
+            models.TrainingRollup.bucket_start >= start,
+        ))
+        plan = (await db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT bucket_start, sum(volume) FROM training_rollups "
+            "WHERE user_id = :user_id AND granularity = 'week' AND muscle_group = :muscle_group "
+            "AND bucket_start >= :start GROUP BY bucket_start"
+        ), {"user_id": user_id, "muscle_group": MUSCLE_GROUP, "start": start.isoformat()})).all()
+    print(f"読み出す集計行: {rollup_rows} 行（種目×週）")
+    for row in plan:
+        print(f"    {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="myfit-timeseries-")
+    db_path = os.path.join(workdir, "timeseries.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+    asyncio.run(_run(args, db_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+カレンダー表示のベンチマーク（日ごとの集計エンドポイントと、ワークアウト一覧を取得する従来方式の比較）
+
+    cd backend
+    python -m benchmarks.workout_calendar [--years 1 20] [--iterations 20]
+
+--years の各年数分の履歴（週5回、1回4種目×4セット）を持つユーザーについて、今月のカレンダーを
+  - 従来方式: GET /workouts（カレンダーの表示範囲、unbounded=true）で一覧を取得
+  - 月表示: GET /workouts/calendar?month=YYYY-MM（日ごとの集計）
+  - 年間ヒートマップ: GET /workouts/calendar?year=YYYY
+で取得し、レイテンシとレスポンスのサイズを比較する。集計は local_date のインデックスで表示範囲だけを読むため、
+履歴の長さによらない。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import asgi_request, format_latencies, seed_training_history
+
+
+async def _measure(label: str, path: str, app, token: str, iterations: int):
+    samples = []
+    body = None
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        status, _, body = await asgi_request(app, "GET", path, token)
+        samples.append(time.perf_counter() - t0)
+        if status != 200:
+            raise RuntimeError(f"GET {path} -> {status} {body}")
+    size = len(json.dumps(body).encode())
+    print(format_latencies(label, samples) + f" size={size / 1024:8.1f}KiB")
+
+
+async def _run(args, db_path: str):
+    import main
+
+    today = date.today()
+    month_start = today.replace(day=1)
+    # 従来のカレンダーの表示範囲（前月末〜次月初を含む6週間）
+    grid_start = month_start - timedelta(days=(month_start.weekday() + 1) % 7)
+    grid_end = grid_start + timedelta(days=41)
+
+    for index, years in enumerate(args.years):
+        status, _, data = await asgi_request(main.app, "POST", "/auth/signup",
+                                             body={"email": f"calendar{index}@example.com", "password": "benchmark-pass"})
+        if status != 200:
+            raise RuntimeError(f"signup failed: {status} {data}")
+        token = data["access_token"]
+        workouts = seed_training_history(db_path, data["user"]["id"], days=years * 365, workouts_per_week=5)
+        print(f"--- {years}年分の履歴（ワークアウト {workouts} 件）")
+        await _measure("従来方式（GET /workouts）",
+                       f"/workouts?from_date={grid_start}&to_date={grid_end}&unbounded=true",
+                       main.app, token, args.iterations)
+        await _measure("月表示（calendar?month）", f"/workouts/calendar?month={today:%Y-%m}",
+                       main.app, token, args.iterations)
+        await _measure("年間ヒートマップ（calendar?year）", f"/workouts/calendar?year={today.year}",
+                       main.app, token, args.iterations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 20])
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="myfit-calendar-")
+    db_path = os.path.join(workdir, "calendar.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+    asyncio.run(_run(args, db_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+ワークアウトのツリー読み込み（workout_tree）のクエリ数チェックとベンチマーク
+
+    cd backend
+    python -m benchmarks.workout_tree [--sizes 1 5 50] [--iterations 20]
+
+--sizes の各件数 N について GET /workouts/recent?limit=N 相当のワークアウトを
+  - workout_tree.load_workout_trees（ワークアウト・種目・セットの3クエリ）
+  - 参考: 従来の joinedload（種目とセットを1クエリで結合、行数は種目数×セット数）
+で読み込み、クエリ数とレイテンシを比較する。あわせて
+  - クエリ数が N によらず WORKOUT_TREE_QUERIES 件であること
+  - 削除済みの種目を参照するワークアウト種目がツリーに含まれないこと
+  - 種目が order_index、セットが set_index の順であること
+を確認し、違反があれば終了コード1で終了する。
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.common import asgi_request, format_latencies, seed_training_history
+
+WORKOUT_TREE_QUERIES = 3
+
+
+def _add_orphans(db_path: str, user_id: int) -> int:
+    """最新のワークアウトに、存在しない種目を参照するワークアウト種目を追加する（外部キー検査なしの接続で）"""
+    conn = sqlite3.connect(db_path)
+    try:
+        workout_id = conn.execute(
+            "SELECT id FROM workouts WHERE user_id = ? ORDER BY date DESC LIMIT 1", (user_id,)
+        ).fetchone()[0]
+        conn.execute(
+            "INSERT INTO workout_exercises (workout_id, exercise_id, order_index) VALUES (?, ?, ?)",
+            (workout_id, 999999, -1),
+        )
+        conn.commit()
+        return workout_id
+    finally:
+        conn.close()
+
+
+def _check_tree(workouts: list) -> list:
+    problems = []
+    for workout in workouts:
+        order = [(we.order_index, we.id) for we in workout.workout_exercises]
+        if order != sorted(order):
+            problems.append(f"workout {workout.id}: 種目が order_index 順ではありません")
+        for we in workout.workout_exercises:
+            if we.exercise is None:
+                problems.append(f"workout {workout.id}: 種目のないワークアウト種目 {we.id} が含まれています")
+            sets = [(s.set_index, s.id) for s in we.sets]
+            if sets != sorted(sets):
+                problems.append(f"workout_exercise {we.id}: セットが set_index 順ではありません")
+    return problems
+
+
+async def _run(args, db_path: str) -> list:
+    import main
+    import models
+    import workout_tree
+    from database import AsyncSessionLocal
+    from query_metrics import capture_queries
+    from sqlalchemy import select
+    from sqlalchemy.orm import joinedload
+
+    status, _, data = await asgi_request(main.app, "POST", "/auth/signup",
+                                         body={"email": "tree@example.com", "password": "benchmark-pass"})
+    if status != 200:
+        raise RuntimeError(f"signup failed: {status} {data}")
+    user_id, token = data["user"]["id"], data["access_token"]
+    seed_training_history(db_path, user_id, days=max(args.sizes) * 2, workouts_per_week=7,
+                          exercises_per_workout=5, sets_per_exercise=5)
+    orphan_workout_id = _add_orphans(db_path, user_id)
+
+    def recent(limit: int):
+        return (select(models.Workout)
+                .where(models.Workout.user_id == user_id, models.Workout.is_completed == True)
+                .order_by(models.Workout.date.desc()).limit(limit))
+
+    async def load_tree(limit: int):
+        async with AsyncSessionLocal() as db:
+            return await workout_tree.load_workout_trees(db, recent(limit))
+
+    async def load_joined(limit: int):
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(recent(limit).options(
+                joinedload(models.Workout.workout_exercises).joinedload(models.WorkoutExercise.exercise),
+                joinedload(models.Workout.workout_exercises).joinedload(models.WorkoutExercise.sets),
+                joinedload(models.Workout.workout_exercises).joinedload(models.WorkoutExercise.exercise_variant)
+            ))).unique().scalars().all()
+
+    problems = []
+    for size in args.sizes:
+        print(f"--- N={size}")
+        for label, load in (("workout_tree", load_tree), ("参考: joinedload", load_joined)):
+            samples = []
+            for _ in range(args.iterations):
+                with capture_queries() as stats:
+                    t0 = time.perf_counter()
+                    workouts = await load(size)
+                    samples.append(time.perf_counter() - t0)
+            print(format_latencies(label, samples) + f" queries={stats.count}")
+            if load is load_tree:
+                if len(workouts) != size:
+                    problems.append(f"N={size}: ワークアウトが {len(workouts)} 件です")
+                if stats.count != WORKOUT_TREE_QUERIES:
+                    problems.append(f"N={size}: クエリ数 {stats.count} が {WORKOUT_TREE_QUERIES} ではありません")
+                problems += [f"N={size}: {problem}" for problem in _check_tree(workouts)]
+
+    # エンドポイント経由でも削除済みの種目が除外されること
+    status, _, body = await asgi_request(main.app, "GET", f"/workouts/{orphan_workout_id}", token)
+    if status != 200 or any(we["exercise"] is None for we in body["workout_exercises"]):
+        problems.append(f"GET /workouts/{orphan_workout_id}: 種目のないワークアウト種目が含まれています")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 50])
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="myfit-workout-tree-")
+    db_path = os.path.join(workdir, "tree.db")
+    os.environ["MYFIT_DATABASE_URL"] = f"sqlite:///{db_path}"
+    problems = asyncio.run(_run(args, db_path))
+    print(f"違反: {len(problems)} 件")
+    for problem in problems:
+        print(f"  {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+身体データ分析用のスナップショット（体重・体脂肪率・身長のタイムライン）
+
+/analytics/body/summary・/analytics/body/advanced-summary・/analytics/body/bmi-history は
+load_body_snapshot でユーザーの記録をまとめて読み込み、BMI・推定体脂肪率・BMI区分を1回の走査で求めた
+スナップショットを共有する。体重・体脂肪率のトレンドは記録ごとに保存済みの値（body_trends.py）を読む。直近N日の範囲は日時の二分探索で切り出し、日・週・月ごとの集約もここで行う。
+スナップショットはユーザーIDをキーにプロセス内でキャッシュし、同一プロセスでの体重・体脂肪率・身長の
+書き込み後に invalidate_body_snapshot で破棄する（別プロセスからの変更はTTLで反映される）。
+"""
+
+import os
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from cache import TTLCache
+from training_rollups import bucket_start
+
+BODY_SNAPSHOT_TTL_SECONDS = float(os.getenv("MYFIT_BODY_SNAPSHOT_TTL_SECONDS", "300"))
+BODY_SNAPSHOT_MAX_ENTRIES = int(os.getenv("MYFIT_BODY_SNAPSHOT_MAX_ENTRIES", "1024"))
+
+body_snapshot_cache = TTLCache(maxsize=BODY_SNAPSHOT_MAX_ENTRIES, ttl_seconds=BODY_SNAPSHOT_TTL_SECONDS)
+
+# 読み込み中に書き込みがあった場合に古いスナップショットをキャッシュしないための世代番号
+_generations: dict = {}
+_generations_lock = threading.Lock()
+
+
+def round_or_none(value: Optional[float], digits: int = 1) -> Optional[float]:
+    return round(value, digits) if value is not None else None
+
+
+def bmi_category(bmi: float) -> str:
+    """BMIの区分"""
+    if bmi < 18.5:
+        return "低体重"
+    if bmi < 25:
+        return "標準"
+    if bmi < 30:
+        return "過体重"
+    return "肥満"
+
+
+def estimated_body_fat(bmi: Optional[float]) -> Optional[float]:
+    """BMIからの推定体脂肪率（年齢25歳として計算、5〜50%に丸める）"""
+    if not bmi:
+        return None
+    return max(5, min(50, round(1.39 * bmi + 0.16 * 25 - 10.34, 1)))
+
+
+def estimated_body_fat_for(bmi: Optional[float], age: Optional[int], gender: Optional[str]) -> Optional[float]:
+    """性別・年齢を考慮した推定体脂肪率（5〜50%に丸める）"""
+    if not bmi or not age or not gender:
+        return None
+    if gender == "male":
+        value = round(1.20 * bmi + 0.23 * age - 16.2, 1)
+    elif gender == "female":
+        value = round(1.20 * bmi + 0.23 * age - 5.4, 1)
+    else:
+        return None
+    return max(5, min(50, value)) if value else value
+
+
+@dataclass(frozen=True)
+class BodyPoint:
+    """体重の記録1件と派生値"""
+    id: int
+    date: datetime
+    body_weight: float
+    body_fat_percent: Optional[float]
+    note: Optional[str]
+    bmi: Optional[float]                  # 最新の身長で計算（小数1桁）
+    bmi_category: Optional[str]
+    estimated_body_fat: Optional[float]
+    trend_weight: Optional[float]
+    weight_trend_per_week: Optional[float]
+    trend_body_fat: Optional[float]
+
+
+@dataclass
+class BodySnapshot:
+    """ユーザーの身体データのタイムライン（日時の古い順）"""
+    user_id: int
+    latest_height: Optional[float]
+    total_records: int
+    weights: list = field(default_factory=list)        # BodyPoint（体重のある記録）
+    body_fat: list = field(default_factory=list)       # (日時, 体脂肪率, トレンド, 1週間あたりの変化量)
+    _weight_keys: list = field(default_factory=list, repr=False)      # 体重の記録の (日時, ID)
+    _body_fat_dates: list = field(default_factory=list, repr=False)
+
+    def recent_weights(self, days: int, now: Optional[datetime] = None) -> list:
+        """直近 days 日の体重の記録（新しい順）"""
+        return self.weights_between((now or datetime.now()) - timedelta(days=days))[::-1]
+
+    def weights_between(self, start: datetime, before: Optional[tuple] = None) -> list:
+        """start 以降で、(日時, ID) が before より前の体重の記録（古い順）"""
+        first = bisect_left(self._weight_keys, (start,))
+        last = bisect_left(self._weight_keys, before) if before is not None else len(self.weights)
+        return self.weights[first:last]
+
+    def bucket_weights(self, points: list, granularity: str) -> list:
+        """体重の記録（古い順）を日・週・月ごとに集約する（平均体重とそのBMI、最小・最大、件数）"""
+        height_m2 = (self.latest_height / 100) ** 2 if self.latest_height else None
+        buckets = []
+        for point in points:
+            start = bucket_start(granularity, point.date)
+            if not buckets or buckets[-1][0] != start:
+                buckets.append([start, 0, 0.0, point.body_weight, point.body_weight])
+            bucket = buckets[-1]
+            bucket[1] += 1
+            bucket[2] += point.body_weight
+            bucket[3] = min(bucket[3], point.body_weight)
+            bucket[4] = max(bucket[4], point.body_weight)
+
+        result = []
+        for start, count, total, min_weight, max_weight in buckets:
+            average = total / count
+            bmi = round(average / height_m2, 1) if average and height_m2 else None
+            result.append({
+                "date": start,
+                "weight": round(average, 1),
+                "min_weight": min_weight,
+                "max_weight": max_weight,
+                "records": count,
+                "bmi": bmi,
+                "bmi_category": bmi_category(bmi) if bmi is not None else None,
+            })
+        return result
+
+    def recent_body_fat(self, days: int, now: Optional[datetime] = None) -> list:
+        """直近 days 日の体脂肪率の記録 (日時, 体脂肪率, トレンド, 変化量)（新しい順）"""
+        start = bisect_left(self._body_fat_dates, (now or datetime.now()) - timedelta(days=days))
+        return self.body_fat[start:][::-1]
+
+    def latest_trends(self) -> dict:
+        """最新の体重・体脂肪率のトレンドと1週間あたりの変化量"""
+        weight = self.weights[-1] if self.weights else None
+        body_fat = self.body_fat[-1] if self.body_fat else None
+        return {
+            "trend_weight": round_or_none(weight.trend_weight if weight else None, 1),
+            "weight_trend_per_week": round_or_none(weight.weight_trend_per_week if weight else None, 2),
+            "trend_body_fat": round_or_none(body_fat[2] if body_fat else None, 1),
+            "body_fat_trend_per_week": round_or_none(body_fat[3] if body_fat else None, 2),
+        }
+
+    def changes(self, recent: list) -> tuple:
+        """期間内の最新と最古の記録の体重差・BMI差（recent は新しい順）"""
+        if len(recent) < 2:
+            return None, None
+        latest, oldest = recent[0], recent[-1]
+        weight_change = round(latest.body_weight - oldest.body_weight, 1)
+        bmi_change = None
+        if latest.bmi and self.latest_height:
+            bmi_change = round(latest.bmi - oldest.body_weight / ((self.latest_height / 100) ** 2), 1)
+        return weight_change, bmi_change
+
+    def body_fat_trend(self, days: int, now: Optional[datetime] = None) -> str:
+        """期間内の最新と最古の体脂肪率のトレンド値の差による判定（"improving" / "stable" / "concerning"）"""
+        records = self.recent_body_fat(days, now)
+        if len(records) < 3 or records[0][2] is None or records[-1][2] is None:
+            return "stable"
+        diff = records[0][2] - records[-1][2]
+        if diff < -1:
+            return "improving"
+        if diff > 1:
+            return "concerning"
+        return "stable"
+
+
+def build_body_snapshot(user_id: int, latest_height: Optional[float], rows) -> BodySnapshot:
+    """(id, 日時, 体重, 体脂肪率, メモ, トレンド列...) の行（日時の古い順）から派生値を1回の走査で求める"""
+    height_m2 = (latest_height / 100) ** 2 if latest_height else None
+    snapshot = BodySnapshot(user_id=user_id, latest_height=latest_height, total_records=0)
+    for (metric_id, metric_date, body_weight, body_fat_percent, note,
+         trend_weight, weight_trend_per_week, trend_body_fat, body_fat_trend_per_week) in rows:
+        snapshot.total_records += 1
+        if body_fat_percent is not None:
+            snapshot.body_fat.append((metric_date, body_fat_percent, trend_body_fat, body_fat_trend_per_week))
+            snapshot._body_fat_dates.append(metric_date)
+        if body_weight is None:
+            continue
+        bmi = round(body_weight / height_m2, 1) if body_weight and height_m2 else None
+        snapshot.weights.append(BodyPoint(
+            id=metric_id,
+            date=metric_date,
+            body_weight=body_weight,
+            body_fat_percent=body_fat_percent,
+            note=note,
+            bmi=bmi,
+            bmi_category=bmi_category(bmi) if bmi is not None else None,
+            estimated_body_fat=estimated_body_fat(bmi),
+            trend_weight=trend_weight,
+            weight_trend_per_week=weight_trend_per_week,
+            trend_body_fat=trend_body_fat,
+        ))
+        snapshot._weight_keys.append((metric_date, metric_id))
+    return snapshot
+
+
+async def load_body_snapshot(db: AsyncSession, user_id: int) -> BodySnapshot:
+    """ユーザーの身体データのスナップショットを返す（キャッシュになければ2クエリで読み込む）"""
+    snapshot = body_snapshot_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+
+    with _generations_lock:
+        generation = _generations.get(user_id, 0)
+
+    latest_height = await db.scalar(
+        select(models.HeightRecord.height_cm)
+        .where(models.HeightRecord.user_id == user_id)
+        .order_by(models.HeightRecord.date.desc())
+        .limit(1)
+    )
+    rows = (await db.execute(
+        select(
+            models.BodyMetric.id,
+            models.BodyMetric.date,
+            models.BodyMetric.body_weight,
+            models.BodyMetric.body_fat_percent,
+            models.BodyMetric.note,
+            models.BodyMetric.trend_weight,
+            models.BodyMetric.weight_trend_per_week,
+            models.BodyMetric.trend_body_fat,
+            models.BodyMetric.body_fat_trend_per_week,
+        )
+        .where(models.BodyMetric.user_id == user_id)
+        .order_by(models.BodyMetric.date, models.BodyMetric.id)
+    )).all()
+    snapshot = build_body_snapshot(user_id, latest_height, rows)
+
+    with _generations_lock:
+        if _generations.get(user_id, 0) == generation:
+            body_snapshot_cache.set(user_id, snapshot)
+    return snapshot
+
+
+def invalidate_body_snapshot(user_id: int) -> None:
+    """体重・体脂肪率・身長の書き込み（コミット）後に呼び、スナップショットを破棄する"""
+    with _generations_lock:
+        _generations[user_id] = _generations.get(user_id, 0) + 1
+        body_snapshot_cache.pop(user_id)
@@ -0,0 +1,149 @@
+"""
+体重・体脂肪率のトレンド（指数平滑化）の計算と保存
+
+測定値を時間間隔に応じた係数で指数平滑化したトレンド値と、その変化量（1週間あたり、同じ係数で平滑化）を
+BodyMetric の行ごとに保存する（測定値のない系列の列は NULL）。
+平滑化係数は1日あたり TREND_ALPHA で、間隔が d 日なら 1 - (1 - TREND_ALPHA) ** d を使う
+（1日に複数回測っても、数日空いても同じ時定数になる）。
+
+記録の追加・更新時は refresh_body_trends をその記録の日時から呼ぶ。直前の測定のトレンドを起点に
+その日時以降の行だけを計算し直すため、最新の記録の追加は1行の計算で済む。
+
+    cd backend
+    python body_trends.py rebuild [--user-id ID]   # 全記録から再計算（バックフィル）
+    python body_trends.py check [--user-id ID]     # 全件再計算と比較（不一致があれば終了コード1）
+"""
+
+import math
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import run_read_model_cli
+import models
+
+TREND_ALPHA = 0.1           # 1日あたりの平滑化係数
+MIN_GAP_DAYS = 1 / 24       # 同時刻の測定も1時間空いたものとして扱う
+
+# 系列名 → (測定値の列, トレンドの列, 1週間あたりの変化量の列)
+SERIES = {
+    "weight": ("body_weight", "trend_weight", "weight_trend_per_week"),
+    "body_fat": ("body_fat_percent", "trend_body_fat", "body_fat_trend_per_week"),
+}
+TREND_COLUMNS = [column for _, trend, rate in SERIES.values() for column in (trend, rate)]
+
+
+def advance(previous: Optional[tuple], value: float, when: datetime) -> tuple:
+    """直前の状態 (日時, トレンド, 1週間あたりの変化量) に測定値を1件加えた (トレンド, 変化量) を返す"""
+    if previous is None:
+        return value, 0.0
+    previous_date, previous_trend, previous_rate = previous
+    gap = max((when - previous_date).total_seconds() / 86400, MIN_GAP_DAYS)
+    factor = 1 - (1 - TREND_ALPHA) ** gap
+    trend = previous_trend + factor * (value - previous_trend)
+    rate = previous_rate + factor * ((trend - previous_trend) / gap * 7 - previous_rate)
+    return trend, rate
+
+
+def compute_trends(rows, previous: Optional[dict] = None) -> dict:
+    """
+    (id, 日時, 体重, 体脂肪率) の行（日時・IDの昇順）のトレンドを求め、id → {列名: 値} を返す
+
+    previous には系列名 → 直前の状態 (日時, トレンド, 変化量) を渡せる（途中からの再計算用）。
+    """
+    state = dict(previous or {})
+    result = {}
+    for metric_id, metric_date, body_weight, body_fat_percent in rows:
+        values = {"weight": body_weight, "body_fat": body_fat_percent}
+        columns = dict.fromkeys(TREND_COLUMNS)
+        for name, (_, trend_column, rate_column) in SERIES.items():
+            if values[name] is None:
+                continue
+            trend, rate = advance(state.get(name), values[name], metric_date)
+            state[name] = (metric_date, trend, rate)
+            columns[trend_column] = trend
+            columns[rate_column] = rate
+        result[metric_id] = columns
+    return result
+
+
+async def _previous_states(db: AsyncSession, user_id: int, since: datetime) -> dict:
+    """since より前の最後の測定の状態（系列ごと）"""
+    states = {}
+    for name, (_, trend_column, rate_column) in SERIES.items():
+        trend = getattr(models.BodyMetric, trend_column)
+        row = (await db.execute(
+            select(models.BodyMetric.date, trend, getattr(models.BodyMetric, rate_column))
+            .where(
+                models.BodyMetric.user_id == user_id,
+                models.BodyMetric.date < since,
+                trend.isnot(None)
+            )
+            .order_by(models.BodyMetric.date.desc(), models.BodyMetric.id.desc())
+            .limit(1)
+        )).first()
+        if row:
+            states[name] = tuple(row)
+    return states
+
+
+async def refresh_body_trends(db: AsyncSession, user_id: int, since: Optional[datetime] = None):
+    """
+    since 以降（None なら全期間）の記録のトレンドを計算し直す（コミットは呼び出し側）
+
+    since より前の行は変わらないため、直前の測定の状態から続けて計算する。
+    """
+    await db.flush()
+    previous = await _previous_states(db, user_id, since) if since is not None else {}
+    query = select(
+        models.BodyMetric.id,
+        models.BodyMetric.date,
+        models.BodyMetric.body_weight,
+        models.BodyMetric.body_fat_percent,
+    ).where(models.BodyMetric.user_id == user_id)
+    if since is not None:
+        query = query.where(models.BodyMetric.date >= since)
+    rows = (await db.execute(query.order_by(models.BodyMetric.date, models.BodyMetric.id))).all()
+
+    trends = compute_trends(rows, previous)
+    if trends:
+        await db.execute(update(models.BodyMetric), [
+            {"id": metric_id, **columns} for metric_id, columns in trends.items()
+        ])
+
+
+async def check_body_trends(db: AsyncSession, user_id: int) -> list:
+    """保存されているトレンドと全件再計算を比較し、不一致の説明のリストを返す"""
+    rows = (await db.execute(
+        select(
+            models.BodyMetric.id,
+            models.BodyMetric.date,
+            models.BodyMetric.body_weight,
+            models.BodyMetric.body_fat_percent,
+            *(getattr(models.BodyMetric, column) for column in TREND_COLUMNS),
+        )
+        .where(models.BodyMetric.user_id == user_id)
+        .order_by(models.BodyMetric.date, models.BodyMetric.id)
+    )).all()
+    expected = compute_trends([row[:4] for row in rows])
+
+    problems = []
+    for row in rows:
+        for column, stored in zip(TREND_COLUMNS, row[4:]):
+            value = expected[row.id][column]
+            if value is None or stored is None:
+                if value != stored:
+                    problems.append(f"body_metric {row.id} {column}: 期待値 {value} / 保存値 {stored}")
+            elif not math.isclose(value, stored, rel_tol=1e-9, abs_tol=1e-9):
+                problems.append(f"body_metric {row.id} {column}: 期待値 {value} / 保存値 {stored}")
+    return problems
+
+
+def main():
+    run_read_model_cli(__doc__, rebuild=refresh_body_trends, check=check_body_trends)
+
+
+if __name__ == "__main__":
+    main()
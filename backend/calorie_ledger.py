@@ -0,0 +1,392 @@
+"""
+ワークアウトごとの消費カロリー台帳（workout_calories）
+
+消費カロリーはワークアウト完了時に一度だけ計算して保存し、ダッシュボード・カロリー分析は台帳を読む。
+計算にはワークアウト日時点で有効な体重（その日以前の最新の記録、それより前の記録がなければ最初の記録）
+を使う。体重はユーザーごとの日付順のタイムラインから二分探索で引く。
+
+台帳の行は次の場合に再計算する。
+  - 完了済みワークアウトのセット・種目の追加・削除（同じトランザクション内）
+  - 体重記録の追加・更新（その記録が有効な期間のワークアウトだけをバックグラウンドで）
+  - 種目のMETs値の変更（その種目を含むワークアウトだけをバックグラウンドで。
+    イベントループのない別プロセス（シードスクリプトなど）での変更は recompute コマンドで反映する）
+
+台帳の読み取り（get_ledger）は書き込まない。台帳にない完了済みワークアウト（台帳の導入前の履歴）は
+API の起動時に backfill_missing_ledgers で記録する（backfill コマンドでも同じ処理を実行できる）。
+
+    cd backend
+    python calorie_ledger.py backfill [--user-id ID]         # 台帳にない完了済みワークアウトだけを記録する
+    python calorie_ledger.py rebuild [--user-id ID]          # 全完了済みワークアウトの台帳を作り直す
+    python calorie_ledger.py recompute --exercise-id ID ...  # 指定種目を含むワークアウトを再計算
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, delete, event, exists, func, inspect, or_, select, true
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import data_versions
+import models
+from calories import as_datetime, calculate_calories
+
+logger = logging.getLogger(__name__)
+
+# セッションの info に変更された種目IDを溜めるキー（コミット後に再計算を予約する）
+_METS_CHANGED_KEY = "calorie_ledger_mets_changed"
+
+# 1回のINSERTで書き込む行数
+UPSERT_BATCH_SIZE = 500
+
+# 実行中のバックグラウンド再計算（タスクが途中で破棄されないよう参照を保持する）
+_background_tasks = set()
+
+
+class WeightTimeline:
+    """ユーザーの体重記録を日付順に並べたもの（日時点の体重を二分探索で引く）"""
+
+    def __init__(self, records: Iterable[tuple]):
+        records = sorted(records)
+        self.dates = [record_date for record_date, _ in records]
+        self.weights = [weight for _, weight in records]
+
+    def __bool__(self):
+        return bool(self.dates)
+
+    def weight_at(self, when) -> Optional[float]:
+        """日時点で有効な体重（それ以前の記録がなければ最初の記録、記録がなければ None）"""
+        if not self.dates:
+            return None
+        index = bisect_right(self.dates, as_datetime(when))
+        return self.weights[max(index - 1, 0)]
+
+    def affected_range(self, record_date) -> tuple:
+        """record_date の記録を使うワークアウトの期間 (開始 | None, 終了（未満） | None)"""
+        record_date = as_datetime(record_date)
+        # 最初の記録はそれより前のワークアウトにも使われる
+        start = record_date if bisect_left(self.dates, record_date) > 0 else None
+        index = bisect_right(self.dates, record_date)
+        end = self.dates[index] if index < len(self.dates) else None
+        return start, end
+
+
+async def load_weight_timeline(db: AsyncSession, user_id: int) -> WeightTimeline:
+    rows = await db.execute(
+        select(models.BodyMetric.date, models.BodyMetric.body_weight)
+        .where(models.BodyMetric.user_id == user_id, models.BodyMetric.body_weight.isnot(None))
+        .order_by(models.BodyMetric.date)
+    )
+    return WeightTimeline(rows.all())
+
+
+@dataclass
+class LedgerEntry:
+    """台帳の1行（ワークアウト1件分の消費カロリーと種目別内訳）"""
+    workout_id: int
+    date: datetime
+    body_weight: float
+    total: float = 0.0
+    by_exercise: dict = field(default_factory=dict)  # exercise_id -> kcal
+
+    @classmethod
+    def from_row(cls, row: models.WorkoutCalories) -> "LedgerEntry":
+        by_exercise = json.loads(row.exercise_calories) if row.exercise_calories else {}
+        return cls(
+            workout_id=row.workout_id,
+            date=row.workout_date,
+            body_weight=row.body_weight,
+            total=row.total_calories,
+            by_exercise={int(exercise_id): kcal for exercise_id, kcal in by_exercise.items()},
+        )
+
+
+async def refresh_workout_calories(
+    db: AsyncSession,
+    user_id: int,
+    workouts: dict,
+    timeline: Optional[WeightTimeline] = None,
+) -> list:
+    """
+    ワークアウト {workout_id: date} の台帳を計算して保存し、LedgerEntry のリストを返す（コミットは呼び出し側）
+
+    体重記録がまだないユーザーは計算できないため何も保存しない。
+    """
+    if not workouts:
+        return []
+    if timeline is None:
+        timeline = await load_weight_timeline(db, user_id)
+    if not timeline:
+        return []
+
+    # 未反映の変更（削除したセットなど）を計算に含める
+    await db.flush()
+    # 消費カロリーは体重に比例するため体重1kgあたりで計算し、ワークアウトごとの体重を掛ける
+    per_kg = await calculate_calories(db, 1.0, workout_ids=workouts.keys())
+
+    entries = []
+    for workout_id, workout_date in workouts.items():
+        weight = timeline.weight_at(workout_date)
+        computed = per_kg.get(workout_id)
+        entries.append(LedgerEntry(
+            workout_id=workout_id,
+            date=workout_date,
+            body_weight=weight,
+            total=computed.total * weight if computed else 0.0,
+            by_exercise={
+                exercise_id: kcal * weight for exercise_id, kcal in computed.by_exercise.items()
+            } if computed else {},
+        ))
+
+    # SQLiteのバインド変数の上限を超えないよう分割して書き込む
+    for offset in range(0, len(entries), UPSERT_BATCH_SIZE):
+        statement = sqlite_insert(models.WorkoutCalories).values([
+            {
+                "workout_id": entry.workout_id,
+                "user_id": user_id,
+                "workout_date": entry.date,
+                "body_weight": entry.body_weight,
+                "total_calories": entry.total,
+                "exercise_calories": json.dumps(entry.by_exercise),
+            }
+            for entry in entries[offset:offset + UPSERT_BATCH_SIZE]
+        ])
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[models.WorkoutCalories.workout_id],
+            set_={
+                "workout_date": statement.excluded.workout_date,
+                "body_weight": statement.excluded.body_weight,
+                "total_calories": statement.excluded.total_calories,
+                "exercise_calories": statement.excluded.exercise_calories,
+                "computed_at": func.now(),
+            },
+        ))
+    return entries
+
+
+async def refresh_if_completed(db: AsyncSession, user_id: int, workout_id: int, workout_date, is_completed: bool):
+    """完了済みワークアウトの内容が変わったときに台帳を更新する"""
+    if is_completed:
+        await refresh_workout_calories(db, user_id, {workout_id: workout_date})
+
+
+async def get_ledger(db: AsyncSession, user_id: int, date_from=None, date_to=None, week=None) -> list:
+    """
+    期間内（ローカル日付が date_from 以上、date_to 未満、week を指定するとそのISO週）の
+    完了済みワークアウトの台帳を日付の新しい順に返す（読み取りのみ）
+
+    台帳にない完了済みワークアウト（体重記録がまだない、台帳の導入前の履歴）は含まれない。
+    """
+    query = (
+        select(models.WorkoutCalories)
+        .join(models.Workout, models.WorkoutCalories.workout_id == models.Workout.id)
+        .where(models.Workout.user_id == user_id, models.Workout.is_completed == True)
+    )
+    if date_from is not None:
+        query = query.where(models.Workout.local_date >= date_from)
+    if date_to is not None:
+        query = query.where(models.Workout.local_date < date_to)
+    if week is not None:
+        query = query.where(models.Workout.local_week == week)
+
+    entries = [LedgerEntry.from_row(row) for row in (await db.scalars(query)).all()]
+    return sorted(entries, key=lambda entry: entry.date, reverse=True)
+
+
+def total_calories(entries: Iterable[LedgerEntry], date_from=None, date_to=None) -> float:
+    """台帳の行を（必要なら期間で絞って）合計する"""
+    date_from, date_to = as_datetime(date_from), as_datetime(date_to)
+    return sum(
+        entry.total
+        for entry in entries
+        if (date_from is None or entry.date >= date_from) and (date_to is None or entry.date < date_to)
+    )
+
+
+async def _completed_workouts(db: AsyncSession, user_id: int, ranges: Iterable[tuple]) -> dict:
+    """期間 (開始 | None, 終了（未満） | None) のいずれかに入る完了済みワークアウト {workout_id: date}"""
+    conditions = []
+    for start, end in ranges:
+        bounds = []
+        if start is not None:
+            bounds.append(models.Workout.date >= start)
+        if end is not None:
+            bounds.append(models.Workout.date < end)
+        conditions.append(and_(true(), *bounds))
+    rows = await db.execute(
+        select(models.Workout.id, models.Workout.date)
+        .where(models.Workout.user_id == user_id, models.Workout.is_completed == True, or_(*conditions))
+    )
+    return dict(rows.all())
+
+
+async def recompute_for_body_metrics(user_id: int, record_dates: Iterable):
+    """体重記録の追加・更新後に、その記録が有効な期間のワークアウトだけを再計算する（バックグラウンド用）"""
+    from database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        timeline = await load_weight_timeline(db, user_id)
+        if not timeline:
+            return
+        workouts = await _completed_workouts(db, user_id, [timeline.affected_range(d) for d in record_dates])
+        if workouts:
+            await refresh_workout_calories(db, user_id, workouts, timeline)
+            await data_versions.bump(db, user_id, "workouts")
+            await db.commit()
+
+
+async def recompute_for_exercises(exercise_ids: Iterable[int]):
+    """METs値が変わった種目を含む完了済みワークアウトを、ユーザーごとに再計算する"""
+    from database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(
+            select(models.Workout.user_id, models.Workout.id, models.Workout.date)
+            .join(models.WorkoutExercise, models.WorkoutExercise.workout_id == models.Workout.id)
+            .where(
+                models.WorkoutExercise.exercise_id.in_(list(exercise_ids)),
+                models.Workout.is_completed == True
+            )
+            .distinct()
+        )
+        by_user = {}
+        for user_id, workout_id, workout_date in rows:
+            by_user.setdefault(user_id, {})[workout_id] = workout_date
+
+        for user_id, workouts in by_user.items():
+            await refresh_workout_calories(db, user_id, workouts)
+            await data_versions.bump(db, user_id, "workouts")
+            await db.commit()
+        return sum(len(workouts) for workouts in by_user.values())
+
+
+async def backfill_ledger(db: AsyncSession, user_id: int) -> int:
+    """台帳にない完了済みワークアウトだけを計算して記録する（コミットは呼び出し側）"""
+    rows = await db.execute(
+        select(models.Workout.id, models.Workout.date)
+        .outerjoin(models.WorkoutCalories, models.WorkoutCalories.workout_id == models.Workout.id)
+        .where(
+            models.Workout.user_id == user_id,
+            models.Workout.is_completed == True,
+            models.WorkoutCalories.workout_id.is_(None)
+        )
+    )
+    return len(await refresh_workout_calories(db, user_id, dict(rows.all())))
+
+
+async def backfill_missing_ledgers() -> int:
+    """
+    台帳にない完了済みワークアウトのあるユーザーを backfill し、記録したワークアウト数を返す（API の起動時に実行）
+
+    体重記録のないユーザーは計算できないため対象にしない（記録がなければ1クエリで終わる）。
+    """
+    from database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        user_ids = (await db.scalars(
+            select(models.Workout.user_id)
+            .outerjoin(models.WorkoutCalories, models.WorkoutCalories.workout_id == models.Workout.id)
+            .where(
+                models.Workout.is_completed == True,
+                models.WorkoutCalories.workout_id.is_(None),
+                exists().where(
+                    models.BodyMetric.user_id == models.Workout.user_id,
+                    models.BodyMetric.body_weight.isnot(None)
+                )
+            )
+            .distinct()
+        )).all()
+
+        total = 0
+        for user_id in user_ids:
+            count = await backfill_ledger(db, user_id)
+            if count:
+                await data_versions.bump(db, user_id, "workouts")
+            await db.commit()
+            total += count
+    if total:
+        logger.info("消費カロリー台帳にない完了済みワークアウト %d 件を記録しました", total)
+    return total
+
+
+async def rebuild_ledger(db: AsyncSession, user_id: int) -> int:
+    """ユーザーの台帳を全完了済みワークアウトについて作り直す（コミットは呼び出し側）"""
+    await db.execute(delete(models.WorkoutCalories).where(models.WorkoutCalories.user_id == user_id))
+    workouts = await _completed_workouts(db, user_id, [(None, None)])
+    return len(await refresh_workout_calories(db, user_id, workouts))
+
+
+def _run_in_background(coroutine_function, *args):
+    task = asyncio.get_running_loop().create_task(coroutine_function(*args))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@event.listens_for(models.Exercise, "after_update")
+def _collect_mets_change(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes()
+           for name in ("custom_mets_value", "builtin_mets_value", "exercise_type")):
+        state.session.info.setdefault(_METS_CHANGED_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _schedule_mets_recompute(session):
+    exercise_ids = session.info.pop(_METS_CHANGED_KEY, None)
+    if not exercise_ids:
+        return
+    try:
+        _run_in_background(recompute_for_exercises, exercise_ids)
+    except RuntimeError:
+        # イベントループのないプロセスでの変更
+        ids = " ".join(str(exercise_id) for exercise_id in sorted(exercise_ids))
+        logger.warning("METs値が変更されました。消費カロリー台帳は python calorie_ledger.py recompute --exercise-id %s で更新してください", ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_mets_changes(session):
+    session.info.pop(_METS_CHANGED_KEY, None)
+
+
+def _bumping(command):
+    """台帳を書き換えたユーザーのワークアウトのデータバージョンを進めるコマンドにする"""
+    async def run(db: AsyncSession, user_id: int) -> int:
+        count = await command(db, user_id)
+        if count:
+            await data_versions.bump(db, user_id, "workouts")
+        return count
+    return run
+
+
+async def _run_recompute(exercise_ids: list) -> int:
+    from database import upgrade_database
+
+    upgrade_database()
+    count = await recompute_for_exercises(exercise_ids)
+    print(f"再計算したワークアウト: {count} 件")
+    return 0
+
+
+def main():
+    from database import run_read_model_cli
+
+    # recompute はユーザー単位ではない（種目を含む全ユーザーのワークアウトが対象）ため個別に解析する
+    if sys.argv[1:2] == ["recompute"]:
+        parser = argparse.ArgumentParser(prog="calorie_ledger.py recompute", description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+        parser.add_argument("--exercise-id", type=int, nargs="+", required=True)
+        args = parser.parse_args(sys.argv[2:])
+        sys.exit(asyncio.run(_run_recompute(args.exercise_id)))
+    run_read_model_cli(__doc__, rebuild=_bumping(rebuild_ledger), backfill=_bumping(backfill_ledger))
+
+
+if __name__ == "__main__":
+    main()
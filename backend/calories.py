@@ -0,0 +1,130 @@
+"""
+消費カロリー計算エンジン（ハイブリッドMETs方式）
+
+任意のワークアウト集合（1日、1週間、全期間、ID指定）について、
+セット・種目を1回の結合クエリで取得し、METs値は種目IDで mets_registry から引いて計算する。
+結果はワークアウトごと・種目ごとの内訳付きで返す。
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, time
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from mets_registry import get_exercise_mets
+
+# 筋力トレーニング: 1セット約1分の運動時間（セット間休憩除く）
+STRENGTH_SET_HOURS = 1 / 60
+# 有酸素運動で時間が記録されていない場合は10分と仮定
+CARDIO_DEFAULT_HOURS = 10 / 60
+
+
+def set_calories(exercise_type: str, mets: float, duration_seconds: Optional[int],
+                 avg_heart_rate: Optional[int], weight_kg: float) -> float:
+    """1セットの消費カロリー（METs × 時間 × 体重）"""
+    if exercise_type == 'strength':
+        return STRENGTH_SET_HOURS * mets * weight_kg
+
+    if exercise_type == 'cardio':
+        # 有酸素運動: 時間が記録されている場合はそれを使用
+        if duration_seconds:
+            # 心拍数による調整（記録されている場合）
+            if avg_heart_rate:
+                if avg_heart_rate < 120:
+                    mets = mets * 0.7  # 軽度の調整
+                elif avg_heart_rate > 150:
+                    mets = mets * 1.3  # 高強度の調整
+            return duration_seconds / 3600 * mets * weight_kg
+        return CARDIO_DEFAULT_HOURS * mets * weight_kg
+
+    return 0.0
+
+
+@dataclass
+class WorkoutCalories:
+    """ワークアウト1件分の消費カロリーと種目別内訳"""
+    workout_id: int
+    date: datetime
+    total: float = 0.0
+    by_exercise: dict = field(default_factory=dict)  # exercise_id -> kcal
+
+    def add(self, exercise_id: int, calories: float):
+        self.total += calories
+        self.by_exercise[exercise_id] = self.by_exercise.get(exercise_id, 0.0) + calories
+
+
+async def calculate_calories(
+    db: AsyncSession,
+    weight_kg: float,
+    user_id: Optional[int] = None,
+    workout_ids: Optional[Iterable[int]] = None,
+    date_from=None,
+    date_to=None,
+    completed_only: bool = True,
+) -> dict:
+    """
+    ワークアウト集合の消費カロリーを1クエリで計算し {workout_id: WorkoutCalories} を返す
+
+    user_id と date_from（以上）/ date_to（未満）で期間を、または workout_ids で対象を指定する。
+    completed_only が真なら完了済みワークアウトのみ対象（ID指定時は指定どおり）。
+    セットのないワークアウトは結果に含まれない。
+    """
+    query = (
+        select(
+            models.Workout.id,
+            models.Workout.date,
+            models.Exercise.id,
+            models.Exercise.exercise_type,
+            models.Set.duration_seconds,
+            models.Set.avg_heart_rate,
+        )
+        .select_from(models.Set)
+        .join(models.WorkoutExercise)
+        .join(models.Workout)
+        .join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .where(models.Set.is_warmup == False)  # ウォームアップは除外
+    )
+    if user_id is not None:
+        query = query.where(models.Workout.user_id == user_id)
+    if workout_ids is not None:
+        query = query.where(models.Workout.id.in_(list(workout_ids)))
+    elif completed_only:
+        query = query.where(models.Workout.is_completed == True)
+    if date_from is not None:
+        query = query.where(models.Workout.date >= date_from)
+    if date_to is not None:
+        query = query.where(models.Workout.date < date_to)
+
+    rows = (await db.execute(query)).all()
+    mets_by_exercise = await get_exercise_mets(db, {row[2] for row in rows})
+
+    results = {}
+    for workout_id, workout_date, exercise_id, exercise_type, duration_seconds, avg_heart_rate in rows:
+        workout = results.get(workout_id)
+        if workout is None:
+            workout = results[workout_id] = WorkoutCalories(workout_id=workout_id, date=workout_date)
+        workout.add(
+            exercise_id,
+            set_calories(exercise_type, mets_by_exercise[exercise_id], duration_seconds, avg_heart_rate, weight_kg),
+        )
+    return results
+
+
+def as_datetime(value):
+    """日付をその日の0時の日時にする（日時・None はそのまま）"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time.min)
+
+
+def total_calories(results: dict, date_from=None, date_to=None) -> float:
+    """calculate_calories の結果を（必要なら期間で絞って）合計する"""
+    date_from, date_to = as_datetime(date_from), as_datetime(date_to)
+    return sum(
+        workout.total
+        for workout in results.values()
+        if (date_from is None or workout.date >= date_from) and (date_to is None or workout.date < date_to)
+    )
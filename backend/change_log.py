@@ -0,0 +1,150 @@
+"""
+同期（GET /sync）用のユーザーごとの変更ログ
+
+更新系のエンドポイントは data_versions.bump が返したバージョンで、変更した行を record に渡す
+（同じトランザクション内、1リクエストの変更はすべて同じバージョン）。変更ログはユーザー・テーブル・行ごとに
+最新の操作（upsert / delete）とバージョンだけを保持するため、何度更新しても行は増えず、
+削除は墓石（op = "delete"）として残る。
+
+GET /sync?since=<version> は since より新しいバージョンの行を changes_since で読み、テーブルごとに
+列名を1回だけ並べた形（columns と rows）と削除された ID（deleted）で返す。クライアントはローカルの複製に
+適用し、返された version を次の since に使う。統計・自己ベスト・消費カロリーなどの集計は同期の対象外で、
+応答の domains（data_versions の領域ごとのバージョン）が変わった領域だけ読み直す。
+"""
+
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import data_versions
+import models
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# 同期するテーブル → (モデル, 返す列)。profile は users の行（ID はユーザーID）、
+# settings の dashboard_config はJSON文字列のまま返す。体重のトレンドなどの派生値は含めない。
+SYNC_TABLES = {
+    "exercises": (models.Exercise, ("id", "name", "muscle_group", "exercise_type")),
+    "workouts": (models.Workout, ("id", "date", "local_date", "note", "is_completed", "completed_at")),
+    "workout_exercises": (models.WorkoutExercise, ("id", "workout_id", "exercise_id", "order_index")),
+    "exercise_variants": (models.ExerciseVariant, (
+        "id", "workout_exercise_id", "selected_angle", "selected_grip", "selected_stance", "selected_variation",
+    )),
+    "sets": (models.Set, (
+        "id", "workout_exercise_id", "set_index", "weight", "reps", "rpe",
+        "duration_seconds", "distance_km", "incline_percent", "avg_heart_rate", "is_warmup", "note",
+    )),
+    "body_metrics": (models.BodyMetric, ("id", "date", "local_date", "body_weight", "body_fat_percent", "note")),
+    "height_records": (models.HeightRecord, ("id", "height_cm", "date", "local_date", "note")),
+    "profile": (models.User, ("id", "username", "birth_date", "gender", "timezone")),
+    "settings": (models.UserSettings, ("id", "dashboard_config")),
+}
+
+SYNC_DEFAULT_LIMIT = 1000
+SYNC_MAX_LIMIT = 5000
+
+
+async def record(
+    db: AsyncSession,
+    user_id: int,
+    version: int,
+    upserted: Optional[dict] = None,
+    deleted: Optional[dict] = None,
+):
+    """
+    作成・更新した行（upserted）と削除した行（deleted）を {テーブル: ID の並び} で記録する（コミットは呼び出し側）
+
+    同じ行が両方にあれば削除として記録する。作成した行は flush して ID が決まっていること。
+    """
+    ops = {}
+    for op, changes in ((UPSERT, upserted), (DELETE, deleted)):
+        for table_name, row_ids in (changes or {}).items():
+            if table_name not in SYNC_TABLES:
+                raise ValueError(f"unknown sync table: {table_name}")
+            ops.update(((table_name, row_id), op) for row_id in row_ids)
+    if not ops:
+        return
+
+    statement = sqlite_insert(models.ChangeLogEntry).values([
+        {"user_id": user_id, "table_name": table_name, "row_id": row_id, "op": op, "version": version}
+        for (table_name, row_id), op in ops.items()
+    ])
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[
+            models.ChangeLogEntry.user_id,
+            models.ChangeLogEntry.table_name,
+            models.ChangeLogEntry.row_id,
+        ],
+        set_={"op": statement.excluded.op, "version": statement.excluded.version},
+    ))
+
+
+def _entries_query(user_id: int):
+    log = models.ChangeLogEntry
+    return select(log.table_name, log.row_id, log.op, log.version).where(log.user_id == user_id)
+
+
+async def _current_versions(db: AsyncSession, user_id: int) -> tuple:
+    """(変更ログのバージョン, 領域ごとのバージョン)"""
+    versions = models.UserDataVersion
+    row = (await db.execute(
+        select(versions.changes, *(getattr(versions, domain) for domain in data_versions.DOMAINS))
+        .where(versions.user_id == user_id)
+    )).first()
+    row = row or (0,) * (len(data_versions.DOMAINS) + 1)
+    return row[0], dict(zip(data_versions.DOMAINS, row[1:]))
+
+
+async def changes_since(db: AsyncSession, user_id: int, since: int, limit: int = SYNC_DEFAULT_LIMIT) -> dict:
+    """
+    since より新しい変更（GET /sync の応答）
+
+    1回に返すのは約 limit 行で、バージョンの途中では区切らない（1つのバージョンが limit 行を超える場合は
+    そのバージョンだけをすべて返す）。続きがあれば has_more が真で、version を since にして再度呼ぶ。
+    since が現在のバージョンより新しい（データベースが作り直された）場合は reset を真にして最初から返す。
+    """
+    current, domains = await _current_versions(db, user_id)
+    reset = since > current
+    if reset:
+        since = 0
+
+    log = models.ChangeLogEntry
+    entries = (await db.execute(
+        _entries_query(user_id).where(log.version > since).order_by(log.version).limit(limit + 1)
+    )).all()
+    has_more = len(entries) > limit
+    if has_more:
+        cut = entries[limit].version
+        entries = [entry for entry in entries[:limit] if entry.version < cut]
+        if not entries:
+            entries = (await db.execute(_entries_query(user_id).where(log.version == cut))).all()
+        version = entries[-1].version
+    else:
+        version = current
+
+    upserts, deletes = {}, {}
+    for entry in entries:
+        (upserts if entry.op == UPSERT else deletes).setdefault(entry.table_name, []).append(entry.row_id)
+
+    tables = {}
+    for table_name, (model, columns) in SYNC_TABLES.items():
+        row_ids = upserts.get(table_name, [])
+        deleted = deletes.get(table_name, [])
+        if not row_ids and not deleted:
+            continue
+        rows = []
+        if row_ids:
+            rows = [list(row) for row in (await db.execute(
+                select(*(getattr(model, column) for column in columns))
+                .where(model.id.in_(row_ids))
+                .order_by(model.id)
+            )).all()]
+            # 記録の後で行がなくなっていれば削除として返す
+            found = {row[0] for row in rows}
+            deleted = deleted + [row_id for row_id in row_ids if row_id not in found]
+        tables[table_name] = {"columns": list(columns), "rows": rows, "deleted": sorted(deleted)}
+
+    return {"version": version, "has_more": has_more, "reset": reset, "domains": domains, "tables": tables}
@@ -8,6 +8,129 @@ from database import SessionLocal, engine
 from models import Exercise
 import sys
 
+# 内蔵種目のMETs値（2024 Compendium of Physical Activities準拠）
+# 種目作成・更新時に exercises.builtin_mets_value として保存する（旧 seed_data.py の種目名も含む）
+BUILTIN_EXERCISE_METS = {
+    # 胸 - プレス系
+    'バーベルベンチプレス': 3.5,
+    'ダンベルベンチプレス': 3.5,
+    'スミスマシンベンチプレス': 3.5,
+    'マシンチェストプレス': 3.0,
+
+    # 胸 - フライ系
+    'ダンベルフライ': 3.0,
+    'ケーブルフライ': 3.0,
+    'ペックデック': 3.0,
+
+    # 胸 - 自重
+    'プッシュアップ': 3.0,
+    'ディップス': 3.5,
+
+    # 背中 - 垂直引き
+    'プルアップ': 6.0,
+    'ラットプルダウン': 3.5,
+
+    # 背中 - 水平引き
+    'バーベルローイング': 3.5,
+    'ダンベルロー': 3.5,
+    'シーテッドロー': 3.5,
+    'Tバーロー': 3.5,
+    'チェストサポートロー': 3.0,
+
+    # 背中 - その他
+    'デッドリフト': 5.0,
+    'ルーマニアンデッドリフト': 4.5,
+    'グッドモーニング': 4.0,
+    'シュラッグ': 3.0,
+
+    # 肩 - プレス系
+    'ダンベルショルダープレス': 3.5,
+    'バーベルショルダープレス': 3.5,
+    'アーノルドプレス': 4.0,
+    'スミスマシンショルダープレス': 3.5,
+
+    # 肩 - レイズ系
+    'サイドレイズ': 3.0,
+    'フロントレイズ': 3.0,
+    'リアレイズ': 3.0,
+    'ケーブルサイドレイズ': 3.0,
+
+    # 肩 - その他
+    'アップライトロー': 3.5,
+    'フェイスプル': 3.0,
+
+    # 脚 - 大腿四頭筋
+    'バーベルスクワット': 5.0,
+    'スミスマシンスクワット': 4.5,
+    'レッグプレス': 3.5,
+    'レッグエクステンション': 3.0,
+
+    # 脚 - ハムストリングス・臀部
+    'ヒップスラスト': 4.0,
+    'グルートブリッジ': 3.5,
+    'レッグカール': 3.0,
+
+    # 脚 - その他
+    'ランジ': 4.0,
+    'ステップアップ': 3.5,
+    'カーフレイズ': 3.0,
+
+    # 腕 - 上腕二頭筋
+    'バーベルカール': 3.0,
+    'ダンベルカール': 3.0,
+    'コンセントレーションカール': 3.0,
+    'プリーチャーカール': 3.0,
+    'ケーブルカール': 3.0,
+
+    # 腕 - 上腕三頭筋
+    'トライセプスプレスダウン': 3.0,
+    'オーバーヘッドエクステンション': 3.0,
+    'フレンチプレス': 3.0,
+    'ナローベンチプレス': 3.5,
+    'キックバック': 3.0,
+
+    # 体幹・腹筋
+    'クランチ': 3.0,
+    'シットアップ': 3.0,
+    'レッグレイズ': 3.5,
+    'アブローラー': 4.0,
+    'プランク': 3.0,
+    'ロシアンツイスト': 3.5,
+    'ケーブルウッドチョッパー': 3.5,
+
+    # 前腕・握力
+    'リストカール': 2.5,
+    'リバースリストカール': 2.5,
+    'ハンマーカール': 3.0,
+    'ファーマーズウォーク': 4.0,
+
+    # 有酸素運動
+    'ランニング': 8.0,
+    'ウォーキング': 3.5,
+    'エアロバイク': 7.0,
+    'クロストレーナー': 5.0,
+    'ローイングマシン': 7.0,
+    'ステアクライマー': 6.0,
+    'サーキットトレーニング': 8.0,
+    'ジャンプロープ': 9.0,
+    'HIIT': 10.0,
+
+    # 既存の種目（後方互換性）
+    'ベンチプレス': 3.5,
+    'スクワット': 5.0,
+    'ショルダープレス': 3.5,
+    'バーベルロウ': 3.5,
+    'インクラインベンチプレス': 3.5,
+    'サイクリング': 7.0,
+    'エリプティカル': 5.0,
+    '水泳': 8.0,
+    'ローイング': 7.0,
+}
+
+def get_builtin_exercise_mets(name):
+    """内蔵種目名に対応するMETs値（未登録ならNone）"""
+    return BUILTIN_EXERCISE_METS.get(name)
+
 def get_comprehensive_exercises():
     """training_exercises.mdベースの包括的な種目定義"""
     return [
@@ -593,7 +716,7 @@ def create_comprehensive_exercises():
             ).first()
             
             if not existing:
-                exercise = Exercise(**exercise_data)
+                exercise = Exercise(**exercise_data, builtin_mets_value=get_builtin_exercise_mets(exercise_data["name"]))
                 db.add(exercise)
                 created_count += 1
         
@@ -648,10 +771,11 @@ def update_comprehensive_exercises():
                 for key, value in exercise_data.items():
                     if hasattr(existing, key):
                         setattr(existing, key, value)
+                existing.builtin_mets_value = get_builtin_exercise_mets(exercise_data["name"])
                 updated_count += 1
             else:
                 # 新規作成
-                exercise = Exercise(**exercise_data)
+                exercise = Exercise(**exercise_data, builtin_mets_value=get_builtin_exercise_mets(exercise_data["name"]))
                 db.add(exercise)
                 created_count += 1
         
@@ -0,0 +1,68 @@
+"""
+ユーザーのデータ領域ごとのバージョンと条件付きGET（ETag / If-None-Match）
+
+領域は workouts（種目・ワークアウト・セット・消費カロリー）、body（体重・体脂肪率・身長）、
+settings（プロフィール・ダッシュボード設定）。更新系のエンドポイントは変更した領域を bump で
+同じトランザクション内で増やし（あわせて変更ログ change_log のバージョンも増える）、読み取り系は
+参照する領域のバージョン・パス・クエリ・日付から弱い ETag を作る。If-None-Match が一致すれば本体のクエリを実行せずに 304 を返せる。
+日付を含めるのは「今週」「直近30日」など、データが変わらなくても日付で変わる応答があるため。
+"""
+
+import hashlib
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+DOMAINS = ("workouts", "body", "settings")
+
+
+async def bump(db: AsyncSession, user_id: int, *domains: str) -> int:
+    """
+    領域のバージョンを1つ進め、変更ログのバージョン（changes）も進めてその値を返す（コミットは呼び出し側）
+
+    戻り値は同じトランザクションで change_log.record に渡す。
+    """
+    statement = sqlite_insert(models.UserDataVersion).values(
+        user_id=user_id, changes=1, **{domain: 1 for domain in domains}
+    )
+    return await db.scalar(statement.on_conflict_do_update(
+        index_elements=[models.UserDataVersion.user_id],
+        set_={
+            **{domain: getattr(models.UserDataVersion, domain) + 1 for domain in domains},
+            "changes": models.UserDataVersion.changes + 1,
+            "updated_at": func.now(),
+        },
+    ).returning(models.UserDataVersion.changes))
+
+
+async def get_versions(db: AsyncSession, user_id: int) -> dict:
+    """領域ごとのバージョン（行がなければすべて 0）"""
+    row = (await db.execute(
+        select(*(getattr(models.UserDataVersion, domain) for domain in DOMAINS))
+        .where(models.UserDataVersion.user_id == user_id)
+    )).first()
+    return dict(zip(DOMAINS, row or (0,) * len(DOMAINS)))
+
+
+def make_etag(user_id: int, versions: dict, domains: tuple, path: str, query: str, today: Optional[date] = None) -> str:
+    """領域のバージョン・パス・クエリ・日付から弱い ETag を作る"""
+    key = f"{user_id}|{path}|{query}|{(today or date.today()).isoformat()}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    version = ".".join(str(versions[domain]) for domain in domains)
+    return f'W/"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match ヘッダーが ETag に一致するか（弱い比較、* と複数指定に対応）"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any((candidate[2:] if candidate.startswith("W/") else candidate) == opaque for candidate in candidates)
@@ -1,26 +1,205 @@
-from sqlalchemy import create_engine
+import argparse
+import asyncio
+import math
+import os
+import sys
+
+from sqlalchemy import create_engine, event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# SQLiteデータベースのURL
-SQLALCHEMY_DATABASE_URL = "sqlite:///./myfit.db"
+# SQLiteデータベースのURL（環境変数で上書き可能）
+SQLALCHEMY_DATABASE_URL = os.getenv("MYFIT_DATABASE_URL", "sqlite:///./myfit.db")
+# 非同期ドライバ（aiosqlite）用のURL（同じデータベースファイルを参照）
+ASYNC_SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
 
-# SQLAlchemyエンジンを作成
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+# エンジンプロファイル（接続時に適用するPRAGMAとコネクションプール設定）
+ENGINE_PROFILES = {
+    # 従来の設定（SQLiteの既定値: ロールバックジャーナル、キャッシュ約2MB）
+    "legacy": {
+        "pragmas": {},
+        "pool": {},
+    },
+    # 本番向け設定: WALで読み取りと書き込みを並行させ、書き込み競合はbusy_timeoutで待機する
+    "production": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",      # WALではNORMALでも破損しない（電源断時に直近のコミットのみ失われうる）
+            "busy_timeout": 5000,         # ミリ秒
+            "cache_size": -65536,         # 負の値はKiB単位（64MB）
+            "mmap_size": 268435456,       # 256MB
+            "temp_store": "MEMORY",
+            "foreign_keys": "ON",
+        },
+        "pool": {
+            "pool_size": 10,
+            "max_overflow": 10,
+            "pool_timeout": 30,
+            "pool_pre_ping": True,
+        },
+    },
+}
+
+# 使用するプロファイル名
+DB_ENGINE_PROFILE = os.getenv("MYFIT_DB_PROFILE", "production")
+
+
+def apply_engine_profile(engine, profile_name: str):
+    """接続ごとにプロファイルのPRAGMAを適用するイベントを登録"""
+    pragmas = ENGINE_PROFILES[profile_name]["pragmas"]
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def register_sql_functions(engine):
+    """
+    SQL関数を接続ごとに補う
+
+    pow は SQLite が数学関数付きでビルドされていない環境では使えないため、
+    組み込みがなければ Python の実装を登録する（推定1RMの Lombardi 式などで使用）。
+    """
+
+    @event.listens_for(engine, "connect")
+    def _register_functions(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT pow(2, 0.5)")
+        except Exception:
+            dbapi_connection.create_function("pow", 2, lambda x, y: None if x is None or y is None else math.pow(x, y),
+                                             deterministic=True)
+        finally:
+            cursor.close()
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, profile_name: str = DB_ENGINE_PROFILE):
+    """プロファイルを適用した同期エンジンを作成"""
+    db_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        **ENGINE_PROFILES[profile_name]["pool"]
+    )
+    apply_engine_profile(db_engine, profile_name)
+    register_sql_functions(db_engine)
+    return db_engine
+
+
+def create_async_db_engine(url: str = ASYNC_SQLALCHEMY_DATABASE_URL, profile_name: str = DB_ENGINE_PROFILE):
+    """プロファイルを適用した非同期エンジンを作成"""
+    db_engine = create_async_engine(url, **ENGINE_PROFILES[profile_name]["pool"])
+    apply_engine_profile(db_engine.sync_engine, profile_name)
+    register_sql_functions(db_engine.sync_engine)
+    return db_engine
+
+
+# SQLAlchemyエンジンを作成（テーブル作成・シードスクリプト用の同期エンジン）
+engine = create_db_engine()
+
+# APIハンドラー用の非同期エンジン（クエリ中にイベントループをブロックしない）
+async_engine = create_async_db_engine()
 
 # セッションローカルクラス
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 非同期セッションクラス（コミット後も属性を参照できるよう expire_on_commit=False）
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # ベースクラス
 Base = declarative_base()
 
+# Alembic導入前（create_all）のスキーマに相当するリビジョン
+BASELINE_REVISION = "0001"
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def upgrade_database():
+    """
+    マイグレーションを最新まで適用する
+
+    Alembic導入前に create_all で作成されたデータベースは、
+    初期リビジョンとしてスタンプしてから以降のマイグレーションを適用する。
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    config.attributes["configure_logger"] = False
+
+    table_names = inspect(engine).get_table_names()
+    if "users" in table_names and "alembic_version" not in table_names:
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
+
+def max_of(a, b):
+    """a と b の大きい方のSQL式（片方がNULLならもう片方、集計行のUPSERTで既存値と新しい値を比べる）"""
+    # SQLiteの max(a, b) はNULLを含むとNULLになるため両辺を補完する
+    return func.max(func.coalesce(a, b), func.coalesce(b, a))
+
+
+async def _run_read_model_command(command: str, user_id, run) -> int:
+    import models
+
+    upgrade_database()
+    async with AsyncSessionLocal() as db:
+        if user_id is not None:
+            user_ids = [user_id]
+        else:
+            user_ids = (await db.scalars(select(models.User.id).order_by(models.User.id))).all()
+
+        failed = 0
+        for uid in user_ids:
+            if command != "check":
+                count = await run(db, uid)
+                await db.commit()
+                print(f"ユーザー {uid}: {command} を実行しました" + (f"（{count} 件）" if isinstance(count, int) else ""))
+                continue
+            problems = await run(db, uid)
+            if problems:
+                failed += 1
+                print(f"ユーザー {uid}: 不一致 {len(problems)} 件")
+                for problem in problems:
+                    print(f"    {problem}")
+        if command == "check":
+            print(f"チェックしたユーザー: {len(user_ids)} 人 / 不一致: {failed} 人")
+        return 1 if failed else 0
+
+
+def run_read_model_cli(description: str, rebuild, check=None, **commands):
+    """
+    集計テーブル（読み取りモデル）の保守コマンドを実行して終了する
+
+        python <モジュール>.py rebuild [--user-id ID]   # rebuild(db, user_id) をユーザーごとに実行してコミット
+        python <モジュール>.py check [--user-id ID]     # check(db, user_id) の不一致を表示（あれば終了コード1）
+
+    --user-id を省略すると全ユーザーが対象。commands には rebuild と同じ形のコマンドを名前で追加できる
+    （戻り値が整数なら件数として表示する）。
+    """
+    commands = {"rebuild": rebuild, **commands}
+    if check is not None:
+        commands["check"] = check
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=list(commands))
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_run_read_model_command(args.command, args.user_id, commands[args.command])))
+
+
 # データベース依存性
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+グラフ用の時系列の間引き
+
+LTTB（Largest-Triangle-Three-Buckets）で、先頭と末尾の点を残しつつ各区間から
+前後の点と作る三角形の面積が最大になる点を1つずつ選ぶ。極値や傾きの変化が残るため、
+一定間隔で間引くよりグラフの形が保たれる。計算量は点の数に比例する。
+"""
+
+from typing import Callable, Sequence
+
+
+def lttb(points: Sequence, max_points: int, x: Callable, y: Callable) -> list:
+    """
+    points（x の昇順）を max_points 点以下に間引く
+
+    x・y は点から座標（数値）を取り出す関数。max_points が3未満か点の数以上なら間引かない。
+    """
+    n = len(points)
+    if max_points < 3 or n <= max_points:
+        return list(points)
+
+    xs = [x(point) for point in points]
+    ys = [y(point) for point in points]
+    # 先頭と末尾を除いた点を max_points - 2 個の区間に分ける
+    every = (n - 2) / (max_points - 2)
+
+    sampled = [points[0]]
+    a = 0
+    for i in range(max_points - 2):
+        # 次の区間の平均（三角形の3点目）
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        # 現在の区間から、直前に選んだ点・次の区間の平均と作る三角形が最大になる点を選ぶ
+        ax, ay = xs[a], ys[a]
+        best, best_area = int(i * every) + 1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,67 @@
+"""
+ユーザーのタイムゾーンでの日付（ローカル日付・ISO週キー）
+
+ワークアウト・体重記録の日時は、ユーザーのタイムゾーンでの壁時計の時刻（タイムゾーンなし）として保存する。
+タイムゾーン付きで送られた日時は to_local でユーザーのタイムゾーンに変換してから保存し、タイムゾーンなしの
+日時はすでにユーザーのローカル時刻とみなす。あわせてワークアウトには local_date（日付）と local_week
+（ISO週、"2025-W23"）を、体重・身長の記録には local_date を保存し、「今日」「今週」「今月」の絞り込みや週ごとの
+統計はこれらの列の等値・範囲検索で行う。
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = os.getenv("MYFIT_DEFAULT_TIMEZONE", "Asia/Tokyo")
+
+
+@lru_cache(maxsize=256)
+def zone(name: str) -> ZoneInfo:
+    """IANAタイムゾーン名の ZoneInfo（不明な名前は ValueError）"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"unknown timezone: {name}") from e
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        zone(name)
+        return True
+    except ValueError:
+        return False
+
+
+def to_local(value: datetime, timezone: str) -> datetime:
+    """保存用のローカル時刻（タイムゾーン付きなら変換してタイムゾーンを外す、なしならそのまま）"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(zone(timezone)).replace(tzinfo=None)
+
+
+def iso_week_key(day: date) -> str:
+    """ISO週のキー（"2025-W23"、文字列の順序が週の順序と一致する）"""
+    year, week, _ = day.isocalendar()
+    return f"{year:04d}-W{week:02d}"
+
+
+def local_columns(value: datetime) -> dict:
+    """ローカル時刻からワークアウトの local_date・local_week 列の値を作る"""
+    day = value.date()
+    return {"local_date": day, "local_week": iso_week_key(day)}
+
+
+def now_in(timezone: str) -> datetime:
+    """ユーザーのタイムゾーンでの現在時刻（タイムゾーンなし）"""
+    return datetime.now(zone(timezone)).replace(tzinfo=None)
+
+
+def today_in(timezone: str) -> date:
+    """ユーザーのタイムゾーンでの今日"""
+    return now_in(timezone).date()
+
+
+def week_start(day: date) -> date:
+    """ISO週の月曜日"""
+    return day - timedelta(days=day.weekday())
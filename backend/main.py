@@ -1,23 +1,61 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import BackgroundTasks, FastAPI, Depends, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from sqlalchemy import Date
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, select, tuple_
 from sqlalchemy.sql import func
+from calendar import monthrange
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Optional
+from urllib.parse import urlencode
 import models
 import schemas  
 import json
-from database import engine, get_db
+from database import async_engine, get_db, upgrade_database
 from schemas import UserCreate, UserLogin, UserResponse, Token
-from auth import verify_password, get_password_hash, create_access_token, verify_token
+from auth import (
+    UserSnapshot,
+    cache_user,
+    cached_user,
+    create_user_access_token,
+    invalidate_cached_user,
+    password_hasher,
+    user_generation,
+    verify_token_claims,
+)
+from query_metrics import instrument_engine, query_metrics_middleware
+import body_snapshot
+import body_trends
+import calorie_ledger
+import change_log
+import data_versions
+import downsampling
+import local_time
+import one_rep_max
+import personal_records
+import training_rollups
+import training_volume
+import user_stats
+import workout_batch
+import workout_calendar
+import workout_tree
+from pagination import decode_cursor, encode_cursor, fetch_keyset_page
+
+# データベースのマイグレーションを最新まで適用
+upgrade_database()
 
-# データベーステーブルを作成
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 消費カロリー台帳にない完了済みワークアウト（台帳の導入前の履歴）を記録
+    await calorie_ledger.backfill_missing_ledgers()
+    yield
 
 app = FastAPI(
     title='MyFit API',
     description='筋トレ管理アプリのAPI',
-    version='1.0.0'
+    version='1.0.0',
+    lifespan=lifespan
 )
 
 # CORS設定（フロントエンドからのアクセスを許可）
@@ -29,6 +67,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# リクエストごとのSQL実行数・DB時間の計測（MYFIT_QUERY_DEBUG=1 でレスポンスヘッダーに出力）
+instrument_engine(async_engine.sync_engine)
+app.middleware("http")(query_metrics_middleware)
+
 # ヘルスチェックエンドポイント
 @app.get("/test")
 async def health_check():
@@ -39,18 +81,53 @@ async def health_check():
 security = HTTPBearer()
 
 # 現在のユーザーを取得する依存関数
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    email = verify_token(credentials.credentials)
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
+    db: AsyncSession = Depends(get_db)
+) -> UserSnapshot:
+    """トークンのユーザーを返す（キャッシュにあればusersテーブルを参照しない）"""
+    claims = verify_token_claims(credentials.credentials)
+    snapshot = cached_user(claims)
+    if snapshot is not None:
+        return snapshot
+    
+    # 読み込み中に変更された古いユーザー情報をキャッシュしないよう、読み込む前に世代番号を取得する
+    generation = None
+    if claims.get("uid") is not None:
+        generation = user_generation(claims["uid"])
+        user = await db.get(models.User, claims["uid"])
+    else:
+        # ユーザーIDを含まない旧形式のトークン（キャッシュは uid のあるトークンでしか使わない）
+        user = await db.scalar(select(models.User).where(models.User.email == claims["sub"]).limit(1))
+    if user is None or user.email != claims["sub"]:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="ユーザーが見つかりません"
         )
-    return user
+    return cache_user(user, generation)
+
+def conditional_get(*domains: str):
+    """
+    条件付きGETの依存関数を作る（domains は応答が参照するデータ領域）
+
+    If-None-Match が現在の ETag に一致すればエンドポイント本体のクエリを実行せずに 304 を返し、
+    一致しなければ応答に ETag を付ける。
+    """
+    async def dependency(
+        request: Request,
+        response: Response,
+        current_user: UserSnapshot = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+    ):
+        versions = await data_versions.get_versions(db, current_user.id)
+        query = urlencode(sorted(request.query_params.multi_items()))
+        etag = data_versions.make_etag(current_user.id, versions, domains, request.url.path, query,
+                                       today=local_time.today_in(current_user.timezone))
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if data_versions.etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+    return dependency
 
 @app.get("/")
 async def root():
@@ -60,31 +137,49 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/password-hashing")
+async def get_password_hashing_metrics():
+    """パスワードハッシュ用ワーカープールの統計（キュー待ち時間・計算時間）"""
+    return password_hasher.metrics()
+
+# サインアップ時に作成するダッシュボード設定（migrations/versions/0014 のバックフィルと同じ値）
+DEFAULT_DASHBOARD_CONFIG = {
+    "selectedWidgets": ["total_workouts", "this_week_workouts", "total_volume", "this_week_volume"],
+    "maxWidgets": 4
+}
+
 # 認証エンドポイント
 @app.post("/auth/signup", response_model=dict)  # ← 型を変更
-async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     # メールアドレスの重複チェック
-    existing_user = db.query(models.User).filter(models.User.email == user_data.email).first()
+    existing_user = await db.scalar(select(models.User).where(models.User.email == user_data.email).limit(1))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="このメールアドレスは既に登録されています"
         )
     
-    # パスワードをハッシュ化
-    hashed_password = get_password_hash(user_data.password)
+    # ハッシュ計算中にDB接続を占有しないよう、読み取りトランザクションを終えて接続をプールへ返す
+    await db.commit()
     
-    # 新しいユーザーを作成
+    # パスワードをハッシュ化（専用ワーカープールで実行し、イベントループを止めない）
+    hashed_password = await password_hasher.hash(user_data.password)
+    
+    # 新しいユーザーをデフォルトのユーザー設定とともに作成し、同期用の変更ログに記録
     db_user = models.User(
         email=user_data.email,
         password_hash=hashed_password
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    settings = models.UserSettings(user=db_user, dashboard_config=json.dumps(DEFAULT_DASHBOARD_CONFIG))
+    db.add_all([db_user, settings])
+    await db.flush()
+    version = await data_versions.bump(db, db_user.id, "settings")
+    await change_log.record(db, db_user.id, version, upserted={"profile": [db_user.id], "settings": [settings.id]})
+    await db.commit()
+    await db.refresh(db_user)
     
     # ← JWTトークンを作成して返す
-    access_token = create_access_token(data={"sub": db_user.email})
+    access_token = create_user_access_token(db_user)
     
     return {
         "user": {
@@ -98,17 +193,19 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @app.post("/auth/login")
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     # ユーザー認証
-    user = db.query(models.User).filter(models.User.email == user_data.email).first()
-    if not user or not verify_password(user_data.password, user.password_hash):
+    user = await db.scalar(select(models.User).where(models.User.email == user_data.email).limit(1))
+    # ハッシュ検証中にDB接続を占有しないよう、読み取りトランザクションを終えて接続をプールへ返す
+    await db.commit()
+    if not user or not await password_hasher.verify(user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="メールアドレスまたはパスワードが正しくありません"
         )
     
     # JWTトークンを作成して返す（サインアップと同じ形式）
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_user_access_token(user)
     
     return {
         "user": {
@@ -125,34 +222,36 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
 # 種目関連エンドポイント
 @app.get("/exercises", response_model=list[schemas.ExerciseResponse])
 async def get_exercises(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """内蔵種目 + ユーザーの種目を取得"""
     # 内蔵種目を取得
-    builtin_exercises = db.query(models.Exercise).filter(models.Exercise.is_builtin == True).all()
+    builtin_exercises = (await db.scalars(
+        select(models.Exercise).where(models.Exercise.is_builtin == True)
+    )).all()
     
     # ユーザーの種目を取得
-    user_exercises = db.query(models.Exercise).filter(
+    user_exercises = (await db.scalars(select(models.Exercise).where(
         models.Exercise.user_id == current_user.id,
         models.Exercise.is_builtin == False
-    ).all()
+    ))).all()
     
     # 合わせて返却
-    return builtin_exercises + user_exercises
+    return list(builtin_exercises) + list(user_exercises)
 
 @app.post("/exercises", response_model=schemas.ExerciseResponse)
 async def create_exercise(
     exercise_data: schemas.ExerciseCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ユーザー独自の種目を作成"""
     # 同じ名前の種目が既に存在するかチェック
-    existing = db.query(models.Exercise).filter(
+    existing = await db.scalar(select(models.Exercise).where(
         models.Exercise.name == exercise_data.name,
         models.Exercise.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if existing:
         raise HTTPException(
@@ -169,19 +268,22 @@ async def create_exercise(
         is_builtin=False
     )
     db.add(db_exercise)
-    db.commit()
-    db.refresh(db_exercise)
+    await db.flush()
+    version = await data_versions.bump(db, current_user.id, "workouts")
+    await change_log.record(db, current_user.id, version, upserted={"exercises": [db_exercise.id]})
+    await db.commit()
+    await db.refresh(db_exercise)
     
     return db_exercise
 
 @app.get("/exercises/{exercise_id}", response_model=schemas.ExerciseResponse)
 async def get_exercise(
     exercise_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """特定の種目を取得"""
-    exercise = db.query(models.Exercise).filter(models.Exercise.id == exercise_id).first()
+    exercise = await db.get(models.Exercise, exercise_id)
     
     if not exercise:
         raise HTTPException(
@@ -200,75 +302,134 @@ async def get_exercise(
 
 
 # ワークアウト関連エンドポイント
-@app.get("/workouts", response_model=list[schemas.WorkoutResponse])
+LIST_MAX_LIMIT = 200
+
+
+def local_date_conditions(column, from_date: Optional[date], to_date: Optional[date]) -> list:
+    """from_date〜to_date（両端の日を含む）のローカル日付（local_date 列）の条件"""
+    conditions = []
+    if from_date is not None:
+        conditions.append(column >= from_date)
+    if to_date is not None:
+        conditions.append(column <= to_date)
+    return conditions
+
+
+async def list_page(db: AsyncSession, query, model, limit: int, cursor: Optional[str], unbounded: bool) -> dict:
+    """一覧を (日時, ID) の新しい順に limit 件ずつ返す（unbounded なら全件）"""
+    if unbounded and cursor is not None:
+        raise HTTPException(status_code=400, detail="cursor は unbounded と同時に指定できません")
+    try:
+        return await fetch_keyset_page(
+            db, query, model.date, model.id,
+            None if unbounded else max(1, min(limit, LIST_MAX_LIMIT)), cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor が不正です")
+
+
+@app.get("/workouts", response_model=schemas.WorkoutPageResponse, dependencies=[Depends(conditional_get("workouts"))])
 async def get_workouts(
-    from_date: str = None,
-    to_date: str = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
     include_completed: bool = True,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    unbounded: bool = False,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """ユーザーのワークアウト一覧を取得"""
-    query = db.query(models.Workout).filter(
-        models.Workout.user_id == current_user.id
+    """
+    ユーザーのワークアウト一覧を取得（新しい順）
+
+    from_date・to_date はその日（ユーザーのタイムゾーンでの日付）を含む。1回に最大 limit 件で、古いページは next_cursor を cursor に渡して取得する。
+    unbounded=true なら条件に合う全件を返す。
+    """
+    query = select(models.Workout).where(
+        models.Workout.user_id == current_user.id,
+        *local_date_conditions(models.Workout.local_date, from_date, to_date)
     )
     
     # 完了状態でフィルタ
     if not include_completed:
-        query = query.filter(models.Workout.is_completed == False)
+        query = query.where(models.Workout.is_completed == False)
     
-    # 日付範囲でフィルタ
-    if from_date:
-        query = query.filter(models.Workout.date >= from_date)
-    if to_date:
-        query = query.filter(models.Workout.date <= to_date + " 23:59:59")
-    
-    workouts = query.order_by(models.Workout.date.desc()).all()
-    return workouts
+    return await list_page(db, query, models.Workout, limit, cursor, unbounded)
 
 @app.post("/workouts", response_model=schemas.WorkoutResponse)
 async def create_workout(
     workout_data: schemas.WorkoutCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """新しいワークアウトを作成"""
+    """新しいワークアウトを作成（日時はユーザーのタイムゾーンでの時刻として保存）"""
+    when = local_time.to_local(workout_data.date, current_user.timezone)
     db_workout = models.Workout(
         user_id=current_user.id,
-        date=workout_data.date,
+        date=when,
+        **local_time.local_columns(when),
         note=workout_data.note
     )
     db.add(db_workout)
-    db.commit()
-    db.refresh(db_workout)
+    await db.flush()
+    version = await data_versions.bump(db, current_user.id, "workouts")
+    await change_log.record(db, current_user.id, version, upserted={"workouts": [db_workout.id]})
+    await db.commit()
+    await db.refresh(db_workout)
     
     return db_workout
 
+# カレンダー用の日ごとの集計（{workout_id}の前に配置）
+@app.get("/workouts/calendar", dependencies=[Depends(conditional_get("workouts"))])
+async def get_workout_calendar(
+    month: Optional[str] = None,
+    year: Optional[int] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    月（month=YYYY-MM）または年（year=YYYY、ヒートマップ用）の日ごとのワークアウト集計
+
+    ワークアウトのある日だけを日付の古い順に返す（ワークアウトID・完了したワークアウトID・本番セット数・
+    ボリューム・部位・連続日数）。
+    """
+    if (month is None) == (year is None):
+        raise HTTPException(status_code=400, detail="month（YYYY-MM）か year のどちらか一方を指定してください")
+    try:
+        if month is not None:
+            start = datetime.strptime(month, "%Y-%m").date()
+            end = start.replace(day=monthrange(start.year, start.month)[1])
+        else:
+            start, end = date(year, 1, 1), date(year, 12, 31)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="month は YYYY-MM、year は 1〜9999 で指定してください")
+
+    days = await workout_calendar.calendar_days(db, current_user.id, start, end)
+    return {
+        "month": month,
+        "year": year,
+        "start_date": start,
+        "end_date": end,
+        "active_days": sum(1 for day in days if day["completed"]),
+        "total_sets": sum(day["set_count"] for day in days),
+        "total_volume": round(sum(day["volume"] for day in days), 1),
+        "days": days,
+    }
+
 # 最近のワークアウト取得エンドポイント（{workout_id}の前に配置）
-@app.get("/workouts/recent", response_model=list[schemas.WorkoutDetailResponse])
+@app.get("/workouts/recent", response_model=list[schemas.WorkoutDetailResponse], dependencies=[Depends(conditional_get("workouts"))])
 async def get_recent_workouts(
     limit: int = 5,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """最近のワークアウトを取得（種目情報含む）"""
     try:
-        from sqlalchemy.orm import joinedload
-        
-        # 完了済みのワークアウトのみを取得（workout_exercisesもjoinedloadで取得）
-        workouts = db.query(models.Workout).options(
-            joinedload(models.Workout.workout_exercises).joinedload(models.WorkoutExercise.exercise),
-            joinedload(models.Workout.workout_exercises).joinedload(models.WorkoutExercise.sets)
-        ).filter(
+        # 完了済みのワークアウトのみを取得（種目・セットは件数によらず固定のクエリ数で読み込む）
+        return await workout_tree.load_workout_trees(db, select(models.Workout).where(
             models.Workout.user_id == current_user.id,
             models.Workout.is_completed == True
-        ).order_by(models.Workout.date.desc()).limit(limit).all()
-        
-        # exerciseがNoneのworkout_exerciseを除外
-        for workout in workouts:
-            workout.workout_exercises = [we for we in workout.workout_exercises if we.exercise is not None]
-        
-        return workouts
+        ).order_by(models.Workout.date.desc()).limit(limit))
         
     except Exception as e:
         raise HTTPException(
@@ -276,22 +437,14 @@ async def get_recent_workouts(
             detail="最近のワークアウト取得に失敗しました"
         )
 
-@app.get("/workouts/{workout_id}", response_model=schemas.WorkoutDetailResponse)
+@app.get("/workouts/{workout_id}", response_model=schemas.WorkoutDetailResponse, dependencies=[Depends(conditional_get("workouts"))])
 async def get_workout(
     workout_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """特定のワークアウトを取得（種目情報含む）"""
-    from sqlalchemy.orm import joinedload
-    
-    workout = db.query(models.Workout).options(
-        joinedload(models.Workout.workout_exercises).joinedload(models.WorkoutExercise.exercise),
-        joinedload(models.Workout.workout_exercises).joinedload(models.WorkoutExercise.sets)
-    ).filter(
-        models.Workout.id == workout_id,
-        models.Workout.user_id == current_user.id
-    ).first()
+    workout = await workout_tree.load_workout_tree(db, current_user.id, workout_id)
     
     if not workout:
         raise HTTPException(
@@ -299,9 +452,6 @@ async def get_workout(
             detail="ワークアウトが見つかりません"
         )
     
-    # exerciseがNoneのworkout_exerciseを除外
-    workout.workout_exercises = [we for we in workout.workout_exercises if we.exercise is not None]
-    
     return workout
 
 # ワークアウト種目関連エンドポイント
@@ -309,15 +459,15 @@ async def get_workout(
 async def add_exercise_to_workout(
     workout_id: int,
     exercise_data: schemas.WorkoutExerciseCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ワークアウトに種目を追加"""
     # ワークアウトの所有者確認
-    workout = db.query(models.Workout).filter(
+    workout = await db.scalar(select(models.Workout).where(
         models.Workout.id == workout_id,
         models.Workout.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not workout:
         raise HTTPException(
@@ -326,7 +476,7 @@ async def add_exercise_to_workout(
         )
     
     # 種目の存在確認
-    exercise = db.query(models.Exercise).filter(models.Exercise.id == exercise_data.exercise_id).first()
+    exercise = await db.get(models.Exercise, exercise_data.exercise_id)
     if not exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -347,10 +497,10 @@ async def add_exercise_to_workout(
         order_index=exercise_data.order_index
     )
     db.add(db_workout_exercise)
-    db.commit()
-    db.refresh(db_workout_exercise)
+    await db.flush()
     
     # オプション選択がある場合はExerciseVariantを作成
+    changes = {"workout_exercises": [db_workout_exercise.id]}
     if (exercise_data.selected_angle or 
         exercise_data.selected_grip or 
         exercise_data.selected_stance):
@@ -361,23 +511,60 @@ async def add_exercise_to_workout(
             selected_stance=exercise_data.selected_stance
         )
         db.add(db_variant)
-        db.commit()
-        db.refresh(db_variant)
+        await db.flush()
+        changes["exercise_variants"] = [db_variant.id]
+    
+    version = await data_versions.bump(db, current_user.id, "workouts")
+    await change_log.record(db, current_user.id, version, upserted=changes)
+    await db.commit()
+    
+    # レスポンスに含める関連（種目・セット・オプション選択）を読み込む
+    await db.refresh(db_workout_exercise, attribute_names=["exercise", "sets", "exercise_variant"])
     
     return db_workout_exercise
 
-@app.get("/workouts/{workout_id}/exercises", response_model=list[schemas.WorkoutExerciseResponse])
+@app.get("/workouts/{workout_id}/exercises", response_model=list[schemas.WorkoutExerciseResponse], dependencies=[Depends(conditional_get("workouts"))])
 async def get_workout_exercises(
     workout_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """ワークアウトの種目一覧を取得（順番順）"""
+    # 所有者確認を兼ねてワークアウトのツリーを読み込む
+    workout = await workout_tree.load_workout_tree(db, current_user.id, workout_id)
+    
+    if not workout:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="ワークアウトが見つかりません"
+        )
+    
+    return workout.workout_exercises
+
+@app.post("/workouts/{workout_id}/batch", response_model=schemas.WorkoutBatchResponse)
+async def apply_workout_batch(
+    workout_id: int,
+    batch_data: schemas.WorkoutBatchRequest,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """ワークアウトの種目一覧を取得"""
+    """
+    ワークアウトへの操作（種目の追加・セットの追加 / 更新 / 削除・種目の並べ替え）を順に1つのトランザクションで適用
+
+    いずれかの操作が失敗した場合は何も保存せず、失敗した操作の位置をエラーに含める。
+    適用後のワークアウト（種目・セット含む）と、ref に対応する作成したIDを返す。
+    """
+    if len(batch_data.operations) > workout_batch.BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"操作は1回に{workout_batch.BATCH_MAX_OPERATIONS}件までです"
+        )
+    
     # ワークアウトの所有者確認
-    workout = db.query(models.Workout).filter(
+    workout = await db.scalar(select(models.Workout).where(
         models.Workout.id == workout_id,
         models.Workout.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not workout:
         raise HTTPException(
@@ -385,43 +572,70 @@ async def get_workout_exercises(
             detail="ワークアウトが見つかりません"
         )
     
-    # ワークアウト種目を取得（順番順）
-    workout_exercises = db.query(models.WorkoutExercise).filter(
-        models.WorkoutExercise.workout_id == workout_id
-    ).order_by(models.WorkoutExercise.order_index).all()
-    
-    return workout_exercises
+    batch = workout_batch.WorkoutBatch(db, current_user.id, workout)
+    try:
+        await batch.load(batch_data.operations)
+        await batch.apply(batch_data.operations)
+        await batch.finish()
+    except workout_batch.BatchError as e:
+        await db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    await db.commit()
+    
+    # 適用後のツリーを読み直す（セッション内の読み込み済みの関連は使わない）
+    db.expire_all()
+    return {
+        "workout": await workout_tree.load_workout_tree(db, current_user.id, workout_id),
+        "refs": batch.refs,
+        "new_records": batch.new_records,
+    }
 
 # セット記録関連エンドポイント
-@app.post("/workout-exercises/{workout_exercise_id}/sets", response_model=schemas.SetResponse)
+@app.post("/workout-exercises/{workout_exercise_id}/sets", response_model=schemas.SetCreateResponse)
 async def add_set(
     workout_exercise_id: int,
     set_data: schemas.SetCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """セットを追加"""
-    # ワークアウト種目の確認と所有者チェック
-    workout_exercise = db.query(models.WorkoutExercise).join(models.Workout).filter(
-        models.WorkoutExercise.id == workout_exercise_id,
-        models.Workout.user_id == current_user.id
-    ).first()
-    
-    if not workout_exercise:
+    # ワークアウト種目の確認と所有者チェック（統計・消費カロリー・自己ベスト・集計更新用にワークアウトの状態、
+    # 種目タイプ、部位、バリエーションも取得）
+    row = (await db.execute(
+        select(models.WorkoutExercise, models.Workout.date, models.Workout.local_date, models.Workout.is_completed,
+               models.Exercise.exercise_type, models.Exercise.muscle_group, models.ExerciseVariant)
+        .join(models.Workout)
+        .outerjoin(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .outerjoin(models.ExerciseVariant, models.ExerciseVariant.workout_exercise_id == models.WorkoutExercise.id)
+        .where(
+            models.WorkoutExercise.id == workout_exercise_id,
+            models.Workout.user_id == current_user.id
+        ).limit(1)
+    )).first()
+    
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="ワークアウト種目が見つかりません"
         )
     
-    # 現在のセット数を取得（set_indexを決定）
-    current_set_count = db.query(models.Set).filter(
+    # 自己ベスト判定用のボリュームを取得
+    current_volume = await db.scalar(select(
+        func.coalesce(func.sum(models.Set.weight * models.Set.reps).filter(
+            models.Set.is_warmup == False,
+            models.Set.weight > 0,
+            models.Set.reps > 0
+        ), 0)
+    ).where(
         models.Set.workout_exercise_id == workout_exercise_id
-    ).count()
+    ))
     
-    # 新しいセットを作成
+    # 新しいセットを作成（set_index は INSERT 文の中で MAX + 1 を求め、同時に追加しても重複しない）
     db_set = models.Set(
         workout_exercise_id=workout_exercise_id,
-        set_index=current_set_count + 1,
+        set_index=select(func.coalesce(func.max(models.Set.set_index), 0) + 1).where(
+            models.Set.workout_exercise_id == workout_exercise_id
+        ).scalar_subquery(),
         # 筋力トレーニング用フィールド
         weight=set_data.weight,
         reps=set_data.reps,
@@ -436,23 +650,39 @@ async def add_set(
         note=set_data.note
     )
     db.add(db_set)
-    db.commit()
-    db.refresh(db_set)
-    
-    return db_set
+    workout_exercise, workout_date, local_date, is_completed, exercise_type, muscle_group, variant = row
+    await user_stats.record_set_added(db, current_user.id, local_date, exercise_type, db_set)
+    new_records = await personal_records.record_set_added(
+        db, current_user.id, workout_exercise.exercise_id, variant, exercise_type, db_set, workout_date,
+        session_volume=current_volume + user_stats.set_volume(db_set)
+    )
+    await training_rollups.record_set_added(
+        db, current_user.id, workout_date, workout_exercise.exercise_id, muscle_group, exercise_type, db_set
+    )
+    await calorie_ledger.refresh_if_completed(db, current_user.id, workout_exercise.workout_id, workout_date, is_completed)
+    await db.flush()
+    version = await data_versions.bump(db, current_user.id, "workouts")
+    await change_log.record(db, current_user.id, version, upserted={"sets": [db_set.id]})
+    await db.commit()
+    await db.refresh(db_set)
+    
+    response = schemas.SetCreateResponse.model_validate(db_set)
+    response.is_personal_record = bool(new_records)
+    response.new_records = new_records
+    return response
 
-@app.get("/workout-exercises/{workout_exercise_id}/sets", response_model=list[schemas.SetResponse])
+@app.get("/workout-exercises/{workout_exercise_id}/sets", response_model=list[schemas.SetResponse], dependencies=[Depends(conditional_get("workouts"))])
 async def get_sets(
     workout_exercise_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ワークアウト種目のセット一覧を取得"""
     # ワークアウト種目の確認と所有者チェック
-    workout_exercise = db.query(models.WorkoutExercise).join(models.Workout).filter(
+    workout_exercise = await db.scalar(select(models.WorkoutExercise).join(models.Workout).where(
         models.WorkoutExercise.id == workout_exercise_id,
         models.Workout.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not workout_exercise:
         raise HTTPException(
@@ -461,35 +691,98 @@ async def get_sets(
         )
     
     # セット一覧を取得（セット順）
-    sets = db.query(models.Set).filter(
+    sets = (await db.scalars(select(models.Set).where(
         models.Set.workout_exercise_id == workout_exercise_id
-    ).order_by(models.Set.set_index).all()
+    ).order_by(models.Set.set_index))).all()
     
     return sets
 
 
+@app.put("/sets/{set_id}", response_model=schemas.SetCreateResponse)
+async def update_set(
+    set_id: int,
+    set_data: schemas.SetUpdate,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """セットを更新（未入力の項目は変更しない）"""
+    # セットの確認と所有者チェック
+    workout = await db.scalar(
+        select(models.Workout)
+        .join(models.WorkoutExercise)
+        .join(models.Set)
+        .where(
+            models.Set.id == set_id,
+            models.Workout.user_id == current_user.id
+        ).limit(1)
+    )
+    
+    if not workout:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="セットが見つかりません"
+        )
+    
+    # 一括更新と同じ手順で統計・集計・自己ベスト・消費カロリーを更新
+    operations = [schemas.BatchUpdateSet(op="update_set", set_id=set_id, **set_data.model_dump())]
+    batch = workout_batch.WorkoutBatch(db, current_user.id, workout)
+    try:
+        await batch.load(operations)
+        await batch.apply(operations)
+        await batch.finish()
+    except workout_batch.BatchError as e:
+        await db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
+    await db.commit()
+    db_set = await db.get(models.Set, set_id)
+    await db.refresh(db_set)
+    
+    response = schemas.SetCreateResponse.model_validate(db_set)
+    response.new_records = batch.new_records.get(set_id, [])
+    response.is_personal_record = bool(response.new_records)
+    return response
+
 @app.delete("/sets/{set_id}", status_code=204)
 async def delete_set(
     set_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """セットを削除"""
-    # セットの確認と所有者チェック
-    db_set = db.query(models.Set).join(models.WorkoutExercise).join(models.Workout).filter(
-        models.Set.id == set_id,
-        models.Workout.user_id == current_user.id
-    ).first()
-    
-    if not db_set:
+    # セットの確認と所有者チェック（統計・消費カロリー・集計更新用にワークアウトの状態と種目タイプ・部位も取得）
+    row = (await db.execute(
+        select(models.Set, models.Workout.id, models.Workout.date, models.Workout.local_date, models.Workout.is_completed,
+               models.WorkoutExercise.exercise_id, models.Exercise.exercise_type, models.Exercise.muscle_group,
+               models.ExerciseVariant)
+        .select_from(models.Set)
+        .join(models.WorkoutExercise)
+        .join(models.Workout)
+        .outerjoin(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .outerjoin(models.ExerciseVariant, models.ExerciseVariant.workout_exercise_id == models.WorkoutExercise.id)
+        .where(
+            models.Set.id == set_id,
+            models.Workout.user_id == current_user.id
+        ).limit(1)
+    )).first()
+    
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="セットが見つかりません"
         )
     
     # セットを削除
-    db.delete(db_set)
-    db.commit()
+    db_set, workout_id, workout_date, local_date, is_completed, exercise_id, exercise_type, muscle_group, variant = row
+    await user_stats.record_set_removed(db, current_user.id, local_date, exercise_type, db_set)
+    await training_rollups.record_set_removed(
+        db, current_user.id, workout_date, exercise_id, muscle_group, exercise_type, db_set
+    )
+    await db.delete(db_set)
+    await personal_records.record_set_removed(db, current_user.id, exercise_id, variant, exercise_type, db_set)
+    await calorie_ledger.refresh_if_completed(db, current_user.id, workout_id, workout_date, is_completed)
+    version = await data_versions.bump(db, current_user.id, "workouts")
+    await change_log.record(db, current_user.id, version, deleted={"sets": [set_id]})
+    await db.commit()
     
     return
 
@@ -497,185 +790,383 @@ async def delete_set(
 @app.delete("/workout-exercises/{workout_exercise_id}", status_code=204)
 async def delete_workout_exercise(
     workout_exercise_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ワークアウト種目を削除（関連するセットも削除）- 冪等性対応"""
-    # ワークアウト種目の確認と所有者チェック
-    workout_exercise = db.query(models.WorkoutExercise).join(models.Workout).filter(
-        models.WorkoutExercise.id == workout_exercise_id,
-        models.Workout.user_id == current_user.id
-    ).first()
+    # ワークアウト種目の確認と所有者チェック（消費カロリー更新用にワークアウトの状態も取得）
+    row = (await db.execute(
+        select(models.WorkoutExercise, models.Workout.date, models.Workout.is_completed)
+        .join(models.Workout)
+        .where(
+            models.WorkoutExercise.id == workout_exercise_id,
+            models.Workout.user_id == current_user.id
+        ).limit(1)
+    )).first()
     
     # すでに削除済みの場合は成功として扱う（冪等性）
-    if not workout_exercise:
+    if not row:
         return  # 204 No Content
+    workout_exercise, workout_date, is_completed = row
     
-    # 関連するセットを先に削除
-    db.query(models.Set).filter(
+    # 関連するセット・オプション選択を先に削除
+    await user_stats.record_workout_exercise_removed(db, current_user.id, workout_exercise_id)
+    await training_rollups.record_workout_exercise_removed(db, current_user.id, workout_exercise_id)
+    set_ids = (await db.scalars(delete(models.Set).where(
         models.Set.workout_exercise_id == workout_exercise_id
-    ).delete()
+    ).returning(models.Set.id))).all()
+    variant_ids = (await db.scalars(delete(models.ExerciseVariant).where(
+        models.ExerciseVariant.workout_exercise_id == workout_exercise_id
+    ).returning(models.ExerciseVariant.id))).all()
     
     # ワークアウト種目を削除
-    db.delete(workout_exercise)
-    db.commit()
+    await db.delete(workout_exercise)
+    await personal_records.recompute_exercise_records(db, current_user.id, workout_exercise.exercise_id)
+    await calorie_ledger.refresh_if_completed(db, current_user.id, workout_exercise.workout_id, workout_date, is_completed)
+    version = await data_versions.bump(db, current_user.id, "workouts")
+    await change_log.record(db, current_user.id, version, deleted={
+        "workout_exercises": [workout_exercise_id],
+        "exercise_variants": variant_ids,
+        "sets": set_ids,
+    })
+    await db.commit()
     
     return
 
 
 # 分析機能関連エンドポイント
-@app.get("/analytics/exercise/{exercise_id}/1rm")
+# 推定1RM履歴の期間単位（ワークアウト日時から期間の開始日 'YYYY-MM-DD' を求めるSQL式）
+ONE_RM_BUCKETS = {
+    "day": lambda column: func.date(column),
+    "week": lambda column: func.date(column, 'weekday 0', '-6 days'),
+    "month": lambda column: func.date(column, 'start of month'),
+}
+
+@app.get("/analytics/exercise/{exercise_id}/1rm", dependencies=[Depends(conditional_get("workouts"))])
 async def get_exercise_1rm_history(
     exercise_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    formula: str = one_rep_max.DEFAULT_FORMULA,
+    bucket: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """種目の推定1RM履歴を取得"""
+    """
+    種目の推定1RM履歴を取得（新しい順）
+
+    通常はワークアウトごとの最高セットを返す。bucket（day / week / month）を指定すると
+    日・週（月曜始まり）・月ごとの最高セットを返す。推定1RMの計算・最高セットの選択はSQL側で行う。
+    古いページは next_cursor を cursor に渡して取得する。
+    """
+    if formula not in one_rep_max.FORMULAS:
+        raise HTTPException(status_code=400, detail=f"formula は {', '.join(one_rep_max.FORMULAS)} のいずれかです")
+    if bucket is not None and bucket not in ONE_RM_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket は {', '.join(ONE_RM_BUCKETS)} のいずれかです")
+    limit = max(1, min(limit, 100))
+    
     # 種目のアクセス権限確認
-    exercise = db.query(models.Exercise).filter(models.Exercise.id == exercise_id).first()
+    exercise = await db.get(models.Exercise, exercise_id)
     if not exercise:
         raise HTTPException(status_code=404, detail="種目が見つかりません")
     
     if not exercise.is_builtin and exercise.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="この種目にはアクセスできません")
     
-    # その種目のセットデータを取得（ウォームアップ除く、筋力トレーニングのみ）
-    sets = db.query(models.Set).join(models.WorkoutExercise).join(models.Workout).join(models.Exercise).filter(
+    result = {
+        "exercise_name": exercise.name,
+        "muscle_group": exercise.muscle_group,
+        "formula": formula,
+        "bucket": bucket,
+        "max_estimated_1rm": 0,
+        "history": [],
+        "next_cursor": None,
+    }
+    # 推定1RMは筋力トレーニングのみ
+    if exercise.exercise_type != 'strength':
+        return result
+    
+    # ワークアウト単位ならワークアウトの日時とID、期間単位なら期間の開始日で並べる
+    if bucket is None:
+        partition = models.Workout.id
+        sort_keys = (models.Workout.date, models.Workout.id)
+        cursor_parsers = (datetime.fromisoformat, int)
+    else:
+        partition = ONE_RM_BUCKETS[bucket](models.Workout.date)
+        sort_keys = (partition,)
+        cursor_parsers = (str,)
+    
+    # その種目のセット（ウォームアップ除く、重量・回数の記録があるもの）
+    estimated = one_rep_max.estimated_1rm_sql(formula, models.Set.weight, models.Set.reps)
+    conditions = [
         models.WorkoutExercise.exercise_id == exercise_id,
         models.Workout.user_id == current_user.id,
         models.Set.is_warmup == False,
-        models.Exercise.exercise_type == 'strength',  # 筋力トレーニングのみ
         models.Set.weight.isnot(None),
-        models.Set.reps.isnot(None)
-    ).order_by(models.Workout.date.desc()).all()
-    
-    # 推定1RM計算（Epley公式: 1RM = weight * (1 + reps/30)）
-    rm_history = []
-    for set_data in sets:
-        if set_data.weight and set_data.reps:  # Null チェック
-            estimated_1rm = set_data.weight * (1 + set_data.reps / 30)
-            rm_history.append({
-                "date": set_data.workout_exercise.workout.date,
-                "weight": set_data.weight,
-                "reps": set_data.reps,
-                "estimated_1rm": round(estimated_1rm, 1),
-                "rpe": set_data.rpe,
-                "workout_id": set_data.workout_exercise.workout_id
-            })
+        models.Set.reps.isnot(None),
+        estimated.isnot(None),
+    ]
+    
+    def qualifying_sets(*columns):
+        return (
+            select(*columns)
+            .select_from(models.Set)
+            .join(models.WorkoutExercise)
+            .join(models.Workout)
+            .where(*conditions)
+        )
+    
+    if formula == personal_records.FORMULA:
+        # 自己ベスト（バリエーションごと）の最大値
+        best = await db.scalar(select(func.max(models.PersonalRecord.best_e1rm)).where(
+            models.PersonalRecord.user_id == current_user.id,
+            models.PersonalRecord.exercise_id == exercise_id
+        ))
+    else:
+        best = await db.scalar(qualifying_sets(func.max(estimated)))
+    result["max_estimated_1rm"] = round(best or 0, 1)
     
+    if cursor:
+        try:
+            cursor_values = decode_cursor(cursor, *cursor_parsers)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="cursor が不正です")
+        conditions.append(tuple_(*sort_keys) < tuple_(*cursor_values))
+    
+    # 期間（ワークアウト）ごとに推定1RMが最大のセットを1件選ぶ
+    ranked = qualifying_sets(
+        partition.label("period"),
+        models.Workout.id.label("workout_id"),
+        models.Workout.date.label("date"),
+        models.Set.weight,
+        models.Set.reps,
+        models.Set.rpe,
+        estimated.label("estimated_1rm"),
+        func.row_number().over(
+            partition_by=partition,
+            order_by=(estimated.desc(), models.Workout.date.desc(), models.Set.id)
+        ).label("rank"),
+    ).subquery()
+    order = (ranked.c.date.desc(), ranked.c.workout_id.desc()) if bucket is None else (ranked.c.period.desc(),)
+    rows = (await db.execute(
+        select(ranked).where(ranked.c.rank == 1).order_by(*order).limit(limit + 1)
+    )).all()
+    
+    for row in rows[:limit]:
+        item = {
+            "date": row.date,
+            "weight": row.weight,
+            "reps": row.reps,
+            "estimated_1rm": round(row.estimated_1rm, 1),
+            "rpe": row.rpe,
+            "workout_id": row.workout_id,
+        }
+        if bucket is not None:
+            item["period_start"] = row.period
+        result["history"].append(item)
+    
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        result["next_cursor"] = encode_cursor(last.date, last.workout_id) if bucket is None else encode_cursor(last.period)
+    return result
+
+@app.get("/analytics/prs", dependencies=[Depends(conditional_get("workouts"))])
+async def get_personal_records(
+    exercise_id: Optional[int] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """自己ベスト一覧（種目・バリエーションごと）"""
+    query = (
+        select(models.PersonalRecord, models.Exercise.name, models.Exercise.muscle_group)
+        .join(models.Exercise, models.PersonalRecord.exercise_id == models.Exercise.id)
+        .where(models.PersonalRecord.user_id == current_user.id)
+        .order_by(models.PersonalRecord.exercise_id, models.PersonalRecord.variant_key)
+    )
+    if exercise_id is not None:
+        query = query.where(models.PersonalRecord.exercise_id == exercise_id)
+    
+    rows = (await db.execute(query)).all()
     return {
-        "exercise_name": exercise.name,
-        "muscle_group": exercise.muscle_group,
-        "max_estimated_1rm": max([item["estimated_1rm"] for item in rm_history]) if rm_history else 0,
-        "history": rm_history[:20]  # 最新20件
+        "records": [
+            personal_records.record_response(record, exercise_name, muscle_group)
+            for record, exercise_name, muscle_group in rows
+        ]
     }
 
-@app.get("/analytics/workout/{workout_id}/volume")
+@app.get("/analytics/workout/{workout_id}/volume", dependencies=[Depends(conditional_get("workouts"))])
 async def get_workout_volume(
     workout_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ワークアウトのトレーニングボリューム分析"""
     # ワークアウトの所有者確認
-    workout = db.query(models.Workout).filter(
+    workout = await db.scalar(select(models.Workout).where(
         models.Workout.id == workout_id,
         models.Workout.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not workout:
         raise HTTPException(status_code=404, detail="ワークアウトが見つかりません")
     
-    # ワークアウトの全セット（筋力トレーニングのみ）を取得
-    sets = db.query(models.Set).join(models.WorkoutExercise).filter(
-        models.WorkoutExercise.workout_id == workout_id,
-        models.Set.is_warmup == False  # ウォームアップは除く
-    ).join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id).filter(
-        models.Exercise.exercise_type == 'strength',  # 筋力トレーニングのみ
-        models.Set.weight.isnot(None),
-        models.Set.reps.isnot(None)
-    ).all()
-    
-    # 種目別ボリューム計算
-    exercise_volumes = {}
-    total_volume = 0
-    total_sets = 0
-    
-    for set_data in sets:
-        if set_data.weight and set_data.reps:  # Null チェック
-            exercise_name = set_data.workout_exercise.exercise.name
-            volume = set_data.weight * set_data.reps
-            
-            if exercise_name not in exercise_volumes:
-                exercise_volumes[exercise_name] = {
-                    "exercise_name": exercise_name,
-                    "muscle_group": set_data.workout_exercise.exercise.muscle_group,
-                    "sets": 0,
-                    "total_volume": 0,
-                    "avg_weight": 0,
-                    "total_reps": 0
-                }
-            
-            exercise_volumes[exercise_name]["sets"] += 1
-            exercise_volumes[exercise_name]["total_volume"] += volume
-            exercise_volumes[exercise_name]["total_reps"] += set_data.reps
-            
-            total_volume += volume
-            total_sets += 1
-    
-    # 平均重量計算（筋力トレーニングのみ）
-    for exercise_name in exercise_volumes:
-        exercise_sets = [s for s in sets if s.workout_exercise.exercise.name == exercise_name]
-        total_weight = sum(
-            set_data.weight for set_data in exercise_sets 
-            if set_data.weight is not None
+    # 種目・バリエーション別と部位別の内訳（1クエリで集計）
+    breakdown = await training_volume.volume_breakdown(db, current_user.id, workout_id=workout_id)
+    
+    return {
+        "workout_date": workout.date,
+        **breakdown,
+    }
+
+@app.get("/analytics/volume", dependencies=[Depends(conditional_get("workouts"))])
+async def get_volume_breakdown(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """期間内のトレーニングボリューム分析（種目・バリエーション別と部位別、終了日を含む）"""
+    breakdown = await training_volume.volume_breakdown(
+        db, current_user.id,
+        date_from=start_date,
+        date_to=end_date + timedelta(days=1) if end_date else None,
+    )
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        **breakdown,
+    }
+
+# 時系列集計のグループ化単位
+TIMESERIES_GROUPS = ("total", "muscle_group", "exercise")
+
+@app.get("/analytics/timeseries", dependencies=[Depends(conditional_get("workouts"))])
+async def get_training_timeseries(
+    granularity: str = "week",
+    group_by: str = "total",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    muscle_group: Optional[str] = None,
+    exercise_id: Optional[int] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    日・週（月曜始まり）・月ごとのセット数・回数・ボリューム・推定1RMの最高値・有酸素運動の時間（古い順）
+
+    training_rollups だけを読む。group_by は total（期間ごとの合計）/ muscle_group / exercise。
+    muscle_group・exercise_id で絞り込める。start_date・end_date は期間の開始日で比較する（どちらも含む）。
+    """
+    if granularity not in training_rollups.GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity は {', '.join(training_rollups.GRANULARITIES)} のいずれかです")
+    if group_by not in TIMESERIES_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by は {', '.join(TIMESERIES_GROUPS)} のいずれかです")
+    
+    rollup = models.TrainingRollup
+    group_columns = {
+        "total": [],
+        "muscle_group": [rollup.muscle_group],
+        "exercise": [rollup.exercise_id, models.Exercise.name, rollup.muscle_group],
+    }[group_by]
+    query = (
+        select(
+            rollup.bucket_start,
+            *group_columns,
+            func.sum(rollup.set_count).label("sets"),
+            func.sum(rollup.total_reps).label("total_reps"),
+            func.sum(rollup.volume).label("total_volume"),
+            func.max(rollup.top_e1rm).label("top_e1rm"),
+            func.sum(rollup.duration_seconds).label("duration_seconds"),
         )
-        exercise_volumes[exercise_name]["avg_weight"] = round(
-            total_weight / exercise_volumes[exercise_name]["sets"], 1
+        .where(rollup.user_id == current_user.id, rollup.granularity == granularity)
+        .group_by(rollup.bucket_start, *group_columns)
+        .order_by(rollup.bucket_start, *group_columns)
+    )
+    if group_by == "exercise":
+        query = query.join(models.Exercise, rollup.exercise_id == models.Exercise.id)
+    if muscle_group is not None:
+        query = query.where(rollup.muscle_group == muscle_group)
+    if exercise_id is not None:
+        query = query.where(rollup.exercise_id == exercise_id)
+    if start_date is not None:
+        query = query.where(rollup.bucket_start >= training_rollups.bucket_start(granularity, start_date))
+    if end_date is not None:
+        query = query.where(rollup.bucket_start <= end_date)
+    
+    series = []
+    for row in (await db.execute(query)).all():
+        point = {"bucket_start": row.bucket_start}
+        if group_by == "muscle_group":
+            point["muscle_group"] = row.muscle_group
+        elif group_by == "exercise":
+            point.update(exercise_id=row.exercise_id, exercise_name=row.name, muscle_group=row.muscle_group)
+        point.update(
+            sets=row.sets,
+            total_reps=row.total_reps,
+            total_volume=round(row.total_volume, 1),
+            top_estimated_1rm=round(row.top_e1rm, 1) if row.top_e1rm is not None else None,
+            duration_seconds=row.duration_seconds,
         )
+        series.append(point)
     
     return {
-        "workout_date": workout.date,
-        "total_volume": round(total_volume, 1),
-        "total_sets": total_sets,
-        "exercise_breakdown": list(exercise_volumes.values())
+        "granularity": granularity,
+        "group_by": group_by,
+        "start_date": start_date,
+        "end_date": end_date,
+        "series": series,
     }
 
-@app.get("/analytics/user/summary")
+async def _strength_set_totals(db: AsyncSession, user_id: int, week_start=None):
+    """
+    筋力トレーニングの本番セット（ウォームアップ除く）のセット数とボリュームをSQLで集計
+
+    week_start を指定すると今週分のボリュームも同じクエリで条件付き集計する。
+    重量または回数が未入力のセットはセット数には含み、ボリュームには含まない。
+    """
+    set_volume = models.Set.weight * models.Set.reps
+    columns = [
+        func.count(models.Set.id).label("set_count"),
+        func.coalesce(func.sum(set_volume), 0).label("volume"),
+    ]
+    if week_start is not None:
+        columns.append(
+            func.coalesce(func.sum(set_volume).filter(models.Workout.date >= week_start), 0).label("week_volume")
+        )
+    return (await db.execute(
+        select(*columns)
+        .select_from(models.Set)
+        .join(models.WorkoutExercise)
+        .join(models.Workout)
+        .join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .where(
+            models.Workout.user_id == user_id,
+            models.Set.is_warmup == False,
+            models.Exercise.exercise_type == 'strength'
+        )
+    )).one()
+
+
+@app.get("/analytics/user/summary", dependencies=[Depends(conditional_get("workouts", "settings"))])
 async def get_user_analytics_summary(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ユーザーの総合分析データ"""
     # 総ワークアウト数
-    total_workouts = db.query(models.Workout).filter(
+    total_workouts = await db.scalar(select(func.count(models.Workout.id)).where(
         models.Workout.user_id == current_user.id
-    ).count()
+    ))
     
-    # 総セット数（ウォームアップ除く、筋力トレーニングのみ）
-    total_sets = db.query(models.Set).join(models.WorkoutExercise).join(models.Workout).filter(
-        models.Workout.user_id == current_user.id,
-        models.Set.is_warmup == False
-    ).join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id).filter(
-        models.Exercise.exercise_type == 'strength'
-    ).count()
-    
-    # 総ボリューム（筋力トレーニングのみ）
-    sets = db.query(models.Set).join(models.WorkoutExercise).join(models.Workout).filter(
-        models.Workout.user_id == current_user.id,
-        models.Set.is_warmup == False
-    ).join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id).filter(
-        models.Exercise.exercise_type == 'strength',
-        models.Set.weight.isnot(None),
-        models.Set.reps.isnot(None)
-    ).all()
-    
-    total_volume = sum(set_data.weight * set_data.reps for set_data in sets if set_data.weight and set_data.reps)
+    # 総セット数・総ボリューム（ウォームアップ除く、筋力トレーニングのみ）
+    set_totals = await _strength_set_totals(db, current_user.id)
+    total_sets = set_totals.set_count
+    total_volume = set_totals.volume
     
     # 最新ワークアウト
-    latest_workout = db.query(models.Workout).filter(
+    latest_workout = await db.scalar(select(models.Workout).where(
         models.Workout.user_id == current_user.id
-    ).order_by(models.Workout.date.desc()).first()
+    ).order_by(models.Workout.date.desc()).limit(1))
     
     return {
         "total_workouts": total_workouts,
@@ -687,31 +1178,37 @@ async def get_user_analytics_summary(
 
 
 # 身体データ関連エンドポイント
-@app.get("/body-metrics", response_model=list[schemas.BodyMetricResponse])
+@app.get("/body-metrics", response_model=schemas.BodyMetricPageResponse, dependencies=[Depends(conditional_get("body"))])
 async def get_body_metrics(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
     limit: int = 30,  # 最新30件
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    unbounded: bool = False,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """体重・体脂肪率記録の一覧取得"""
-    metrics = db.query(models.BodyMetric).filter(
-        models.BodyMetric.user_id == current_user.id
-    ).order_by(models.BodyMetric.date.desc()).limit(limit).all()
-    
-    return metrics
+    """体重・体脂肪率記録の一覧取得（新しい順、ページングは /workouts と同じ）"""
+    query = select(models.BodyMetric).where(
+        models.BodyMetric.user_id == current_user.id,
+        *local_date_conditions(models.BodyMetric.local_date, from_date, to_date)
+    )
+    return await list_page(db, query, models.BodyMetric, limit, cursor, unbounded)
 
 @app.post("/body-metrics", response_model=schemas.BodyMetricResponse)
 async def create_body_metric(
     metric_data: schemas.BodyMetricCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """体重・体脂肪率記録の作成"""
+    """体重・体脂肪率記録の作成（日時はユーザーのタイムゾーンでの時刻として保存）"""
+    when = local_time.to_local(metric_data.date, current_user.timezone)
     # 同じ日の記録があるかチェック
-    existing = db.query(models.BodyMetric).filter(
+    existing = await db.scalar(select(models.BodyMetric).where(
         models.BodyMetric.user_id == current_user.id,
-        models.BodyMetric.date.cast(Date) == metric_data.date.date()
-    ).first()
+        models.BodyMetric.local_date == when.date()
+    ).limit(1))
     
     if existing:
         raise HTTPException(
@@ -721,14 +1218,24 @@ async def create_body_metric(
     
     db_metric = models.BodyMetric(
         user_id=current_user.id,
-        date=metric_data.date,
+        date=when,
+        local_date=when.date(),
         body_weight=metric_data.body_weight,
         body_fat_percent=metric_data.body_fat_percent,
         note=metric_data.note
     )
     db.add(db_metric)
-    db.commit()
-    db.refresh(db_metric)
+    await body_trends.refresh_body_trends(db, current_user.id, db_metric.date)
+    await db.flush()
+    version = await data_versions.bump(db, current_user.id, "body")
+    await change_log.record(db, current_user.id, version, upserted={"body_metrics": [db_metric.id]})
+    await db.commit()
+    await db.refresh(db_metric)
+    body_snapshot.invalidate_body_snapshot(current_user.id)
+    
+    # この記録を使うワークアウトの消費カロリーを再計算
+    if db_metric.body_weight is not None:
+        background_tasks.add_task(calorie_ledger.recompute_for_body_metrics, current_user.id, [db_metric.date])
     
     return db_metric
 
@@ -736,19 +1243,22 @@ async def create_body_metric(
 async def update_body_metric(
     metric_id: int,
     metric_data: schemas.BodyMetricUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """体重・体脂肪率記録の更新"""
-    metric = db.query(models.BodyMetric).filter(
+    metric = await db.scalar(select(models.BodyMetric).where(
         models.BodyMetric.id == metric_id,
         models.BodyMetric.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not metric:
         raise HTTPException(status_code=404, detail="記録が見つかりません")
     
     # 更新
+    weight_changed = metric_data.body_weight is not None and metric_data.body_weight != metric.body_weight
+    body_fat_changed = metric_data.body_fat_percent is not None and metric_data.body_fat_percent != metric.body_fat_percent
     if metric_data.body_weight is not None:
         metric.body_weight = metric_data.body_weight
     if metric_data.body_fat_percent is not None:
@@ -756,70 +1266,75 @@ async def update_body_metric(
     if metric_data.note is not None:
         metric.note = metric_data.note
     
-    db.commit()
-    db.refresh(metric)
+    # 測定値が変わった場合はこの記録以降のトレンドを計算し直す
+    if weight_changed or body_fat_changed:
+        await body_trends.refresh_body_trends(db, current_user.id, metric.date)
+    version = await data_versions.bump(db, current_user.id, "body")
+    await change_log.record(db, current_user.id, version, upserted={"body_metrics": [metric.id]})
+    await db.commit()
+    await db.refresh(metric)
+    body_snapshot.invalidate_body_snapshot(current_user.id)
+    
+    # 体重が変わった場合のみ、この記録を使うワークアウトの消費カロリーを再計算
+    if weight_changed:
+        background_tasks.add_task(calorie_ledger.recompute_for_body_metrics, current_user.id, [metric.date])
     return metric
 
 # 身長記録関連エンドポイント
-@app.get("/height-records", response_model=list[schemas.HeightRecordResponse])
+@app.get("/height-records", response_model=schemas.HeightRecordPageResponse, dependencies=[Depends(conditional_get("body"))])
 async def get_height_records(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    unbounded: bool = False,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """身長記録の一覧取得"""
-    records = db.query(models.HeightRecord).filter(
-        models.HeightRecord.user_id == current_user.id
-    ).order_by(models.HeightRecord.date.desc()).all()
-    
-    return records
+    """身長記録の一覧取得（新しい順、ページングは /workouts と同じ）"""
+    query = select(models.HeightRecord).where(
+        models.HeightRecord.user_id == current_user.id,
+        *local_date_conditions(models.HeightRecord.local_date, from_date, to_date)
+    )
+    return await list_page(db, query, models.HeightRecord, limit, cursor, unbounded)
 
 @app.post("/height-records", response_model=schemas.HeightRecordResponse)
 async def create_height_record(
     height_data: schemas.HeightRecordCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """身長記録の作成"""
+    """身長記録の作成（日時はユーザーのタイムゾーンでの時刻として保存）"""
+    when = local_time.to_local(height_data.date, current_user.timezone)
     db_height = models.HeightRecord(
         user_id=current_user.id,
         height_cm=height_data.height_cm,
-        date=height_data.date,
+        date=when,
+        local_date=when.date(),
         note=height_data.note
     )
     db.add(db_height)
-    db.commit()
-    db.refresh(db_height)
+    await db.flush()
+    version = await data_versions.bump(db, current_user.id, "body")
+    await change_log.record(db, current_user.id, version, upserted={"height_records": [db_height.id]})
+    await db.commit()
+    await db.refresh(db_height)
+    body_snapshot.invalidate_body_snapshot(current_user.id)
     
     return db_height
 
 # 身体データ分析エンドポイント
-@app.get("/analytics/body/summary", response_model=schemas.BodyAnalyticsSummaryResponse)
+@app.get("/analytics/body/summary", response_model=schemas.BodyAnalyticsSummaryResponse, dependencies=[Depends(conditional_get("body"))])
 async def get_body_analytics_summary(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """身体データの分析サマリー"""
-    from datetime import datetime, timedelta
+    snapshot = await body_snapshot.load_body_snapshot(db, current_user.id)
+    latest_height = snapshot.latest_height
     
-    # 最新の身長を取得
-    latest_height_record = db.query(models.HeightRecord).filter(
-        models.HeightRecord.user_id == current_user.id
-    ).order_by(models.HeightRecord.date.desc()).first()
-    
-    latest_height = latest_height_record.height_cm if latest_height_record else None
-    
-    # 最新30日間の体重データを取得（体重がNoneでないもののみ）
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    recent_metrics = db.query(models.BodyMetric).filter(
-        models.BodyMetric.user_id == current_user.id,
-        models.BodyMetric.date >= thirty_days_ago,
-        models.BodyMetric.body_weight.isnot(None)  # ← この条件を追加
-    ).order_by(models.BodyMetric.date.desc()).all()
-    
-    # 全体の記録数
-    total_records = db.query(models.BodyMetric).filter(
-        models.BodyMetric.user_id == current_user.id
-    ).count()
+    # 最新30日間の体重データ（新しい順）
+    recent_metrics = snapshot.recent_weights(30, now=local_time.now_in(current_user.timezone))
     
     # 分析データを計算
     latest_weight = None
@@ -829,61 +1344,30 @@ async def get_body_analytics_summary(
     body_fat_trend = "stable"
     
     if recent_metrics:
-        latest_weight = recent_metrics[0].body_weight  # 確実にNoneでない値
-        
-        # BMI計算
-        if latest_weight and latest_height:
-            latest_bmi = round(latest_weight / ((latest_height / 100) ** 2), 1)
+        latest_weight = recent_metrics[0].body_weight
+        latest_bmi = recent_metrics[0].bmi
         
         # 30日前との比較
-        if len(recent_metrics) > 1:
-            oldest_recent = recent_metrics[-1]
-            weight_change_30days = round(latest_weight - oldest_recent.body_weight, 1)
-            
-            if latest_height and latest_bmi:
-                old_bmi = oldest_recent.body_weight / ((latest_height / 100) ** 2)
-                bmi_change_30days = round(latest_bmi - old_bmi, 1)
+        weight_change_30days, bmi_change_30days = snapshot.changes(recent_metrics)
         
         # 体脂肪率トレンド分析（30日間の全記録から）
-        all_recent_metrics = db.query(models.BodyMetric).filter(
-            models.BodyMetric.user_id == current_user.id,
-            models.BodyMetric.date >= thirty_days_ago,
-            models.BodyMetric.body_fat_percent.isnot(None)
-        ).order_by(models.BodyMetric.date.desc()).all()
-        
-        body_fat_values = [m.body_fat_percent for m in all_recent_metrics]
-        if len(body_fat_values) >= 3:
-            recent_avg = sum(body_fat_values[:3]) / 3
-            older_avg = sum(body_fat_values[-3:]) / 3
-            diff = recent_avg - older_avg
-            if diff < -1:
-                body_fat_trend = "improving"
-            elif diff > 1:
-                body_fat_trend = "concerning"
+        body_fat_trend = snapshot.body_fat_trend(30, now=local_time.now_in(current_user.timezone))
     
     # 履歴データを作成（体重データがあるもののみ）
-    history = []
-    for metric in recent_metrics:
-        bmi = None
-        estimated_body_fat = None
-        
-        if metric.body_weight and latest_height:
-            bmi = round(metric.body_weight / ((latest_height / 100) ** 2), 1)
-            
-            # 推定体脂肪率計算
-            if bmi:
-                estimated_body_fat = round(1.39 * bmi + 0.16 * 25 - 10.34, 1)
-                estimated_body_fat = max(5, min(50, estimated_body_fat))
-        
-        history.append(schemas.BodyAnalysisResponse(
+    history = [
+        schemas.BodyAnalysisResponse(
             date=metric.date,
             body_weight=metric.body_weight,
             height_cm=latest_height,
-            bmi=bmi,
+            bmi=metric.bmi,
             body_fat_percent=metric.body_fat_percent,
-            estimated_body_fat=estimated_body_fat,
-            note=metric.note
-        ))
+            estimated_body_fat=metric.estimated_body_fat,
+            note=metric.note,
+            trend_weight=body_snapshot.round_or_none(metric.trend_weight),
+            trend_body_fat=body_snapshot.round_or_none(metric.trend_body_fat)
+        )
+        for metric in recent_metrics
+    ]
     
     return schemas.BodyAnalyticsSummaryResponse(
         latest_weight=latest_weight,
@@ -892,73 +1376,109 @@ async def get_body_analytics_summary(
         weight_change_30days=weight_change_30days,
         bmi_change_30days=bmi_change_30days,
         body_fat_trend=body_fat_trend,
-        total_records=total_records,
+        **snapshot.latest_trends(),
+        total_records=snapshot.total_records,
         history=history
     )
 
-@app.get("/analytics/body/bmi-history")
+# BMI履歴の集約単位と上限
+BMI_HISTORY_BUCKETS = ("day", "week", "month")
+BMI_HISTORY_DEFAULT_LIMIT = 500
+BMI_HISTORY_MAX_LIMIT = 1000
+BMI_HISTORY_MAX_POINTS = 1000
+BMI_HISTORY_MAX_DAYS = 36500  # 約100年（全期間を指定できる上限）
+
+@app.get("/analytics/body/bmi-history", dependencies=[Depends(conditional_get("body"))])
 async def get_bmi_history(
-    days: int = 90,  # デフォルト90日
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    days: int = Query(90, ge=1, le=BMI_HISTORY_MAX_DAYS),  # デフォルト90日
+    bucket: Optional[str] = None,
+    max_points: Optional[int] = None,
+    limit: int = BMI_HISTORY_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """BMI履歴を取得"""
-    from datetime import datetime, timedelta
+    """
+    BMI履歴を取得（新しい順）
+
+    bucket（day / week / month）を指定すると期間ごとの平均体重とそのBMIを返す。
+    max_points を指定すると形を保ったまま（LTTB）その点数以下に間引いて全期間を返す。
+    max_points を指定しない場合は1回に最大 limit 件で、古いページは next_cursor を cursor に渡して取得する。
+    """
+    if bucket is not None and bucket not in BMI_HISTORY_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket は {', '.join(BMI_HISTORY_BUCKETS)} のいずれかです")
+    if max_points is not None and not 3 <= max_points <= BMI_HISTORY_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"max_points は 3〜{BMI_HISTORY_MAX_POINTS} で指定してください")
+    if max_points is not None and cursor is not None:
+        raise HTTPException(status_code=400, detail="cursor は max_points と同時に指定できません")
+    limit = max(1, min(limit, BMI_HISTORY_MAX_LIMIT))
+    
+    before = None
+    if cursor is not None:
+        try:
+            if bucket is None:
+                before = decode_cursor(cursor, datetime.fromisoformat, int)
+            else:
+                before = decode_cursor(cursor, date.fromisoformat)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="cursor が不正です")
     
-    # 最新の身長を取得
-    latest_height_record = db.query(models.HeightRecord).filter(
-        models.HeightRecord.user_id == current_user.id
-    ).order_by(models.HeightRecord.date.desc()).first()
+    snapshot = await body_snapshot.load_body_snapshot(db, current_user.id)
     
-    if not latest_height_record:
+    if snapshot.latest_height is None:
         raise HTTPException(status_code=400, detail="身長の記録が必要です")
     
-    height_cm = latest_height_record.height_cm
-    
-    # 指定期間の体重データを取得
-    start_date = datetime.now() - timedelta(days=days)
-    metrics = db.query(models.BodyMetric).filter(
-        models.BodyMetric.user_id == current_user.id,
-        models.BodyMetric.date >= start_date,
-        models.BodyMetric.body_weight.isnot(None)
-    ).order_by(models.BodyMetric.date.desc()).all()
-    
-    # BMI計算
-    bmi_history = []
-    for metric in metrics:
-        bmi = round(metric.body_weight / ((height_cm / 100) ** 2), 1)
-        bmi_category = ""
-        
-        if bmi < 18.5:
-            bmi_category = "低体重"
-        elif bmi < 25:
-            bmi_category = "標準"
-        elif bmi < 30:
-            bmi_category = "過体重"
-        else:
-            bmi_category = "肥満"
-        
-        bmi_history.append({
-            "date": metric.date,
-            "weight": metric.body_weight,
-            "bmi": bmi,
-            "bmi_category": bmi_category,
-            "note": metric.note
-        })
+    # 指定期間の体重データ（古い順、BMI・区分はスナップショットで計算済み）
+    since = local_time.now_in(current_user.timezone) - timedelta(days=days)
+    period = snapshot.weights_between(since)
+    latest_bmi = period[-1].bmi if period else None
+    if bucket is None:
+        if before is not None:
+            period = snapshot.weights_between(since, before)
+        series = [
+            {
+                "id": metric.id,
+                "date": metric.date,
+                "weight": metric.body_weight,
+                "bmi": metric.bmi,
+                "bmi_category": metric.bmi_category,
+                "note": metric.note
+            }
+            for metric in period
+        ]
+        position = lambda point: point["date"].timestamp()
+    else:
+        series = snapshot.bucket_weights(period, bucket)
+        if before is not None:
+            series = [point for point in series if point["date"] < before[0]]
+        position = lambda point: point["date"].toordinal()
+    total_records = len(series)
+    
+    # 間引き（全期間）または件数の上限（新しい方から limit 件）
+    next_cursor = None
+    if max_points is not None:
+        series = downsampling.lttb(series, max_points, x=position, y=lambda point: point["weight"])
+    elif len(series) > limit:
+        series = series[-limit:]
+        oldest = series[0]
+        next_cursor = encode_cursor(oldest["date"], oldest["id"]) if bucket is None else encode_cursor(oldest["date"])
     
     return {
-        "height_cm": height_cm,
+        "height_cm": snapshot.latest_height,
         "period_days": days,
-        "total_records": len(bmi_history),
-        "latest_bmi": bmi_history[0]["bmi"] if bmi_history else None,
-        "history": bmi_history
+        "bucket": bucket,
+        "max_points": max_points,
+        "total_records": total_records,
+        "latest_bmi": latest_bmi,
+        "history": series[::-1],
+        "next_cursor": next_cursor
     }
 
 # ユーザープロフィール関連エンドポイント
-@app.get("/profile", response_model=schemas.UserProfileResponse)
+@app.get("/profile", response_model=schemas.UserProfileResponse, dependencies=[Depends(conditional_get("settings"))])
 async def get_user_profile(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ユーザープロフィール取得"""
     from datetime import date
@@ -978,6 +1498,7 @@ async def get_user_profile(
         username=current_user.username,
         birth_date=current_user.birth_date,
         gender=current_user.gender,
+        timezone=current_user.timezone,
         age=age,
         created_at=current_user.created_at
     )
@@ -985,23 +1506,26 @@ async def get_user_profile(
 @app.put("/profile", response_model=schemas.UserProfileResponse)
 async def update_user_profile(
     profile_data: schemas.UserProfileUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ユーザープロフィール更新"""
     from datetime import date
     
+    # キャッシュ済みスナップショットではなく、更新用にユーザー行を読み込む
+    user = await db.get(models.User, current_user.id)
+    
     # ユーザーネームの検証
     if profile_data.username is not None:
         if profile_data.username.strip() == "":
             # 空文字の場合はNoneに設定（ユーザーネーム削除）
-            current_user.username = None
+            user.username = None
         else:
             # ユーザーネームの重複チェック
-            existing_user = db.query(models.User).filter(
+            existing_user = await db.scalar(select(models.User).where(
                 models.User.username == profile_data.username,
-                models.User.id != current_user.id
-            ).first()
+                models.User.id != user.id
+            ).limit(1))
             if existing_user:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -1015,7 +1539,7 @@ async def update_user_profile(
                     detail="ユーザーネームは3文字以上20文字以下で入力してください"
                 )
             
-            current_user.username = profile_data.username
+            user.username = profile_data.username
     
     # 性別の検証
     if profile_data.gender and profile_data.gender not in ["male", "female", "other"]:
@@ -1024,6 +1548,13 @@ async def update_user_profile(
             detail="性別は male, female, other のいずれかを指定してください"
         )
     
+    # タイムゾーンの検証（IANAタイムゾーン名）
+    if profile_data.timezone is not None and not local_time.is_valid_timezone(profile_data.timezone):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="タイムゾーンは Asia/Tokyo のような IANA タイムゾーン名で指定してください"
+        )
+    
     # 生年月日の検証
     if profile_data.birth_date:
         today = date.today()
@@ -1043,40 +1574,48 @@ async def update_user_profile(
     
     # 更新
     if profile_data.birth_date is not None:
-        current_user.birth_date = profile_data.birth_date
+        user.birth_date = profile_data.birth_date
     if profile_data.gender is not None:
-        current_user.gender = profile_data.gender
-    
-    db.commit()
-    db.refresh(current_user)
+        user.gender = profile_data.gender
+    if profile_data.timezone is not None:
+        user.timezone = profile_data.timezone
+    
+    # データバージョンを進め、キャッシュ済みのユーザー情報を破棄
+    user.data_version = models.User.data_version + 1
+    version = await data_versions.bump(db, user.id, "settings")
+    await change_log.record(db, user.id, version, upserted={"profile": [user.id]})
+    await db.commit()
+    await db.refresh(user)
+    invalidate_cached_user(user.id)
     
     # 年齢計算
     age = None
-    if current_user.birth_date:
+    if user.birth_date:
         today = date.today()
-        age = today.year - current_user.birth_date.year
-        if today.month < current_user.birth_date.month or \
-           (today.month == current_user.birth_date.month and today.day < current_user.birth_date.day):
+        age = today.year - user.birth_date.year
+        if today.month < user.birth_date.month or \
+           (today.month == user.birth_date.month and today.day < user.birth_date.day):
             age -= 1
     
     return schemas.UserProfileResponse(
-        id=current_user.id,
-        email=current_user.email,
-        username=current_user.username,
-        birth_date=current_user.birth_date,
-        gender=current_user.gender,
+        id=user.id,
+        email=user.email,
+        username=user.username,
+        birth_date=user.birth_date,
+        gender=user.gender,
+        timezone=user.timezone,
         age=age,
-        created_at=current_user.created_at
+        created_at=user.created_at
     )
 
 # 高度な身体データ分析エンドポイント（年齢・性別考慮）
-@app.get("/analytics/body/advanced-summary", response_model=schemas.AdvancedBodyAnalyticsSummaryResponse)
+@app.get("/analytics/body/advanced-summary", response_model=schemas.AdvancedBodyAnalyticsSummaryResponse, dependencies=[Depends(conditional_get("body", "settings"))])
 async def get_advanced_body_analytics_summary(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """年齢・性別を考慮した高度な身体データ分析"""
-    from datetime import datetime, timedelta, date
+    from datetime import date
     
     # ユーザーの年齢計算
     age = None
@@ -1087,37 +1626,18 @@ async def get_advanced_body_analytics_summary(
            (today.month == current_user.birth_date.month and today.day < current_user.birth_date.day):
             age -= 1
     
-    # 最新の身長を取得
-    latest_height_record = db.query(models.HeightRecord).filter(
-        models.HeightRecord.user_id == current_user.id
-    ).order_by(models.HeightRecord.date.desc()).first()
+    snapshot = await body_snapshot.load_body_snapshot(db, current_user.id)
+    latest_height = snapshot.latest_height
     
-    latest_height = latest_height_record.height_cm if latest_height_record else None
-    
-    # 最新30日間の体重データを取得
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    recent_metrics = db.query(models.BodyMetric).filter(
-        models.BodyMetric.user_id == current_user.id,
-        models.BodyMetric.date >= thirty_days_ago,
-        models.BodyMetric.body_weight.isnot(None)
-    ).order_by(models.BodyMetric.date.desc()).all()
+    # 最新30日間の体重データ（新しい順）
+    recent_metrics = snapshot.recent_weights(30, now=local_time.now_in(current_user.timezone))
     
     # 基本分析データ
     latest_weight = recent_metrics[0].body_weight if recent_metrics else None
-    latest_bmi = None
-    if latest_weight and latest_height:
-        latest_bmi = round(latest_weight / ((latest_height / 100) ** 2), 1)
+    latest_bmi = recent_metrics[0].bmi if recent_metrics else None
     
     # 変化データ
-    weight_change_30days = None
-    bmi_change_30days = None
-    if len(recent_metrics) > 1:
-        oldest_recent = recent_metrics[-1]
-        if latest_weight:
-            weight_change_30days = round(latest_weight - oldest_recent.body_weight, 1)
-        if latest_bmi and latest_height:
-            old_bmi = oldest_recent.body_weight / ((latest_height / 100) ** 2)
-            bmi_change_30days = round(latest_bmi - old_bmi, 1)
+    weight_change_30days, bmi_change_30days = snapshot.changes(recent_metrics)
     
     # 理想体重範囲計算（BMI 18.5-24.9）
     ideal_weight_range = None
@@ -1169,57 +1689,25 @@ async def get_advanced_body_analytics_summary(
                 bmi_for_age_category = "肥満"
     
     # 体脂肪率トレンド
-    body_fat_trend = "stable"
-    all_recent_metrics = db.query(models.BodyMetric).filter(
-        models.BodyMetric.user_id == current_user.id,
-        models.BodyMetric.date >= thirty_days_ago,
-        models.BodyMetric.body_fat_percent.isnot(None)
-    ).order_by(models.BodyMetric.date.desc()).all()
-    
-    body_fat_values = [m.body_fat_percent for m in all_recent_metrics]
-    if len(body_fat_values) >= 3:
-        recent_avg = sum(body_fat_values[:3]) / 3
-        older_avg = sum(body_fat_values[-3:]) / 3
-        diff = recent_avg - older_avg
-        if diff < -1:
-            body_fat_trend = "improving"
-        elif diff > 1:
-            body_fat_trend = "concerning"
-    
-    # 履歴データ作成
-    history = []
-    for metric in recent_metrics:
-        bmi = None
-        estimated_body_fat = None
-        
-        if metric.body_weight and latest_height:
-            bmi = round(metric.body_weight / ((latest_height / 100) ** 2), 1)
-            
-            # 性別・年齢考慮の推定体脂肪率
-            if bmi and age and current_user.gender:
-                if current_user.gender == "male":
-                    estimated_body_fat = round(1.20 * bmi + 0.23 * age - 16.2, 1)
-                elif current_user.gender == "female":
-                    estimated_body_fat = round(1.20 * bmi + 0.23 * age - 5.4, 1)
-                
-                if estimated_body_fat:
-                    estimated_body_fat = max(5, min(50, estimated_body_fat))
-        
-        history.append(schemas.AdvancedBodyAnalysisResponse(
+    body_fat_trend = snapshot.body_fat_trend(30, now=local_time.now_in(current_user.timezone))
+    
+    # 履歴データ作成（性別・年齢考慮の推定体脂肪率）
+    history = [
+        schemas.AdvancedBodyAnalysisResponse(
             date=metric.date,
             body_weight=metric.body_weight,
             height_cm=latest_height,
-            bmi=bmi,
+            bmi=metric.bmi,
             body_fat_percent=metric.body_fat_percent,
-            estimated_body_fat=estimated_body_fat,
+            estimated_body_fat=body_snapshot.estimated_body_fat_for(metric.bmi, age, current_user.gender),
             ideal_weight_range=ideal_weight_range,
             bmr=bmr,
-            note=metric.note
-        ))
-    
-    total_records = db.query(models.BodyMetric).filter(
-        models.BodyMetric.user_id == current_user.id
-    ).count()
+            note=metric.note,
+            trend_weight=body_snapshot.round_or_none(metric.trend_weight),
+            trend_body_fat=body_snapshot.round_or_none(metric.trend_body_fat)
+        )
+        for metric in recent_metrics
+    ]
     
     return schemas.AdvancedBodyAnalyticsSummaryResponse(
         latest_weight=latest_weight,
@@ -1230,303 +1718,36 @@ async def get_advanced_body_analytics_summary(
         weight_change_30days=weight_change_30days,
         bmi_change_30days=bmi_change_30days,
         body_fat_trend=body_fat_trend,
+        **snapshot.latest_trends(),
         ideal_weight_range=ideal_weight_range,
         bmr=bmr,
         daily_calorie_needs=daily_calorie_needs,
         bmi_for_age_category=bmi_for_age_category,
-        total_records=total_records,
+        total_records=snapshot.total_records,
         history=history
     )
 
 # 既存のコードの最後に以下を追加
 
-# カロリー計算のヘルパー関数
-def _calculate_total_calories_burned(db: Session, user_id: int, weight_kg: float) -> float:
-    """ユーザーの全ワークアウトの消費カロリーを計算"""
-    total_calories = 0
-    
-    # 完了済みワークアウトを取得
-    workouts = db.query(models.Workout).filter(
-        models.Workout.user_id == user_id,
-        models.Workout.is_completed == True
-    ).all()
-    
-    for workout in workouts:
-        total_calories += _calculate_workout_calories(db, workout.id, weight_kg)
-    
-    return total_calories
-
-def _calculate_weekly_calories_burned(db: Session, user_id: int, weight_kg: float, week_start) -> float:
-    """今週の消費カロリーを計算"""
-    total_calories = 0
-    
-    # 今週の完了済みワークアウトを取得
-    workouts = db.query(models.Workout).filter(
-        models.Workout.user_id == user_id,
-        models.Workout.date >= week_start,
-        models.Workout.is_completed == True
-    ).all()
-    
-    for workout in workouts:
-        total_calories += _calculate_workout_calories(db, workout.id, weight_kg)
-    
-    return total_calories
-
-def _calculate_daily_calories_burned(db: Session, user_id: int, weight_kg: float, target_date) -> float:
-    """指定日の消費カロリーを計算"""
-    from datetime import timedelta
-    
-    total_calories = 0
-    
-    # 指定日の完了済みワークアウトを取得
-    workouts = db.query(models.Workout).filter(
-        models.Workout.user_id == user_id,
-        models.Workout.date >= target_date,
-        models.Workout.date < target_date + timedelta(days=1),
-        models.Workout.is_completed == True
-    ).all()
-    
-    for workout in workouts:
-        total_calories += _calculate_workout_calories(db, workout.id, weight_kg)
-    
-    return total_calories
-
-def _calculate_workout_calories(db: Session, workout_id: int, weight_kg: float) -> float:
-    """単一ワークアウトの消費カロリーを計算（ハイブリッド方式）"""
-    total_calories = 0
-    
-    # 包括的な内蔵種目METs値（2024 Compendium of Physical Activities準拠）
-    BUILTIN_EXERCISE_METS = {
-        # 胸 - プレス系
-        'バーベルベンチプレス': 3.5,
-        'ダンベルベンチプレス': 3.5,
-        'スミスマシンベンチプレス': 3.5,
-        'マシンチェストプレス': 3.0,
-        
-        # 胸 - フライ系
-        'ダンベルフライ': 3.0,
-        'ケーブルフライ': 3.0,
-        'ペックデック': 3.0,
-        
-        # 胸 - 自重
-        'プッシュアップ': 3.0,
-        'ディップス': 3.5,
-        
-        # 背中 - 垂直引き
-        'プルアップ': 6.0,
-        'ラットプルダウン': 3.5,
-        
-        # 背中 - 水平引き
-        'バーベルローイング': 3.5,
-        'ダンベルロー': 3.5,
-        'シーテッドロー': 3.5,
-        'Tバーロー': 3.5,
-        'チェストサポートロー': 3.0,
-        
-        # 背中 - その他
-        'デッドリフト': 5.0,
-        'ルーマニアンデッドリフト': 4.5,
-        'グッドモーニング': 4.0,
-        'シュラッグ': 3.0,
-        
-        # 肩 - プレス系
-        'ダンベルショルダープレス': 3.5,
-        'バーベルショルダープレス': 3.5,
-        'アーノルドプレス': 4.0,
-        'スミスマシンショルダープレス': 3.5,
-        
-        # 肩 - レイズ系
-        'サイドレイズ': 3.0,
-        'フロントレイズ': 3.0,
-        'リアレイズ': 3.0,
-        'ケーブルサイドレイズ': 3.0,
-        
-        # 肩 - その他
-        'アップライトロー': 3.5,
-        'フェイスプル': 3.0,
-        
-        # 脚 - 大腿四頭筋
-        'バーベルスクワット': 5.0,
-        'スミスマシンスクワット': 4.5,
-        'レッグプレス': 3.5,
-        'レッグエクステンション': 3.0,
-        
-        # 脚 - ハムストリングス・臀部
-        'ヒップスラスト': 4.0,
-        'グルートブリッジ': 3.5,
-        'レッグカール': 3.0,
-        
-        # 脚 - その他
-        'ランジ': 4.0,
-        'ステップアップ': 3.5,
-        'カーフレイズ': 3.0,
-        
-        # 腕 - 上腕二頭筋
-        'バーベルカール': 3.0,
-        'ダンベルカール': 3.0,
-        'コンセントレーションカール': 3.0,
-        'プリーチャーカール': 3.0,
-        'ケーブルカール': 3.0,
-        
-        # 腕 - 上腕三頭筋
-        'トライセプスプレスダウン': 3.0,
-        'オーバーヘッドエクステンション': 3.0,
-        'フレンチプレス': 3.0,
-        'ナローベンチプレス': 3.5,
-        'キックバック': 3.0,
-        
-        # 体幹・腹筋
-        'クランチ': 3.0,
-        'シットアップ': 3.0,
-        'レッグレイズ': 3.5,
-        'アブローラー': 4.0,
-        'プランク': 3.0,
-        'ロシアンツイスト': 3.5,
-        'ケーブルウッドチョッパー': 3.5,
-        
-        # 前腕・握力
-        'リストカール': 2.5,
-        'リバースリストカール': 2.5,
-        'ハンマーカール': 3.0,
-        'ファーマーズウォーク': 4.0,
-        
-        # 有酸素運動
-        'ランニング': 8.0,
-        'ウォーキング': 3.5,
-        'エアロバイク': 7.0,
-        'クロストレーナー': 5.0,
-        'ローイングマシン': 7.0,
-        'ステアクライマー': 6.0,
-        'サーキットトレーニング': 8.0,
-        'ジャンプロープ': 9.0,
-        'HIIT': 10.0,
-        
-        # 既存の種目（後方互換性）
-        'ベンチプレス': 3.5,
-        'スクワット': 5.0,
-        'ショルダープレス': 3.5,
-        'バーベルロウ': 3.5,
-        'インクラインベンチプレス': 3.5,
-        'サイクリング': 7.0,
-        'エリプティカル': 5.0,
-        '水泳': 8.0,
-        'ローイング': 7.0,
-    }
-    
-    # ワークアウトの全セットを取得
-    sets = db.query(models.Set).join(models.WorkoutExercise).join(models.Exercise).filter(
-        models.WorkoutExercise.workout_id == workout_id,
-        models.Set.is_warmup == False  # ウォームアップは除外
-    ).all()
-    
-    # ハイブリッドMETs値による消費カロリー計算
-    for set_data in sets:
-        exercise = set_data.workout_exercise.exercise
-        calories = 0
-        
-        # METs値の決定（ハイブリッド方式）
-        def get_exercise_mets(exercise, exercise_type):
-            """種目のMETs値を取得（ハイブリッド方式）"""
-            # 1. カスタム種目でcustom_mets_valueが設定されている場合
-            if exercise.custom_mets_value and exercise.custom_mets_value > 0:
-                return exercise.custom_mets_value
-            
-            # 2. 内蔵種目の場合、科学的根拠に基づく値を使用
-            if exercise.is_builtin and exercise.name in BUILTIN_EXERCISE_METS:
-                return BUILTIN_EXERCISE_METS[exercise.name]
-            
-            # 3. デフォルト値（exercise_typeに基づく）
-            if exercise_type == 'strength':
-                return 3.5  # 筋トレデフォルト
-            elif exercise_type == 'cardio':
-                return 5.0  # 有酸素デフォルト
-            else:
-                return 3.5  # 全体デフォルト
-        
-        if exercise.exercise_type == 'strength':
-            # METs値を取得
-            mets = get_exercise_mets(exercise, 'strength')
-            
-            # 筋力トレーニング: 1セット約1分の運動時間（セット間休憩除く）
-            duration_hours = 1 / 60  # 1分 = 0.0167時間
-            calories = duration_hours * mets * weight_kg
-            
-        elif exercise.exercise_type == 'cardio':
-            # METs値を取得
-            mets = get_exercise_mets(exercise, 'cardio')
-            
-            # 有酸素運動: 時間が記録されている場合はそれを使用
-            if set_data.duration_seconds:
-                duration_hours = set_data.duration_seconds / 3600
-                
-                # 心拍数による調整（記録されている場合）
-                if set_data.avg_heart_rate:
-                    if set_data.avg_heart_rate < 120:
-                        mets = mets * 0.7  # 軽度の調整
-                    elif set_data.avg_heart_rate > 150:
-                        mets = mets * 1.3  # 高強度の調整
-                
-                calories = duration_hours * mets * weight_kg
-            else:
-                # 時間が記録されていない場合は10分と仮定
-                duration_hours = 10 / 60
-                calories = duration_hours * mets * weight_kg
-        
-        total_calories += calories
-    
-    return total_calories
-
 # ダッシュボード関連エンドポイント
-@app.get("/dashboard/stats")
+@app.get("/dashboard/stats", dependencies=[Depends(conditional_get("workouts", "body", "settings"))])
 async def get_dashboard_stats(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ダッシュボード統計データを取得"""
     from datetime import datetime, timedelta, date
     
-    # 今週の開始日を計算（月曜日）
-    today = datetime.now().date()
-    days_since_monday = today.weekday()
-    week_start = today - timedelta(days=days_since_monday)
-    
-    # 総ワークアウト数（完了済みのみ）
-    total_workouts = db.query(models.Workout).filter(
-        models.Workout.user_id == current_user.id,
-        models.Workout.is_completed == True
-    ).count()
-    
-    # 今週のワークアウト数（完了済みのみ）
-    this_week_workouts = db.query(models.Workout).filter(
-        models.Workout.user_id == current_user.id,
-        models.Workout.date >= week_start,
-        models.Workout.is_completed == True
-    ).count()
-    
-    # 総ボリューム計算（ウォームアップ除く、筋力トレーニングのみ）
-    total_sets = db.query(models.Set).join(models.WorkoutExercise).join(models.Workout).filter(
-        models.Workout.user_id == current_user.id,
-        models.Set.is_warmup == False
-    ).join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id).filter(
-        models.Exercise.exercise_type == 'strength',  # 筋力トレーニングのみ
-        models.Set.weight.isnot(None),  # weightがNullでない
-        models.Set.reps.isnot(None)     # repsがNullでない
-    ).all()
-    
-    total_volume = sum(set_data.weight * set_data.reps for set_data in total_sets if set_data.weight and set_data.reps)
+    # ユーザーのタイムゾーンでの今日と今週の開始日（月曜日）
+    today = local_time.today_in(current_user.timezone)
+    week_start = local_time.week_start(today)
     
-    # 今週のボリューム計算（筋力トレーニングのみ）
-    this_week_sets = db.query(models.Set).join(models.WorkoutExercise).join(models.Workout).filter(
-        models.Workout.user_id == current_user.id,
-        models.Workout.date >= week_start,
-        models.Set.is_warmup == False
-    ).join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id).filter(
-        models.Exercise.exercise_type == 'strength',  # 筋力トレーニングのみ
-        models.Set.weight.isnot(None),  # weightがNullでない
-        models.Set.reps.isnot(None)     # repsがNullでない
-    ).all()
-    
-    this_week_volume = sum(set_data.weight * set_data.reps for set_data in this_week_sets if set_data.weight and set_data.reps)
+    # 累計・今週の統計（user_stats の主キー参照、履歴の長さに依存しない）
+    stats, week_stats = await user_stats.get_dashboard_stats(db, current_user.id, week_start)
+    total_workouts = stats.total_completed_workouts if stats else 0
+    total_volume = stats.total_volume if stats else 0
+    this_week_workouts = week_stats.workout_count if week_stats else 0
+    this_week_volume = week_stats.volume if week_stats else 0
     
     # 消費カロリー計算のための準備
     this_week_calories_burned = 0
@@ -1534,23 +1755,23 @@ async def get_dashboard_stats(
     today_total_estimated_calories = 0
     
     # ユーザーの体重とプロフィール取得
-    latest_weight_record = db.query(models.BodyMetric).filter(
+    latest_weight_record = await db.scalar(select(models.BodyMetric).where(
         models.BodyMetric.user_id == current_user.id,
         models.BodyMetric.body_weight.isnot(None)
-    ).order_by(models.BodyMetric.date.desc()).first()
+    ).order_by(models.BodyMetric.date.desc()).limit(1))
     
     user_weight = latest_weight_record.body_weight if latest_weight_record else None
     
     # 年齢と身長計算
     age = None
-    latest_height_record = db.query(models.HeightRecord).filter(
+    latest_height_record = await db.scalar(select(models.HeightRecord).where(
         models.HeightRecord.user_id == current_user.id
-    ).order_by(models.HeightRecord.date.desc()).first()
+    ).order_by(models.HeightRecord.date.desc()).limit(1))
     
     user_height = latest_height_record.height_cm if latest_height_record else None
     
     if current_user.birth_date:
-        today_date = date.today()
+        today_date = today
         age = today_date.year - current_user.birth_date.year
         if today_date.month < current_user.birth_date.month or \
            (today_date.month == current_user.birth_date.month and today_date.day < current_user.birth_date.day):
@@ -1558,11 +1779,12 @@ async def get_dashboard_stats(
     
     # 消費カロリー計算（体重データがある場合のみ）
     if user_weight:
-        # 今週のワークアウトの消費カロリー
-        this_week_calories_burned = _calculate_weekly_calories_burned(db, current_user.id, user_weight, week_start)
+        # 今週のワークアウトの消費カロリー（台帳から取得、今日の分も同じ結果から求める）
+        week_calories = await calorie_ledger.get_ledger(db, current_user.id, week=local_time.iso_week_key(today))
+        this_week_calories_burned = calorie_ledger.total_calories(week_calories)
         
         # 今日のワークアウトの消費カロリー
-        today_calories_burned = _calculate_daily_calories_burned(db, current_user.id, user_weight, today)
+        today_calories_burned = calorie_ledger.total_calories(week_calories, today, today + timedelta(days=1))
         
         # 今日の総消費カロリー推定値（BMR + ワークアウト + 日常活動）
         if user_height and age and current_user.gender:
@@ -1582,11 +1804,11 @@ async def get_dashboard_stats(
     weight_change_since_last = None
     if latest_weight_record:
         # 前回の記録を取得
-        previous_weight_record = db.query(models.BodyMetric).filter(
+        previous_weight_record = await db.scalar(select(models.BodyMetric).where(
             models.BodyMetric.user_id == current_user.id,
             models.BodyMetric.body_weight.isnot(None),
             models.BodyMetric.id != latest_weight_record.id
-        ).order_by(models.BodyMetric.date.desc()).first()
+        ).order_by(models.BodyMetric.date.desc()).limit(1))
         
         if previous_weight_record:
             weight_change_since_last = round(latest_weight_record.body_weight - previous_weight_record.body_weight, 1)
@@ -1605,25 +1827,73 @@ async def get_dashboard_stats(
         "user_gender": current_user.gender
     }
 
+@app.get("/analytics/calories", dependencies=[Depends(conditional_get("workouts", "body"))])
+async def get_calorie_breakdown(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """期間内の完了済みワークアウトの消費カロリー（ワークアウト別・種目別の内訳、各ワークアウト日時点の体重で計算）"""
+    latest_weight_record = await db.scalar(select(models.BodyMetric).where(
+        models.BodyMetric.user_id == current_user.id,
+        models.BodyMetric.body_weight.isnot(None)
+    ).order_by(models.BodyMetric.date.desc()).limit(1))
+    
+    if not latest_weight_record:
+        return {"total_calories": 0, "body_weight": None, "workouts": []}
+    
+    entries = await calorie_ledger.get_ledger(
+        db, current_user.id,
+        date_from=start_date,
+        date_to=end_date + timedelta(days=1) if end_date else None,  # 終了日を含む
+    )
+    
+    exercise_ids = {exercise_id for entry in entries for exercise_id in entry.by_exercise}
+    exercise_names = dict((await db.execute(
+        select(models.Exercise.id, models.Exercise.name).where(models.Exercise.id.in_(exercise_ids))
+    )).all()) if exercise_ids else {}
+    
+    workouts = [
+        {
+            "workout_id": entry.workout_id,
+            "date": entry.date,
+            "body_weight": entry.body_weight,
+            "calories": round(entry.total, 1),
+            "exercises": [
+                {"exercise_id": exercise_id, "exercise_name": exercise_names.get(exercise_id), "calories": round(kcal, 1)}
+                for exercise_id, kcal in entry.by_exercise.items()
+            ],
+        }
+        for entry in entries
+        if entry.by_exercise  # セットのないワークアウトは含めない
+    ]
+    
+    return {
+        "total_calories": round(calorie_ledger.total_calories(entries), 1),
+        "body_weight": latest_weight_record.body_weight,
+        "workouts": workouts,
+    }
+
 # 目標設定関連エンドポイント
-@app.get("/dashboard/calorie-goal")
+@app.get("/dashboard/calorie-goal", dependencies=[Depends(conditional_get("body", "settings"))])
 async def get_calorie_goal(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ユーザーの消費カロリー目標を取得"""
     # 現在は簡易的な実装（後でデータベースに保存するように拡張可能）
     # BMRベースの推奨カロリー目標を計算
     
     # 最新の体重と身長を取得
-    latest_weight_record = db.query(models.BodyMetric).filter(
+    latest_weight_record = await db.scalar(select(models.BodyMetric).where(
         models.BodyMetric.user_id == current_user.id,
         models.BodyMetric.body_weight.isnot(None)
-    ).order_by(models.BodyMetric.date.desc()).first()
+    ).order_by(models.BodyMetric.date.desc()).limit(1))
     
-    latest_height_record = db.query(models.HeightRecord).filter(
+    latest_height_record = await db.scalar(select(models.HeightRecord).where(
         models.HeightRecord.user_id == current_user.id
-    ).order_by(models.HeightRecord.date.desc()).first()
+    ).order_by(models.HeightRecord.date.desc()).limit(1))
     
     if not latest_weight_record or not latest_height_record:
         return {
@@ -1680,7 +1950,7 @@ async def get_calorie_goal(
 # /auth/me エンドポイントを追加
 @app.get("/auth/me")
 async def get_current_user_info(
-    current_user: models.User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """現在のユーザー情報を取得"""
     return {
@@ -1697,13 +1967,13 @@ async def logout():
 @app.patch("/workouts/{workout_id}/complete")
 async def complete_workout(
     workout_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    workout = db.query(models.Workout).filter(
+    workout = await db.scalar(select(models.Workout).where(
         models.Workout.id == workout_id,
         models.Workout.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not workout:
         raise HTTPException(status_code=404, detail="ワークアウトが見つかりません")
@@ -1714,35 +1984,32 @@ async def complete_workout(
     # ワークアウトを完了状態に更新
     workout.is_completed = True
     workout.completed_at = func.now()
-    db.commit()
-    db.refresh(workout)
+    await user_stats.record_workout_completed(db, current_user.id, workout.date, workout.local_date)
+    # 消費カロリーはワークアウト日時点の体重で計算して台帳に保存
+    await calorie_ledger.refresh_workout_calories(db, current_user.id, {workout.id: workout.date})
+    version = await data_versions.bump(db, current_user.id, "workouts")
+    await change_log.record(db, current_user.id, version, upserted={"workouts": [workout.id]})
+    await db.commit()
+    await db.refresh(workout)
     
     return {"message": "ワークアウトが完了しました", "workout_id": workout_id}
 
 # ユーザー設定関連エンドポイント
-@app.get("/settings", response_model=schemas.UserSettingsResponse)
-def get_user_settings(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@app.get("/settings", response_model=schemas.UserSettingsResponse, dependencies=[Depends(conditional_get("settings"))])
+async def get_user_settings(
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """ユーザー設定を取得"""
-    settings = db.query(models.UserSettings).filter(
+    """ユーザー設定を取得（設定はサインアップ時に作成される）"""
+    settings = await db.scalar(select(models.UserSettings).where(
         models.UserSettings.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not settings:
-        # 設定が存在しない場合はデフォルト設定を作成
-        default_dashboard_config = {
-            "selectedWidgets": ["total_workouts", "this_week_workouts", "total_volume", "this_week_volume"],
-            "maxWidgets": 4
-        }
-        settings = models.UserSettings(
-            user_id=current_user.id,
-            dashboard_config=json.dumps(default_dashboard_config)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="ユーザー設定が見つかりません"
         )
-        db.add(settings)
-        db.commit()
-        db.refresh(settings)
     
     # JSON文字列をパース
     dashboard_config = None
@@ -1761,15 +2028,15 @@ def get_user_settings(
     )
 
 @app.put("/settings/dashboard", response_model=schemas.UserSettingsResponse)
-def update_dashboard_settings(
+async def update_dashboard_settings(
     dashboard_config: schemas.DashboardConfigCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """ダッシュボード設定を更新"""
-    settings = db.query(models.UserSettings).filter(
+    settings = await db.scalar(select(models.UserSettings).where(
         models.UserSettings.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not settings:
         # 設定が存在しない場合は新規作成
@@ -1783,8 +2050,11 @@ def update_dashboard_settings(
         settings.dashboard_config = json.dumps(dashboard_config.dict())
         settings.updated_at = func.now()
     
-    db.commit()
-    db.refresh(settings)
+    await db.flush()
+    version = await data_versions.bump(db, current_user.id, "settings")
+    await change_log.record(db, current_user.id, version, upserted={"settings": [settings.id]})
+    await db.commit()
+    await db.refresh(settings)
     
     # レスポンス用にパース
     dashboard_config_dict = json.loads(settings.dashboard_config)
@@ -1797,6 +2067,24 @@ def update_dashboard_settings(
         updated_at=settings.updated_at
     )
 
+# 同期（差分取得）エンドポイント
+@app.get("/sync", response_model=schemas.SyncResponse)
+async def sync_changes(
+    since: int = 0,
+    limit: int = change_log.SYNC_DEFAULT_LIMIT,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    since（前回の応答の version、初回は0）より後に作成・更新・削除された行をテーブルごとに返す
+
+    行は列名を1回だけ並べた columns と値の配列 rows、削除は ID の deleted で返す。has_more が真なら
+    version を since にして続きを取得する。統計・分析などの集計は含めないため、domains が変わった領域だけ読み直す。
+    """
+    return await change_log.changes_since(
+        db, current_user.id, max(0, since), max(1, min(limit, change_log.SYNC_MAX_LIMIT))
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+種目ごとの有効METs値の解決とキャッシュ
+
+有効値は 1. custom_mets_value（正の値のとき） 2. builtin_mets_value 3. exercise_type のデフォルト
+の順で決まる。値は種目IDをキーにプロセス内でキャッシュし、同一プロセスでの種目の更新・削除時は
+ORMイベントで破棄する（シードスクリプトなど別プロセスからの変更はTTLで反映される）。
+"""
+
+import os
+from typing import Iterable, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from cache import TTLCache
+
+# exercise_type ごとのデフォルトMETs値
+DEFAULT_METS_BY_TYPE = {
+    'strength': 3.5,  # 筋トレデフォルト
+    'cardio': 5.0,    # 有酸素デフォルト
+}
+DEFAULT_METS = 3.5    # 全体デフォルト
+
+METS_CACHE_TTL_SECONDS = float(os.getenv("MYFIT_METS_CACHE_TTL_SECONDS", "600"))
+METS_CACHE_MAX_ENTRIES = int(os.getenv("MYFIT_METS_CACHE_MAX_ENTRIES", "4096"))
+
+exercise_mets_cache = TTLCache(maxsize=METS_CACHE_MAX_ENTRIES, ttl_seconds=METS_CACHE_TTL_SECONDS)
+
+
+def effective_mets(custom_mets_value: Optional[float], builtin_mets_value: Optional[float], exercise_type: str) -> float:
+    """種目の有効METs値"""
+    if custom_mets_value and custom_mets_value > 0:
+        return custom_mets_value
+    if builtin_mets_value and builtin_mets_value > 0:
+        return builtin_mets_value
+    return DEFAULT_METS_BY_TYPE.get(exercise_type, DEFAULT_METS)
+
+
+async def get_exercise_mets(db: AsyncSession, exercise_ids: Iterable[int]) -> dict:
+    """種目IDごとの有効METs値を返す（キャッシュにない種目だけを1クエリで読み込む）"""
+    result = {}
+    missing = []
+    for exercise_id in set(exercise_ids):
+        mets = exercise_mets_cache.get(exercise_id)
+        if mets is None:
+            missing.append(exercise_id)
+        else:
+            result[exercise_id] = mets
+
+    if missing:
+        rows = await db.execute(
+            select(
+                models.Exercise.id,
+                models.Exercise.custom_mets_value,
+                models.Exercise.builtin_mets_value,
+                models.Exercise.exercise_type,
+            ).where(models.Exercise.id.in_(missing))
+        )
+        for exercise_id, custom_mets_value, builtin_mets_value, exercise_type in rows:
+            mets = effective_mets(custom_mets_value, builtin_mets_value, exercise_type)
+            exercise_mets_cache.set(exercise_id, mets)
+            result[exercise_id] = mets
+    return result
+
+
+def invalidate_exercise_mets(exercise_id: Optional[int] = None):
+    """種目のキャッシュを破棄する（ID省略時は全件）"""
+    if exercise_id is None:
+        exercise_mets_cache.clear()
+    else:
+        exercise_mets_cache.pop(exercise_id)
+
+
+@event.listens_for(models.Exercise, "after_update")
+@event.listens_for(models.Exercise, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    invalidate_exercise_mets(target.id)
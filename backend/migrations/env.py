@@ -0,0 +1,47 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+import models  # noqa: F401  モデル定義をメタデータに登録
+from database import Base, engine
+
+config = context.config
+
+# アプリから呼び出す場合はロガー設定を上書きしない
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """SQLを出力するだけのオフラインモード"""
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """アプリと同じエンジン（PRAGMA設定込み）でマイグレーションを実行"""
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=True,  # SQLiteのALTER TABLE制限に対応
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
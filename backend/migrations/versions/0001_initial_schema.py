@@ -0,0 +1,198 @@
+"""初期スキーマ（Alembic導入前に create_all で作成されていたテーブル）
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 00:55:39.924804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('password_hash', sa.String(), nullable=False),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('birth_date', sa.Date(), nullable=True),
+    sa.Column('gender', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+
+    op.create_table('body_metrics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('body_weight', sa.Float(), nullable=True),
+    sa.Column('body_fat_percent', sa.Float(), nullable=True),
+    sa.Column('note', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('body_metrics', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_body_metrics_id'), ['id'], unique=False)
+
+    op.create_table('exercises',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('muscle_group', sa.String(), nullable=False),
+    sa.Column('exercise_type', sa.String(), nullable=False),
+    sa.Column('is_builtin', sa.Boolean(), nullable=True),
+    sa.Column('category', sa.String(), nullable=True),
+    sa.Column('subcategory', sa.String(), nullable=True),
+    sa.Column('equipment_type', sa.String(), nullable=True),
+    sa.Column('target_muscle', sa.String(), nullable=True),
+    sa.Column('difficulty_level', sa.String(), nullable=True),
+    sa.Column('angle_options', sa.String(), nullable=True),
+    sa.Column('grip_options', sa.String(), nullable=True),
+    sa.Column('stance_options', sa.String(), nullable=True),
+    sa.Column('variation_options', sa.String(), nullable=True),
+    sa.Column('custom_mets_value', sa.Float(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('instructions', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('exercises', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_exercises_id'), ['id'], unique=False)
+
+    op.create_table('height_records',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('height_cm', sa.Float(), nullable=False),
+    sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('note', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('height_records', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_height_records_id'), ['id'], unique=False)
+
+    op.create_table('user_settings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('dashboard_config', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('user_settings', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_settings_id'), ['id'], unique=False)
+
+    op.create_table('workouts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('note', sa.Text(), nullable=True),
+    sa.Column('is_completed', sa.Boolean(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('workouts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_workouts_id'), ['id'], unique=False)
+
+    op.create_table('workout_exercises',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workout_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.Integer(), nullable=False),
+    sa.Column('order_index', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercises.id'], ),
+    sa.ForeignKeyConstraint(['workout_id'], ['workouts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('workout_exercises', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_workout_exercises_id'), ['id'], unique=False)
+
+    op.create_table('exercise_variants',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workout_exercise_id', sa.Integer(), nullable=False),
+    sa.Column('selected_angle', sa.String(), nullable=True),
+    sa.Column('selected_grip', sa.String(), nullable=True),
+    sa.Column('selected_stance', sa.String(), nullable=True),
+    sa.Column('selected_variation', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['workout_exercise_id'], ['workout_exercises.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('exercise_variants', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_exercise_variants_id'), ['id'], unique=False)
+
+    op.create_table('sets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workout_exercise_id', sa.Integer(), nullable=False),
+    sa.Column('set_index', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.Float(), nullable=True),
+    sa.Column('reps', sa.Integer(), nullable=True),
+    sa.Column('rpe', sa.Integer(), nullable=True),
+    sa.Column('duration_seconds', sa.Integer(), nullable=True),
+    sa.Column('distance_km', sa.Float(), nullable=True),
+    sa.Column('incline_percent', sa.Float(), nullable=True),
+    sa.Column('avg_heart_rate', sa.Integer(), nullable=True),
+    sa.Column('is_warmup', sa.Boolean(), nullable=True),
+    sa.Column('note', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['workout_exercise_id'], ['workout_exercises.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sets', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sets_id'), ['id'], unique=False)
+
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('sets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sets_id'))
+
+    op.drop_table('sets')
+    with op.batch_alter_table('exercise_variants', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_exercise_variants_id'))
+
+    op.drop_table('exercise_variants')
+    with op.batch_alter_table('workout_exercises', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_workout_exercises_id'))
+
+    op.drop_table('workout_exercises')
+    with op.batch_alter_table('workouts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_workouts_id'))
+
+    op.drop_table('workouts')
+    with op.batch_alter_table('user_settings', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_settings_id'))
+
+    op.drop_table('user_settings')
+    with op.batch_alter_table('height_records', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_height_records_id'))
+
+    op.drop_table('height_records')
+    with op.batch_alter_table('exercises', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_exercises_id'))
+
+    op.drop_table('exercises')
+    with op.batch_alter_table('body_metrics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_body_metrics_id'))
+
+    op.drop_table('body_metrics')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_username'))
+        batch_op.drop_index(batch_op.f('ix_users_id'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
@@ -0,0 +1,34 @@
+"""users.data_version（トークン・ユーザーキャッシュの検証用バージョン）
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 01:02:11.418262
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # create_all で作成済みのデータベースには既に列がある場合がある
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'data_version' in columns:
+        return
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
@@ -0,0 +1,78 @@
+"""ホットなクエリパス向けの複合インデックス
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 01:10:42.731905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('workouts', schema=None) as batch_op:
+        batch_op.create_index('ix_workouts_user_id_date', ['user_id', 'date'], unique=False)
+        batch_op.create_index('ix_workouts_user_id_is_completed_date', ['user_id', 'is_completed', 'date'], unique=False)
+
+    with op.batch_alter_table('workout_exercises', schema=None) as batch_op:
+        batch_op.create_index('ix_workout_exercises_workout_id_order_index', ['workout_id', 'order_index'], unique=False)
+        batch_op.create_index('ix_workout_exercises_exercise_id', ['exercise_id'], unique=False)
+
+    with op.batch_alter_table('sets', schema=None) as batch_op:
+        batch_op.create_index('ix_sets_workout_exercise_id_set_index', ['workout_exercise_id', 'set_index'], unique=False)
+
+    with op.batch_alter_table('exercise_variants', schema=None) as batch_op:
+        batch_op.create_index('ix_exercise_variants_workout_exercise_id', ['workout_exercise_id'], unique=False)
+
+    with op.batch_alter_table('exercises', schema=None) as batch_op:
+        batch_op.create_index('ix_exercises_user_id_name', ['user_id', 'name'], unique=False)
+        batch_op.create_index('ix_exercises_is_builtin', ['is_builtin'], unique=False)
+
+    with op.batch_alter_table('body_metrics', schema=None) as batch_op:
+        batch_op.create_index('ix_body_metrics_user_id_date', ['user_id', 'date'], unique=False)
+
+    with op.batch_alter_table('height_records', schema=None) as batch_op:
+        batch_op.create_index('ix_height_records_user_id_date', ['user_id', 'date'], unique=False)
+
+    with op.batch_alter_table('user_settings', schema=None) as batch_op:
+        batch_op.create_index('ix_user_settings_user_id', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('user_settings', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_settings_user_id')
+
+    with op.batch_alter_table('height_records', schema=None) as batch_op:
+        batch_op.drop_index('ix_height_records_user_id_date')
+
+    with op.batch_alter_table('body_metrics', schema=None) as batch_op:
+        batch_op.drop_index('ix_body_metrics_user_id_date')
+
+    with op.batch_alter_table('exercises', schema=None) as batch_op:
+        batch_op.drop_index('ix_exercises_is_builtin')
+        batch_op.drop_index('ix_exercises_user_id_name')
+
+    with op.batch_alter_table('exercise_variants', schema=None) as batch_op:
+        batch_op.drop_index('ix_exercise_variants_workout_exercise_id')
+
+    with op.batch_alter_table('sets', schema=None) as batch_op:
+        batch_op.drop_index('ix_sets_workout_exercise_id_set_index')
+
+    with op.batch_alter_table('workout_exercises', schema=None) as batch_op:
+        batch_op.drop_index('ix_workout_exercises_exercise_id')
+        batch_op.drop_index('ix_workout_exercises_workout_id_order_index')
+
+    with op.batch_alter_table('workouts', schema=None) as batch_op:
+        batch_op.drop_index('ix_workouts_user_id_is_completed_date')
+        batch_op.drop_index('ix_workouts_user_id_date')
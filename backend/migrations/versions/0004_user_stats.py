@@ -0,0 +1,82 @@
+"""ダッシュボード用のユーザー統計テーブル（user_stats / user_weekly_stats）と既存履歴からのバックフィル
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 02:14:37.502118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 統計対象のセット（筋力トレーニングの本番セット）とその週（ISO週の月曜日）
+STRENGTH_SETS = """
+    FROM sets s
+    JOIN workout_exercises we ON we.id = s.workout_exercise_id
+    JOIN workouts w ON w.id = we.workout_id
+    JOIN exercises e ON e.id = we.exercise_id
+    WHERE s.is_warmup = 0 AND e.exercise_type = 'strength'
+"""
+WEEK = "date(w.date, 'weekday 0', '-6 days')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_completed_workouts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('total_sets', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('total_volume', sa.Float(), server_default='0', nullable=False),
+    sa.Column('latest_workout_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('user_weekly_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('week_start', sa.Date(), nullable=False),
+    sa.Column('workout_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('set_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('volume', sa.Float(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'week_start')
+    )
+
+    # 既存の履歴からバックフィル（python user_stats.py rebuild と同じ集計）
+    op.execute(f"""
+        INSERT INTO user_weekly_stats (user_id, week_start, workout_count, set_count, volume)
+        SELECT w.user_id, {WEEK}, COUNT(*), 0, 0
+        FROM workouts w
+        WHERE w.is_completed = 1
+        GROUP BY w.user_id, {WEEK}
+    """)
+    op.execute(f"""
+        INSERT INTO user_weekly_stats (user_id, week_start, workout_count, set_count, volume)
+        SELECT w.user_id, {WEEK}, 0, COUNT(s.id), COALESCE(SUM(s.weight * s.reps), 0)
+        {STRENGTH_SETS}
+        GROUP BY w.user_id, {WEEK}
+        ON CONFLICT (user_id, week_start) DO UPDATE SET
+            set_count = excluded.set_count,
+            volume = excluded.volume
+    """)
+    op.execute("""
+        INSERT INTO user_stats (user_id, total_completed_workouts, total_sets, total_volume, latest_workout_date)
+        SELECT ws.user_id, SUM(ws.workout_count), SUM(ws.set_count), SUM(ws.volume),
+               (SELECT MAX(w.date) FROM workouts w WHERE w.user_id = ws.user_id AND w.is_completed = 1)
+        FROM user_weekly_stats ws
+        GROUP BY ws.user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_weekly_stats')
+    op.drop_table('user_stats')
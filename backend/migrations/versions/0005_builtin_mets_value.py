@@ -0,0 +1,46 @@
+"""exercises.builtin_mets_value（内蔵種目のMETs値をデータとして保存）
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 03:21:09.114582
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from comprehensive_seed_data import BUILTIN_EXERCISE_METS
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('exercises', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('builtin_mets_value', sa.Float(), nullable=True))
+
+    # 既存の内蔵種目に種目名でMETs値を設定（これまでコード内の辞書で名前照合していた値）
+    exercises = sa.table(
+        'exercises',
+        sa.column('name', sa.String),
+        sa.column('is_builtin', sa.Boolean),
+        sa.column('builtin_mets_value', sa.Float),
+    )
+    for name, mets in BUILTIN_EXERCISE_METS.items():
+        op.execute(
+            exercises.update()
+            .where(exercises.c.name == name, exercises.c.is_builtin == sa.true())
+            .values(builtin_mets_value=mets)
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('exercises', schema=None) as batch_op:
+        batch_op.drop_column('builtin_mets_value')
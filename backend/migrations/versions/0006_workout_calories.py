@@ -0,0 +1,44 @@
+"""ワークアウトごとの消費カロリー台帳（workout_calories）
+
+既存の完了済みワークアウトは API の起動時（calorie_ledger.backfill_missing_ledgers）に台帳へ記録する
+（全件を作り直す場合は python calorie_ledger.py rebuild）。
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 04:02:51.730164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('workout_calories',
+    sa.Column('workout_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('workout_date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('body_weight', sa.Float(), nullable=False),
+    sa.Column('total_calories', sa.Float(), server_default='0', nullable=False),
+    sa.Column('exercise_calories', sa.Text(), nullable=True),
+    sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['workout_id'], ['workouts.id'], ),
+    sa.PrimaryKeyConstraint('workout_id')
+    )
+    op.create_index('ix_workout_calories_user_id_workout_date', 'workout_calories', ['user_id', 'workout_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_workout_calories_user_id_workout_date', table_name='workout_calories')
+    op.drop_table('workout_calories')
@@ -0,0 +1,98 @@
+"""種目・バリエーションごとの自己ベスト（personal_records）と既存履歴からのバックフィル
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 05:12:44.208316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from personal_records import RECORD_COLUMNS, VARIANT_FIELDS, build_records
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    personal_records = op.create_table('personal_records',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.Integer(), nullable=False),
+    sa.Column('variant_key', sa.String(), server_default='', nullable=False),
+    sa.Column('best_e1rm', sa.Float(), nullable=True),
+    sa.Column('best_e1rm_weight', sa.Float(), nullable=True),
+    sa.Column('best_e1rm_reps', sa.Integer(), nullable=True),
+    sa.Column('best_e1rm_set_id', sa.Integer(), nullable=True),
+    sa.Column('best_e1rm_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('rep_maxes', sa.Text(), nullable=True),
+    sa.Column('best_session_volume', sa.Float(), nullable=True),
+    sa.Column('best_session_workout_exercise_id', sa.Integer(), nullable=True),
+    sa.Column('best_session_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercises.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'exercise_id', 'variant_key')
+    )
+
+    # 既存の履歴からバックフィル（python personal_records.py rebuild と同じ計算）
+    sets = sa.table('sets', sa.column('id', sa.Integer), sa.column('workout_exercise_id', sa.Integer),
+                    sa.column('weight', sa.Float), sa.column('reps', sa.Integer), sa.column('is_warmup', sa.Boolean))
+    workout_exercises = sa.table('workout_exercises', sa.column('id', sa.Integer), sa.column('workout_id', sa.Integer),
+                                 sa.column('exercise_id', sa.Integer))
+    workouts = sa.table('workouts', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                        sa.column('date', sa.DateTime))
+    exercises = sa.table('exercises', sa.column('id', sa.Integer), sa.column('exercise_type', sa.String))
+    variants = sa.table('exercise_variants', sa.column('workout_exercise_id', sa.Integer),
+                        *(sa.column(name, sa.String) for name in VARIANT_FIELDS))
+
+    rows = op.get_bind().execute(
+        sa.select(
+            workouts.c.user_id,
+            workout_exercises.c.exercise_id,
+            sets.c.id,
+            sets.c.workout_exercise_id,
+            workouts.c.date,
+            sets.c.weight,
+            sets.c.reps,
+            *(variants.c[name] for name in VARIANT_FIELDS),
+        )
+        .select_from(
+            sets.join(workout_exercises, workout_exercises.c.id == sets.c.workout_exercise_id)
+            .join(workouts, workouts.c.id == workout_exercises.c.workout_id)
+            .join(exercises, exercises.c.id == workout_exercises.c.exercise_id)
+            .outerjoin(variants, variants.c.workout_exercise_id == workout_exercises.c.id)
+        )
+        .where(
+            exercises.c.exercise_type == 'strength',
+            sets.c.is_warmup == sa.false(),
+            sets.c.weight > 0,
+            sets.c.reps > 0,
+        )
+    ).all()
+
+    by_user = {}
+    for user_id, *row in rows:
+        by_user.setdefault(user_id, []).append(row)
+    for user_id, user_rows in by_user.items():
+        records = build_records(user_id, user_rows)
+        op.bulk_insert(personal_records, [
+            {
+                "user_id": record.user_id,
+                "exercise_id": record.exercise_id,
+                "variant_key": record.variant_key,
+                **{name: getattr(record, name) for name in RECORD_COLUMNS},
+            }
+            for record in records
+        ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('personal_records')
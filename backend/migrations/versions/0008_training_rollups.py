@@ -0,0 +1,74 @@
+"""日・週・月 × 部位 × 種目のトレーニング集計（training_rollups）と既存履歴からのバックフィル
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 05:58:03.417920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 期間の開始日（training_rollups.BUCKET_STARTS と同じ式）
+BUCKET_STARTS = {
+    'day': "date(w.date)",
+    'week': "date(w.date, 'weekday 0', '-6 days')",
+    'month': "date(w.date, 'start of month')",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('training_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.Date(), nullable=False),
+    sa.Column('muscle_group', sa.String(), nullable=False),
+    sa.Column('exercise_id', sa.Integer(), nullable=False),
+    sa.Column('set_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('total_reps', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('volume', sa.Float(), server_default='0', nullable=False),
+    sa.Column('top_e1rm', sa.Float(), nullable=True),
+    sa.Column('duration_seconds', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercises.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'granularity', 'bucket_start', 'muscle_group', 'exercise_id')
+    )
+    op.create_index('ix_training_rollups_user_granularity_muscle_group_bucket', 'training_rollups',
+                    ['user_id', 'granularity', 'muscle_group', 'bucket_start'], unique=False)
+
+    # 既存の履歴からバックフィル（python training_rollups.py rebuild と同じ集計、推定1RMは Epley 式）
+    for granularity, bucket_start in BUCKET_STARTS.items():
+        op.execute(f"""
+            INSERT INTO training_rollups
+                (user_id, granularity, bucket_start, muscle_group, exercise_id,
+                 set_count, total_reps, volume, top_e1rm, duration_seconds)
+            SELECT w.user_id, '{granularity}', {bucket_start}, e.muscle_group, e.id,
+                   COUNT(s.id),
+                   COALESCE(SUM(s.reps), 0),
+                   COALESCE(SUM(CASE WHEN e.exercise_type = 'strength' THEN s.weight * s.reps END), 0),
+                   MAX(CASE WHEN e.exercise_type = 'strength' AND s.weight > 0 AND s.reps > 0
+                            THEN s.weight * (1 + s.reps / 30.0) END),
+                   COALESCE(SUM(CASE WHEN e.exercise_type = 'cardio' THEN s.duration_seconds END), 0)
+            FROM sets s
+            JOIN workout_exercises we ON we.id = s.workout_exercise_id
+            JOIN workouts w ON w.id = we.workout_id
+            JOIN exercises e ON e.id = we.exercise_id
+            WHERE s.is_warmup = 0
+            GROUP BY w.user_id, {bucket_start}, e.muscle_group, e.id
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_training_rollups_user_granularity_muscle_group_bucket', table_name='training_rollups')
+    op.drop_table('training_rollups')
@@ -0,0 +1,65 @@
+"""body_metrics のトレンド列（指数平滑化した体重・体脂肪率と1週間あたりの変化量）と既存記録からのバックフィル
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 07:41:26.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from body_trends import TREND_COLUMNS, compute_trends
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('body_metrics', schema=None) as batch_op:
+        for column in TREND_COLUMNS:
+            batch_op.add_column(sa.Column(column, sa.Float(), nullable=True))
+
+    # 既存の記録からバックフィル（python body_trends.py rebuild と同じ計算）
+    body_metrics = sa.table(
+        'body_metrics',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('date', sa.DateTime),
+        sa.column('body_weight', sa.Float),
+        sa.column('body_fat_percent', sa.Float),
+        *(sa.column(column, sa.Float) for column in TREND_COLUMNS),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(
+            body_metrics.c.user_id,
+            body_metrics.c.id,
+            body_metrics.c.date,
+            body_metrics.c.body_weight,
+            body_metrics.c.body_fat_percent,
+        ).order_by(body_metrics.c.user_id, body_metrics.c.date, body_metrics.c.id)
+    ).all()
+
+    by_user = {}
+    for user_id, *row in rows:
+        by_user.setdefault(user_id, []).append(row)
+    for user_rows in by_user.values():
+        trends = compute_trends(user_rows)
+        bind.execute(
+            body_metrics.update().where(body_metrics.c.id == sa.bindparam('metric_id')),
+            [{"metric_id": metric_id, **columns} for metric_id, columns in trends.items()],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('body_metrics', schema=None) as batch_op:
+        for column in reversed(TREND_COLUMNS):
+            batch_op.drop_column(column)
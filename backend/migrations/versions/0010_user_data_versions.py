@@ -0,0 +1,37 @@
+"""ユーザーのデータ領域ごとのバージョン（user_data_versions、ETag 用）
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 08:37:52.160943
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 行のないユーザーはすべて 0 として扱うため、バックフィルは不要
+    op.create_table('user_data_versions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('workouts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('body', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('settings', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_data_versions')
@@ -0,0 +1,35 @@
+"""workouts.local_date（ワークアウトの日付、カレンダーの日ごとの集計用）とインデックス、既存記録からのバックフィル
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 09:12:40.318275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # workouts は外部キーで参照されているため、テーブルを作り直さない操作（列の追加・インデックスの作成）だけを使う
+    with op.batch_alter_table('workouts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('local_date', sa.Date(), nullable=True))
+
+    # 保存されている日時の日付部分（YYYY-MM-DD）
+    op.execute("UPDATE workouts SET local_date = substr(date, 1, 10)")
+    op.create_index('ix_workouts_user_id_local_date', 'workouts', ['user_id', 'local_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_workouts_user_id_local_date', table_name='workouts')
+    op.drop_column('workouts', 'local_date')  # ALTER TABLE ... DROP COLUMN（SQLite 3.35以降）
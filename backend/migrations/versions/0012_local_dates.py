@@ -0,0 +1,69 @@
+"""users.timezone と、workouts / body_metrics のローカル日付・ISO週キー（インデックス付き）、既存記録からのバックフィル
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 10:05:17.842093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from local_time import DEFAULT_TIMEZONE, iso_week_key
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _backfill_weeks(bind, table) -> None:
+    """local_date から local_week を埋める"""
+    rows = bind.execute(
+        sa.select(table.c.id, table.c.local_date).where(table.c.local_date.isnot(None))
+    ).all()
+    if rows:
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('row_id')),
+            [{"row_id": row_id, "local_week": iso_week_key(local_date)} for row_id, local_date in rows],
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # workouts は外部キーで参照されているため、テーブルを作り直さない操作（列の追加・インデックスの作成）だけを使う
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('timezone', sa.String(), server_default=DEFAULT_TIMEZONE, nullable=False))
+    with op.batch_alter_table('workouts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('local_week', sa.String(), nullable=True))
+    with op.batch_alter_table('body_metrics', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('local_date', sa.Date(), nullable=True))
+        batch_op.add_column(sa.Column('local_week', sa.String(), nullable=True))
+
+    # 保存済みの日時はユーザーのローカル時刻とみなし、その日付・ISO週で埋める
+    op.execute("UPDATE body_metrics SET local_date = substr(date, 1, 10)")
+    bind = op.get_bind()
+    for name in ('workouts', 'body_metrics'):
+        _backfill_weeks(bind, sa.table(
+            name,
+            sa.column('id', sa.Integer),
+            sa.column('local_date', sa.Date),
+            sa.column('local_week', sa.String),
+        ))
+
+    op.create_index('ix_workouts_user_id_local_week', 'workouts', ['user_id', 'local_week'], unique=False)
+    op.create_index('ix_body_metrics_user_id_local_date', 'body_metrics', ['user_id', 'local_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_body_metrics_user_id_local_date', table_name='body_metrics')
+    op.drop_index('ix_workouts_user_id_local_week', table_name='workouts')
+    # ALTER TABLE ... DROP COLUMN（SQLite 3.35以降）
+    op.drop_column('body_metrics', 'local_week')
+    op.drop_column('body_metrics', 'local_date')
+    op.drop_column('workouts', 'local_week')
+    op.drop_column('users', 'timezone')
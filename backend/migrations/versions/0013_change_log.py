@@ -0,0 +1,74 @@
+"""change_log（同期用の変更ログ）と user_data_versions.changes、既存の行からのバックフィル
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18 13:42:08.516730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0013'
+down_revision: Union[str, Sequence[str], None] = '0012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 同期するテーブルの既存の行の (ユーザーID, 行ID, FROM 句)（change_log.SYNC_TABLES と同じテーブル）
+BACKFILL_SOURCES = {
+    'exercises': ("user_id", "id", "exercises WHERE user_id IS NOT NULL"),
+    'workouts': ("user_id", "id", "workouts"),
+    'workout_exercises': ("w.user_id", "we.id", "workout_exercises we JOIN workouts w ON w.id = we.workout_id"),
+    'exercise_variants': ("w.user_id", "v.id", (
+        "exercise_variants v JOIN workout_exercises we ON we.id = v.workout_exercise_id "
+        "JOIN workouts w ON w.id = we.workout_id"
+    )),
+    'sets': ("w.user_id", "s.id", (
+        "sets s JOIN workout_exercises we ON we.id = s.workout_exercise_id "
+        "JOIN workouts w ON w.id = we.workout_id"
+    )),
+    'body_metrics': ("user_id", "id", "body_metrics"),
+    'height_records': ("user_id", "id", "height_records"),
+    'profile': ("id", "id", "users"),
+    'settings': ("user_id", "id", "user_settings"),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('user_data_versions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('changes', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table('change_log',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('row_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'table_name', 'row_id')
+    )
+    op.create_index('ix_change_log_user_id_version', 'change_log', ['user_id', 'version'], unique=False)
+
+    # 既存の行はすべてバージョン1の upsert とし、ユーザーの changes を1以上にする
+    for table_name, (user_id, row_id, source) in BACKFILL_SOURCES.items():
+        op.execute(
+            "INSERT INTO change_log (user_id, table_name, row_id, op, version) "
+            f"SELECT {user_id}, '{table_name}', {row_id}, 'upsert', 1 FROM {source}"
+        )
+    op.execute("UPDATE user_data_versions SET changes = 1 WHERE user_id IN (SELECT user_id FROM change_log)")
+    op.execute(
+        "INSERT INTO user_data_versions (user_id, changes) "
+        "SELECT DISTINCT user_id, 1 FROM change_log "
+        "WHERE user_id NOT IN (SELECT user_id FROM user_data_versions)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_change_log_user_id_version', table_name='change_log')
+    op.drop_table('change_log')
+    op.drop_column('user_data_versions', 'changes')  # ALTER TABLE ... DROP COLUMN（SQLite 3.35以降）
@@ -0,0 +1,63 @@
+"""ユーザー設定のないユーザーへのデフォルト設定の作成と、変更ログに記録されていない設定の記録
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-18 16:05:41.274903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0014'
+down_revision: Union[str, Sequence[str], None] = '0013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# main.DEFAULT_DASHBOARD_CONFIG と同じ値（サインアップ時に作成する設定）
+DEFAULT_DASHBOARD_CONFIG = (
+    '{"selectedWidgets": ["total_workouts", "this_week_workouts", "total_volume", "this_week_volume"], '
+    '"maxWidgets": 4}'
+)
+
+# 変更ログに記録されていない設定の行（GET /settings が作成していた行と、ここで作成した行）
+UNRECORDED_SETTINGS = (
+    "SELECT s.user_id, s.id FROM user_settings s WHERE NOT EXISTS ("
+    "SELECT 1 FROM change_log c WHERE c.user_id = s.user_id AND c.table_name = 'settings' AND c.row_id = s.id)"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        sa.text(
+            "INSERT INTO user_settings (user_id, dashboard_config, created_at, updated_at) "
+            "SELECT id, :config, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP FROM users "
+            "WHERE id NOT IN (SELECT user_id FROM user_settings)"
+        ).bindparams(config=DEFAULT_DASHBOARD_CONFIG)
+    )
+
+    # 記録されていない設定のあるユーザーごとに settings と changes を1つ進め、そのバージョンで記録する
+    op.execute(
+        "INSERT INTO user_data_versions (user_id) "
+        f"SELECT DISTINCT user_id FROM ({UNRECORDED_SETTINGS}) "
+        "WHERE user_id NOT IN (SELECT user_id FROM user_data_versions)"
+    )
+    op.execute(
+        "UPDATE user_data_versions SET settings = settings + 1, changes = changes + 1 "
+        f"WHERE user_id IN (SELECT user_id FROM ({UNRECORDED_SETTINGS}))"
+    )
+    op.execute(
+        "INSERT INTO change_log (user_id, table_name, row_id, op, version) "
+        "SELECT s.user_id, 'settings', s.id, 'upsert', v.changes "
+        f"FROM ({UNRECORDED_SETTINGS}) s JOIN user_data_versions v ON v.user_id = s.user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 作成した設定は以前から GET /settings が作成していたものと区別できないため、そのまま残す
+    pass
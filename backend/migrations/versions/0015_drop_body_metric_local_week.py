@@ -0,0 +1,46 @@
+"""body_metrics.local_week の削除（体重記録の週ごとの集計はスナップショットで行い、この列は読まれない）
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-18 16:48:12.603517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from local_time import iso_week_key
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0015'
+down_revision: Union[str, Sequence[str], None] = '0014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ALTER TABLE ... DROP COLUMN（SQLite 3.35以降、インデックスのない列なのでテーブルを作り直さない）
+    op.drop_column('body_metrics', 'local_week')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('body_metrics', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('local_week', sa.String(), nullable=True))
+
+    table = sa.table(
+        'body_metrics',
+        sa.column('id', sa.Integer),
+        sa.column('local_date', sa.Date),
+        sa.column('local_week', sa.String),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(table.c.id, table.c.local_date).where(table.c.local_date.isnot(None))).all()
+    if rows:
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('row_id')),
+            [{"row_id": row_id, "local_week": iso_week_key(local_date)} for row_id, local_date in rows],
+        )
@@ -0,0 +1,34 @@
+"""height_records.local_date（インデックス付き）と既存記録からのバックフィル
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-18 18:21:37.405126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0016'
+down_revision: Union[str, Sequence[str], None] = '0015'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('height_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('local_date', sa.Date(), nullable=True))
+
+    # 保存済みの日時はユーザーのローカル時刻とみなし、その日付で埋める（0012 の body_metrics と同じ）
+    op.execute("UPDATE height_records SET local_date = substr(date, 1, 10)")
+    op.create_index('ix_height_records_user_id_local_date', 'height_records', ['user_id', 'local_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_height_records_user_id_local_date', table_name='height_records')
+    op.drop_column('height_records', 'local_date')  # ALTER TABLE ... DROP COLUMN（SQLite 3.35以降）
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy import Date
 from database import Base
+from local_time import DEFAULT_TIMEZONE
 
 class User(Base):
     __tablename__ = "users"
@@ -14,6 +15,8 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     birth_date = Column(Date, nullable=True)  # 生年月日
     gender = Column(String, nullable=True)    # "male", "female", "other"
+    data_version = Column(Integer, nullable=False, default=1, server_default="1")  # プロフィール変更ごとに増加（トークン・キャッシュの検証用）
+    timezone = Column(String, nullable=False, default=DEFAULT_TIMEZONE, server_default=DEFAULT_TIMEZONE)  # IANAタイムゾーン名（日付・週の区切り）
     
     # リレーション
     exercises = relationship("Exercise", back_populates="user")
@@ -24,6 +27,10 @@ class User(Base):
 
 class Exercise(Base):
     __tablename__ = "exercises"
+    __table_args__ = (
+        Index("ix_exercises_user_id_name", "user_id", "name"),
+        Index("ix_exercises_is_builtin", "is_builtin"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Noneの場合は内蔵種目
@@ -45,8 +52,9 @@ class Exercise(Base):
     stance_options = Column(String, nullable=True)   # "バック,フロント,ボックス"
     variation_options = Column(String, nullable=True) # その他のバリエーション
     
-    # カスタム種目用METs値（内蔵種目はコードで定義）
-    custom_mets_value = Column(Float, nullable=True)
+    # METs値（有効値は custom > builtin > exercise_type のデフォルト の順で決定）
+    custom_mets_value = Column(Float, nullable=True)   # カスタム種目用
+    builtin_mets_value = Column(Float, nullable=True)  # 内蔵種目用（シードデータで設定）
     
     # メタデータ
     description = Column(Text, nullable=True)        # 種目の説明
@@ -58,20 +66,35 @@ class Exercise(Base):
 
 class Workout(Base):
     __tablename__ = "workouts"
+    __table_args__ = (
+        Index("ix_workouts_user_id_date", "user_id", "date"),
+        Index("ix_workouts_user_id_is_completed_date", "user_id", "is_completed", "date"),
+        Index("ix_workouts_user_id_local_date", "user_id", "local_date"),
+        Index("ix_workouts_user_id_local_week", "user_id", "local_week"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(DateTime(timezone=True), nullable=False)
+    local_date = Column(Date, nullable=True)  # date（ユーザーのタイムゾーンでの時刻）の日付（書き込み時に設定）
+    local_week = Column(String, nullable=True)  # ISO週のキー（"2025-W23"、書き込み時に設定）
     note = Column(Text)
     is_completed = Column(Boolean, default=False)
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
     # リレーション
     user = relationship("User", back_populates="workouts")
-    workout_exercises = relationship("WorkoutExercise", back_populates="workout")
+    workout_exercises = relationship(
+        "WorkoutExercise", back_populates="workout",
+        order_by="(WorkoutExercise.order_index, WorkoutExercise.id)"
+    )
 
 class WorkoutExercise(Base):
     __tablename__ = "workout_exercises"
+    __table_args__ = (
+        Index("ix_workout_exercises_workout_id_order_index", "workout_id", "order_index"),
+        Index("ix_workout_exercises_exercise_id", "exercise_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     workout_id = Column(Integer, ForeignKey("workouts.id"), nullable=False)
@@ -81,11 +104,14 @@ class WorkoutExercise(Base):
     # リレーション
     workout = relationship("Workout", back_populates="workout_exercises")
     exercise = relationship("Exercise", back_populates="workout_exercises")
-    sets = relationship("Set", back_populates="workout_exercise")
+    sets = relationship("Set", back_populates="workout_exercise", order_by="(Set.set_index, Set.id)")
     exercise_variant = relationship("ExerciseVariant", back_populates="workout_exercise", uselist=False)
 
 class Set(Base):
     __tablename__ = "sets"
+    __table_args__ = (
+        Index("ix_sets_workout_exercise_id_set_index", "workout_exercise_id", "set_index"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     workout_exercise_id = Column(Integer, ForeignKey("workout_exercises.id"), nullable=False)
@@ -112,6 +138,9 @@ class Set(Base):
 class ExerciseVariant(Base):
     """ワークアウト実行時に選択されたバリエーション（角度、グリップ等）を記録"""
     __tablename__ = "exercise_variants"
+    __table_args__ = (
+        Index("ix_exercise_variants_workout_exercise_id", "workout_exercise_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     workout_exercise_id = Column(Integer, ForeignKey("workout_exercises.id"), nullable=False)
@@ -125,24 +154,40 @@ class ExerciseVariant(Base):
 
 class BodyMetric(Base):
     __tablename__ = "body_metrics"
+    __table_args__ = (
+        Index("ix_body_metrics_user_id_date", "user_id", "date"),
+        Index("ix_body_metrics_user_id_local_date", "user_id", "local_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(DateTime(timezone=True), nullable=False)
+    local_date = Column(Date, nullable=True)  # date（ユーザーのタイムゾーンでの時刻）の日付（書き込み時に設定）
     body_weight = Column(Float)
     body_fat_percent = Column(Float)
     note = Column(Text)
     
+    # 指数平滑化したトレンドと1週間あたりの変化量（body_trends.py で記録の追加・更新時に計算）
+    trend_weight = Column(Float, nullable=True)
+    weight_trend_per_week = Column(Float, nullable=True)
+    trend_body_fat = Column(Float, nullable=True)
+    body_fat_trend_per_week = Column(Float, nullable=True)
+    
     # リレーション
     user = relationship("User", back_populates="body_metrics")
 
 class HeightRecord(Base):
     __tablename__ = "height_records"
+    __table_args__ = (
+        Index("ix_height_records_user_id_date", "user_id", "date"),
+        Index("ix_height_records_user_id_local_date", "user_id", "local_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     height_cm = Column(Float, nullable=False)
     date = Column(DateTime(timezone=True), nullable=False)
+    local_date = Column(Date, nullable=True)  # date（ユーザーのタイムゾーンでの時刻）の日付（書き込み時に設定）
     note = Column(Text)
     
     # リレーション
@@ -150,6 +195,9 @@ class HeightRecord(Base):
 
 class UserSettings(Base):
     __tablename__ = "user_settings"
+    __table_args__ = (
+        Index("ix_user_settings_user_id", "user_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -158,4 +206,107 @@ class UserSettings(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # リレーション
-    user = relationship("User", back_populates="settings")
\ No newline at end of file
+    user = relationship("User", back_populates="settings")
+class UserStats(Base):
+    """ダッシュボード用のユーザー累計統計（セット追加・削除、ワークアウト完了時に差分更新）"""
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_completed_workouts = Column(Integer, nullable=False, default=0, server_default="0")
+    total_sets = Column(Integer, nullable=False, default=0, server_default="0")       # ウォームアップ除く筋力トレーニングのセット数
+    total_volume = Column(Float, nullable=False, default=0, server_default="0")       # 同セットの weight * reps の合計
+    latest_workout_date = Column(DateTime(timezone=True), nullable=True)              # 最新の完了済みワークアウト日時
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class UserWeeklyStats(Base):
+    """ISO週（月曜始まり）ごとのユーザー統計"""
+    __tablename__ = "user_weekly_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    week_start = Column(Date, primary_key=True)  # 週の月曜日
+    workout_count = Column(Integer, nullable=False, default=0, server_default="0")  # 完了済みワークアウト数
+    set_count = Column(Integer, nullable=False, default=0, server_default="0")
+    volume = Column(Float, nullable=False, default=0, server_default="0")
+
+class WorkoutCalories(Base):
+    """ワークアウトごとの消費カロリー台帳（完了時に計算し、体重記録・METs値の変更時に再計算）"""
+    __tablename__ = "workout_calories"
+    __table_args__ = (
+        Index("ix_workout_calories_user_id_workout_date", "user_id", "workout_date"),
+    )
+    
+    workout_id = Column(Integer, ForeignKey("workouts.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    workout_date = Column(DateTime(timezone=True), nullable=False)                 # 期間検索用（workouts.date の複製）
+    body_weight = Column(Float, nullable=False)                                     # 計算に使用した体重（ワークアウト日時点）
+    total_calories = Column(Float, nullable=False, default=0, server_default="0")
+    exercise_calories = Column(Text, nullable=True)                                 # 種目別内訳 {exercise_id: kcal} のJSON文字列
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class PersonalRecord(Base):
+    """種目・バリエーションごとの自己ベスト（セット追加・削除時に差分更新）"""
+    __tablename__ = "personal_records"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    exercise_id = Column(Integer, ForeignKey("exercises.id"), primary_key=True)
+    variant_key = Column(String, primary_key=True, default="", server_default="")  # バリエーションなしは空文字
+    
+    # 推定1RM（Epley式）の最高値とそのセット
+    best_e1rm = Column(Float, nullable=True)
+    best_e1rm_weight = Column(Float, nullable=True)
+    best_e1rm_reps = Column(Integer, nullable=True)
+    best_e1rm_set_id = Column(Integer, nullable=True)
+    best_e1rm_date = Column(DateTime(timezone=True), nullable=True)
+    
+    # 回数ごとの最高重量（1〜20RM）{回数: {"weight", "set_id", "date"}} のJSON文字列
+    rep_maxes = Column(Text, nullable=True)
+    
+    # 1回のワークアウト種目でのボリューム（weight * reps の合計）の最高値
+    best_session_volume = Column(Float, nullable=True)
+    best_session_workout_exercise_id = Column(Integer, nullable=True)
+    best_session_date = Column(DateTime(timezone=True), nullable=True)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class TrainingRollup(Base):
+    """日・週・月 × 部位 × 種目ごとのトレーニング集計（セット追加・削除時に差分更新）"""
+    __tablename__ = "training_rollups"
+    __table_args__ = (
+        Index("ix_training_rollups_user_granularity_muscle_group_bucket", "user_id", "granularity", "muscle_group", "bucket_start"),
+    )
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    granularity = Column(String, primary_key=True)      # "day", "week"（月曜始まり）, "month"
+    bucket_start = Column(Date, primary_key=True)       # 期間の開始日
+    muscle_group = Column(String, primary_key=True)
+    exercise_id = Column(Integer, ForeignKey("exercises.id"), primary_key=True)
+    set_count = Column(Integer, nullable=False, default=0, server_default="0")            # ウォームアップ除くセット数
+    total_reps = Column(Integer, nullable=False, default=0, server_default="0")
+    volume = Column(Float, nullable=False, default=0, server_default="0")                 # 筋力トレーニングの weight * reps の合計
+    top_e1rm = Column(Float, nullable=True)                                               # 推定1RM（Epley式）の最高値
+    duration_seconds = Column(Integer, nullable=False, default=0, server_default="0")     # 有酸素運動の時間の合計
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class UserDataVersion(Base):
+    """ユーザーのデータ領域ごとのバージョン（更新系エンドポイントで増加、読み取り系の ETag に使う）"""
+    __tablename__ = "user_data_versions"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    workouts = Column(Integer, nullable=False, default=0, server_default="0")   # 種目・ワークアウト・セット・消費カロリー
+    body = Column(Integer, nullable=False, default=0, server_default="0")       # 体重・体脂肪率・身長
+    settings = Column(Integer, nullable=False, default=0, server_default="0")   # プロフィール・ダッシュボード設定
+    changes = Column(Integer, nullable=False, default=0, server_default="0")    # 変更ログ（change_log）のバージョン（どの領域の更新でも増加）
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ChangeLogEntry(Base):
+    """同期（GET /sync）用の変更ログ（ユーザー・テーブル・行ごとに最新の操作とバージョンだけを保持、削除は墓石として残す）"""
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_user_id_version", "user_id", "version"),
+    )
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    table_name = Column(String, primary_key=True)   # change_log.SYNC_TABLES のキー（"sets", "profile" など）
+    row_id = Column(Integer, primary_key=True)
+    op = Column(String, nullable=False)             # "upsert" / "delete"
+    version = Column(Integer, nullable=False)       # 記録したときの user_data_versions.changes
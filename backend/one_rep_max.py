@@ -0,0 +1,36 @@
+"""
+推定1RM（1回だけ挙上できる最大重量）の計算式
+
+同じ式をPython（セット単位の計算）とSQL（集計クエリ内での計算）の両方で提供する。
+"""
+
+from sqlalchemy import case, func, literal
+
+# 選択できる計算式（APIの formula パラメータの値）
+FORMULAS = ("epley", "brzycki", "lombardi")
+DEFAULT_FORMULA = "epley"
+
+# Brzycki式は回数が37回以上になると分母が0以下になるため計算しない
+BRZYCKI_MAX_REPS = 36
+
+
+def estimated_1rm(formula: str, weight: float, reps: int):
+    """1セットの推定1RM（計算できない場合は None）"""
+    if formula == "epley":
+        return weight * (1 + reps / 30)
+    if formula == "brzycki":
+        return weight * 36 / (37 - reps) if reps <= BRZYCKI_MAX_REPS else None
+    if formula == "lombardi":
+        return weight * reps ** 0.10
+    raise ValueError(f"unknown formula: {formula}")
+
+
+def estimated_1rm_sql(formula: str, weight, reps):
+    """estimated_1rm と同じ計算をするSQL式（pow は database.register_sql_functions で保証）"""
+    if formula == "epley":
+        return weight * (1 + reps / literal(30.0))
+    if formula == "brzycki":
+        return case((reps <= BRZYCKI_MAX_REPS, weight * 36.0 / (37 - reps)), else_=None)
+    if formula == "lombardi":
+        return weight * func.pow(reps, 0.10)
+    raise ValueError(f"unknown formula: {formula}")
@@ -0,0 +1,70 @@
+"""
+キーセットページネーション用のカーソル
+
+カーソルは最後に返した行の並び替えキー（日時・IDなど）をJSONにしてURLセーフなBase64で包んだもの。
+クライアントには不透明な文字列として扱ってもらう。
+一覧エンドポイントは fetch_keyset_page で (日時, ID) の新しい順に limit 件ずつ返す。
+SQLiteの日時はTEXTで、書き込み経路によって書式が異なる（SQLAlchemy は "YYYY-MM-DD HH:MM:SS.ffffff"、
+マイグレーションや直接の投入は秒まで・"T" 区切りなど）ため、日時は保存された文字列のまま比較・カーソル化する
+（datetime に戻して比較すると、同じ時刻の行を書式の違いで飛ばしたり重複して返したりする）。
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import String, tuple_, type_coerce
+
+
+def encode_cursor(*values) -> str:
+    """並び替えキーの値からカーソル文字列を作る"""
+    payload = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def _stored_text(column):
+    """日時の列を保存された文字列のまま扱う式（CASTしないのでインデックスをそのまま使える）"""
+    return type_coerce(column, String)
+
+
+def _stored_datetime(value: str) -> str:
+    """カーソルの日時（保存された文字列）を検証してそのまま返す"""
+    datetime.fromisoformat(value)
+    return value
+
+
+def decode_cursor(cursor: str, *parsers) -> tuple:
+    """カーソル文字列を parsers（値ごとの変換関数）で並び替えキーに戻す（不正な場合は ValueError）"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, list) or len(payload) != len(parsers):
+            raise ValueError("cursor length mismatch")
+        return tuple(parse(value) for parse, value in zip(parsers, payload))
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+
+async def fetch_keyset_page(db, query, date_column, id_column, limit: Optional[int], cursor: Optional[str] = None) -> dict:
+    """
+    query を (日時, ID) の新しい順にキーセットページネーションして {"items", "next_cursor"} を返す
+
+    limit が None なら全件を返す（next_cursor は常に None）。総件数は数えない。
+    cursor が不正な場合は ValueError。
+    """
+    date_key = _stored_text(date_column)
+    if cursor is not None:
+        before = decode_cursor(cursor, _stored_datetime, int)
+        query = query.where(tuple_(date_key, id_column) < tuple_(*before))
+    query = query.order_by(date_key.desc(), id_column.desc())
+    if limit is None:
+        return {"items": (await db.scalars(query)).all(), "next_cursor": None}
+
+    rows = (await db.execute(query.add_columns(date_key.label("date_key")).limit(limit + 1))).all()
+    items = [row[0] for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last, last_date = rows[limit - 1]
+        next_cursor = encode_cursor(last_date, getattr(last, id_column.key))
+    return {"items": items, "next_cursor": next_cursor}
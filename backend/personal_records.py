@@ -0,0 +1,395 @@
+"""
+自己ベスト（personal_records）の差分更新・再計算
+
+自己ベストは (ユーザー, 種目, バリエーション) ごとに
+  - 推定1RM（Epley式）の最高値
+  - 回数ごとの最高重量（1〜20RM）
+  - 1回のワークアウト種目でのボリュームの最高値
+を、それを記録したセット（ワークアウト種目）とともに保持する。
+
+セット追加時は既存の記録と比べるだけで更新し（履歴は読まない）、新記録の種類を返す。
+セット削除時は、記録を保持しているセット（ワークアウト種目）が消える場合だけ、その種目を履歴から再計算する。
+
+    cd backend
+    python personal_records.py rebuild [--user-id ID]   # 履歴から作り直す
+    python personal_records.py check [--user-id ID]     # 履歴からの再計算と比較（不一致があれば終了コード1）
+"""
+
+import json
+import math
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import run_read_model_cli
+import models
+import one_rep_max
+
+# 自己ベストの推定1RMに使う計算式
+FORMULA = one_rep_max.DEFAULT_FORMULA
+# 最高重量を記録する回数の範囲（1〜20RM）
+MAX_TRACKED_REPS = 20
+
+# バリエーションのキーを構成する項目（ExerciseVariant の列名）
+VARIANT_FIELDS = ("selected_angle", "selected_grip", "selected_stance", "selected_variation")
+
+# 記録の値の列（再計算時に入れ替える列）
+RECORD_COLUMNS = (
+    "best_e1rm", "best_e1rm_weight", "best_e1rm_reps", "best_e1rm_set_id", "best_e1rm_date",
+    "rep_maxes",
+    "best_session_volume", "best_session_workout_exercise_id", "best_session_date",
+)
+
+
+def variant_key_from_values(values) -> str:
+    """VARIANT_FIELDS の順の値からキーを作る（選択なしは空文字）"""
+    values = [value or "" for value in values]
+    return "|".join(values) if any(values) else ""
+
+
+def variant_key(variant) -> str:
+    """ExerciseVariant（なければ None）から自己ベストのキーを作る"""
+    if variant is None:
+        return ""
+    return variant_key_from_values(getattr(variant, name) for name in VARIANT_FIELDS)
+
+
+def parse_variant_key(key: str) -> dict:
+    """variant_key の逆変換（選択なしの項目は None）"""
+    values = key.split("|") if key else [""] * len(VARIANT_FIELDS)
+    return {name: value or None for name, value in zip(VARIANT_FIELDS, values)}
+
+
+def qualifies(exercise_type: Optional[str], set_data) -> bool:
+    """自己ベストの対象となるセット（筋力トレーニングの本番セットで重量・回数の記録があるもの）か"""
+    return (
+        exercise_type == 'strength'
+        and not set_data.is_warmup
+        and set_data.weight is not None and set_data.weight > 0
+        and set_data.reps is not None and set_data.reps > 0
+    )
+
+
+def load_rep_maxes(record: models.PersonalRecord) -> dict:
+    """{回数(int): {"weight", "set_id", "date"}}"""
+    return {int(reps): entry for reps, entry in json.loads(record.rep_maxes or "{}").items()}
+
+
+def apply_set(record: models.PersonalRecord, set_id: int, workout_date, weight: float, reps: int) -> list:
+    """セット1件を記録と比較して更新し、更新した記録の名前（"e1rm", "5rm" など）のリストを返す"""
+    new_records = []
+
+    e1rm = one_rep_max.estimated_1rm(FORMULA, weight, reps)
+    if e1rm is not None and (record.best_e1rm is None or e1rm > record.best_e1rm):
+        record.best_e1rm = e1rm
+        record.best_e1rm_weight = weight
+        record.best_e1rm_reps = reps
+        record.best_e1rm_set_id = set_id
+        record.best_e1rm_date = workout_date
+        new_records.append("e1rm")
+
+    if reps <= MAX_TRACKED_REPS:
+        rep_maxes = load_rep_maxes(record)
+        current = rep_maxes.get(reps)
+        if current is None or weight > current["weight"]:
+            rep_maxes[reps] = {"weight": weight, "set_id": set_id, "date": workout_date.isoformat()}
+            record.rep_maxes = json.dumps({str(r): rep_maxes[r] for r in sorted(rep_maxes)})
+            new_records.append(f"{reps}rm")
+
+    return new_records
+
+
+def apply_session_volume(record: models.PersonalRecord, workout_exercise_id: int, workout_date, volume: float) -> list:
+    """ワークアウト種目のボリュームを記録と比較して更新する"""
+    if volume > 0 and (record.best_session_volume is None or volume > record.best_session_volume):
+        record.best_session_volume = volume
+        record.best_session_workout_exercise_id = workout_exercise_id
+        record.best_session_date = workout_date
+        return ["session_volume"]
+    return []
+
+
+def holds_record(record: models.PersonalRecord, set_id: int, workout_exercise_id: int) -> bool:
+    """セット（またはそのワークアウト種目）がいずれかの記録を保持しているか"""
+    return (
+        record.best_e1rm_set_id == set_id
+        or record.best_session_workout_exercise_id == workout_exercise_id
+        or any(entry["set_id"] == set_id for entry in load_rep_maxes(record).values())
+    )
+
+
+def build_records(user_id: int, rows: Iterable) -> list:
+    """
+    対象セットの行から自己ベストを作る（再計算・マイグレーションのバックフィル用）
+
+    rows は (exercise_id, set_id, workout_exercise_id, workout_date, weight, reps, *VARIANT_FIELDS の値)。
+    同じ値の記録は差分更新と同じく先に記録したものを残すため、セットIDの昇順で処理する。
+    """
+    records = {}
+    sessions = {}
+    for exercise_id, set_id, workout_exercise_id, workout_date, weight, reps, *variant in sorted(
+        rows, key=lambda row: row[1]
+    ):
+        key = (exercise_id, variant_key_from_values(variant))
+        record = records.get(key)
+        if record is None:
+            record = records[key] = models.PersonalRecord(user_id=user_id, exercise_id=exercise_id, variant_key=key[1])
+        apply_set(record, set_id, workout_date, weight, reps)
+        session = sessions.setdefault(workout_exercise_id, {"key": key, "date": workout_date, "volume": 0.0})
+        session["volume"] += weight * reps
+
+    for workout_exercise_id, session in sorted(sessions.items()):
+        apply_session_volume(records[session["key"]], workout_exercise_id, session["date"], session["volume"])
+    return list(records.values())
+
+
+async def record_set_added(
+    db: AsyncSession,
+    user_id: int,
+    exercise_id: int,
+    variant,
+    exercise_type: Optional[str],
+    set_data,
+    workout_date,
+    session_volume: float,
+) -> list:
+    """
+    セット追加時に呼び、更新した記録の名前のリストを返す（コミットは呼び出し側）
+
+    session_volume はこのセットを含むワークアウト種目のボリューム合計。set_data は flush 済みであること。
+    """
+    if not qualifies(exercise_type, set_data):
+        return []
+    if set_data.id is None:
+        await db.flush()
+    added = [(exercise_id, variant, exercise_type, set_data, workout_date, session_volume)]
+    return (await record_sets_added(db, user_id, added)).get(set_data.id, [])
+
+
+async def record_sets_added(db: AsyncSession, user_id: int, added: Iterable) -> dict:
+    """
+    複数セットの追加時に呼び、{セットID: 更新した記録の名前のリスト} を返す（コミットは呼び出し側）
+
+    added は (exercise_id, variant, exercise_type, set_data, workout_date, session_volume) の並びで、
+    追加した順に記録と比較する（記録は (種目, バリエーション) ごとに1回だけ読み込む）。
+    set_data は flush 済みであること。新しく作った記録は呼び出し側の次の flush で保存される。
+    """
+    records = {}
+    new_records = {}
+    for exercise_id, variant, exercise_type, set_data, workout_date, session_volume in added:
+        if not qualifies(exercise_type, set_data):
+            continue
+        key = variant_key(variant)
+        record = records.get((exercise_id, key))
+        if record is None:
+            record = await db.get(models.PersonalRecord, (user_id, exercise_id, key))
+            if record is None:
+                record = models.PersonalRecord(user_id=user_id, exercise_id=exercise_id, variant_key=key)
+                db.add(record)
+            records[(exercise_id, key)] = record
+        names = apply_set(record, set_data.id, workout_date, set_data.weight, set_data.reps)
+        names += apply_session_volume(record, set_data.workout_exercise_id, workout_date, session_volume)
+        if names:
+            new_records[set_data.id] = names
+    return new_records
+
+
+async def load_records(db: AsyncSession, user_id: int, exercise_ids: Iterable) -> list:
+    """
+    種目の記録をまとめてセッションに読み込む
+
+    セッションの identity map は弱参照のため、呼び出し側が戻り値を保持している間だけ
+    以降の db.get がクエリを発行せずに済む。
+    """
+    exercise_ids = set(exercise_ids)
+    if not exercise_ids:
+        return []
+    return list((await db.scalars(select(models.PersonalRecord).where(
+        models.PersonalRecord.user_id == user_id,
+        models.PersonalRecord.exercise_id.in_(exercise_ids)
+    ))).all())
+
+
+async def record_set_removed(db: AsyncSession, user_id: int, exercise_id: int, variant, exercise_type: Optional[str], set_data):
+    """セット削除時に呼ぶ（記録を保持するセットが消える場合だけ種目を再計算する、コミットは呼び出し側）"""
+    if not qualifies(exercise_type, set_data):
+        return
+    record = await db.get(models.PersonalRecord, (user_id, exercise_id, variant_key(variant)))
+    if record is not None and holds_record(record, set_data.id, set_data.workout_exercise_id):
+        await recompute_exercise_records(db, user_id, exercise_id)
+
+
+def _record_values(record: Optional[models.PersonalRecord]) -> tuple:
+    """比較用の記録の値 (推定1RM, {回数: 重量}, ボリューム)"""
+    if record is None:
+        return None, {}, None
+    rep_maxes = {reps: entry["weight"] for reps, entry in load_rep_maxes(record).items()}
+    return record.best_e1rm, rep_maxes, record.best_session_volume
+
+
+async def record_set_updated(
+    db: AsyncSession,
+    user_id: int,
+    exercise_id: int,
+    variant,
+    exercise_type: Optional[str],
+    old_set,
+    set_data,
+    workout_date,
+    session_volume: float,
+) -> list:
+    """
+    セット更新時に呼び、更新後のセットが新しく更新した記録の名前のリストを返す（コミットは呼び出し側）
+
+    old_set は変更前の値（id, workout_exercise_id を含む）。set_data の変更は flush 済みであること。
+    変更前のセットが記録を保持していれば種目を再計算し（変更後の値も含まれる）、そうでなければ変更後の値と比較する。
+    """
+    key = variant_key(variant)
+    # 記録を参照したまま差し引き・加算し、途中の db.get を identity map から引く
+    before = await db.get(models.PersonalRecord, (user_id, exercise_id, key))
+    before_e1rm, before_rep_maxes, before_volume = _record_values(before)
+    await record_set_removed(db, user_id, exercise_id, variant, exercise_type, old_set)
+    await record_sets_added(db, user_id, [(exercise_id, variant, exercise_type, set_data, workout_date, session_volume)])
+    await db.flush()
+
+    record = await db.get(models.PersonalRecord, (user_id, exercise_id, key))
+    if record is None:
+        return []
+    new_records = []
+    if record.best_e1rm_set_id == set_data.id and record.best_e1rm > (before_e1rm or 0):
+        new_records.append("e1rm")
+    for reps, entry in load_rep_maxes(record).items():
+        if entry["set_id"] == set_data.id and entry["weight"] > before_rep_maxes.get(reps, 0):
+            new_records.append(f"{reps}rm")
+    if (record.best_session_workout_exercise_id == set_data.workout_exercise_id
+            and (record.best_session_volume or 0) > (before_volume or 0)):
+        new_records.append("session_volume")
+    return new_records
+
+
+def _record_sets_query(user_id: int, exercise_id: Optional[int] = None):
+    """build_records に渡す対象セットの行を取得するクエリ"""
+    query = (
+        select(
+            models.WorkoutExercise.exercise_id,
+            models.Set.id,
+            models.Set.workout_exercise_id,
+            models.Workout.date,
+            models.Set.weight,
+            models.Set.reps,
+            *(getattr(models.ExerciseVariant, name) for name in VARIANT_FIELDS),
+        )
+        .select_from(models.Set)
+        .join(models.WorkoutExercise)
+        .join(models.Workout)
+        .join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .outerjoin(models.ExerciseVariant, models.ExerciseVariant.workout_exercise_id == models.WorkoutExercise.id)
+        .where(
+            models.Workout.user_id == user_id,
+            models.Exercise.exercise_type == 'strength',
+            models.Set.is_warmup == False,
+            models.Set.weight > 0,
+            models.Set.reps > 0
+        )
+    )
+    if exercise_id is not None:
+        query = query.where(models.WorkoutExercise.exercise_id == exercise_id)
+    return query
+
+
+async def recompute_exercise_records(db: AsyncSession, user_id: int, exercise_id: Optional[int] = None):
+    """種目（省略時は全種目）の自己ベストを履歴から作り直す（未反映の変更も含める、コミットは呼び出し側）"""
+    await db.flush()
+    records = build_records(user_id, (await db.execute(_record_sets_query(user_id, exercise_id))).all())
+
+    # 既存の行は値を入れ替え、なくなった記録は削除する
+    existing_query = select(models.PersonalRecord).where(models.PersonalRecord.user_id == user_id)
+    if exercise_id is not None:
+        existing_query = existing_query.where(models.PersonalRecord.exercise_id == exercise_id)
+    existing = {
+        (record.exercise_id, record.variant_key): record
+        for record in (await db.scalars(existing_query)).all()
+    }
+    for record in records:
+        current = existing.pop((record.exercise_id, record.variant_key), None)
+        if current is None:
+            db.add(record)
+        else:
+            for name in RECORD_COLUMNS:
+                setattr(current, name, getattr(record, name))
+    for record in existing.values():
+        await db.delete(record)
+    await db.flush()
+
+
+async def check_personal_records(db: AsyncSession, user_id: int) -> list:
+    """保存されている自己ベストと履歴からの再計算を比較し、不一致の説明のリストを返す"""
+    expected = {
+        (record.exercise_id, record.variant_key): record
+        for record in build_records(user_id, (await db.execute(_record_sets_query(user_id))).all())
+    }
+    stored = {
+        (record.exercise_id, record.variant_key): record
+        for record in (await db.scalars(
+            select(models.PersonalRecord).where(models.PersonalRecord.user_id == user_id)
+        )).all()
+    }
+
+    problems = []
+    for key in sorted(set(expected) | set(stored)):
+        if key not in stored:
+            problems.append(f"{key}: 記録がありません")
+        elif key not in expected:
+            problems.append(f"{key}: 対象セットのない記録が残っています")
+        else:
+            for name in RECORD_COLUMNS:
+                expected_value, stored_value = getattr(expected[key], name), getattr(stored[key], name)
+                if name == "rep_maxes":
+                    expected_value, stored_value = (
+                        load_rep_maxes(expected[key]), load_rep_maxes(stored[key])
+                    )
+                if isinstance(expected_value, float) and isinstance(stored_value, float):
+                    if math.isclose(expected_value, stored_value, rel_tol=1e-9):
+                        continue
+                if expected_value != stored_value:
+                    problems.append(f"{key} {name}: 期待値 {expected_value} / 保存値 {stored_value}")
+    return problems
+
+
+def record_response(record: models.PersonalRecord, exercise_name: str, muscle_group: str) -> dict:
+    """GET /analytics/prs の1件分"""
+    return {
+        "exercise_id": record.exercise_id,
+        "exercise_name": exercise_name,
+        "muscle_group": muscle_group,
+        "variant_key": record.variant_key,
+        "variant": parse_variant_key(record.variant_key),
+        "best_e1rm": {
+            "estimated_1rm": round(record.best_e1rm, 1),
+            "weight": record.best_e1rm_weight,
+            "reps": record.best_e1rm_reps,
+            "set_id": record.best_e1rm_set_id,
+            "date": record.best_e1rm_date,
+        } if record.best_e1rm is not None else None,
+        "rep_maxes": [
+            {"reps": reps, "weight": entry["weight"], "set_id": entry["set_id"],
+             "date": datetime.fromisoformat(entry["date"])}
+            for reps, entry in sorted(load_rep_maxes(record).items())
+        ],
+        "best_session_volume": {
+            "volume": round(record.best_session_volume, 1),
+            "workout_exercise_id": record.best_session_workout_exercise_id,
+            "date": record.best_session_date,
+        } if record.best_session_volume is not None else None,
+        "updated_at": record.updated_at,
+    }
+
+
+def main():
+    run_read_model_cli(__doc__, rebuild=recompute_exercise_records, check=check_personal_records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+
+logger = logging.getLogger("myfit.queries")
+
+# デバッグモード: レスポンスヘッダーにクエリ数・DB時間を出し、N+1をログに警告する
+QUERY_DEBUG = os.getenv("MYFIT_QUERY_DEBUG", "0").lower() in ("1", "true", "yes")
+# 同じSQLがパラメータ違いでこの回数以上実行されたらN+1とみなす
+N_PLUS_ONE_THRESHOLD = int(os.getenv("MYFIT_N_PLUS_ONE_THRESHOLD", "5"))
+
+# 現在のリクエスト（またはテスト）で有効な集計器のタプル（入れ子にできる）
+_active_collectors: contextvars.ContextVar = contextvars.ContextVar("myfit_query_collectors", default=())
+
+
+@dataclass
+class QueryStats:
+    """1リクエスト分のSQL実行統計"""
+    count: int = 0
+    total_seconds: float = 0.0
+    # SQL文 -> 実行回数 / 異なるパラメータの集合
+    statement_counts: dict = field(default_factory=dict)
+    statement_parameters: dict = field(default_factory=dict)
+
+    def record(self, statement: str, parameters, elapsed: float):
+        self.count += 1
+        self.total_seconds += elapsed
+        self.statement_counts[statement] = self.statement_counts.get(statement, 0) + 1
+        self.statement_parameters.setdefault(statement, set()).add(repr(parameters))
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_seconds * 1000
+
+    def n_plus_one(self, threshold: int = None) -> dict:
+        """パラメータだけ変えて繰り返し実行されたSQL文と回数"""
+        threshold = threshold or N_PLUS_ONE_THRESHOLD
+        return {
+            statement: count
+            for statement, count in self.statement_counts.items()
+            if count >= threshold and len(self.statement_parameters[statement]) > 1
+        }
+
+
+class QueryBudgetExceeded(AssertionError):
+    """クエリ数の上限超過またはN+1の検出"""
+
+
+def instrument_engine(engine):
+    """エンジンにSQLの実行回数・時間を計測するイベントを登録（非同期エンジンは sync_engine を渡す）"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _active_collectors.get():
+            conn.info.setdefault("myfit_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        collectors = _active_collectors.get()
+        started = conn.info.get("myfit_query_started")
+        if not collectors or not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        for stats in collectors:
+            stats.record(statement, parameters, elapsed)
+
+
+@contextmanager
+def capture_queries():
+    """ブロック内で実行されたSQLを集計する（外側の集計器にも同時に記録される）"""
+    stats = QueryStats()
+    token = _active_collectors.set(_active_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active_collectors.reset(token)
+
+
+def check_query_budget(stats: QueryStats, max_queries: int, allow_n_plus_one: bool = False, label: str = ""):
+    """クエリ数が上限以内でN+1がないことを確認し、違反時は QueryBudgetExceeded を送出"""
+    problems = []
+    if stats.count > max_queries:
+        problems.append(f"クエリ数 {stats.count} が上限 {max_queries} を超えています")
+    repeated = stats.n_plus_one()
+    if repeated and not allow_n_plus_one:
+        problems.append("N+1の疑い: " + "; ".join(
+            f"{count}回 {' '.join(statement.split())[:120]}" for statement, count in repeated.items()
+        ))
+    if problems:
+        raise QueryBudgetExceeded(f"{label}: " + " / ".join(problems) if label else " / ".join(problems))
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, allow_n_plus_one: bool = False, label: str = ""):
+    """
+    ブロック内のクエリ数が max_queries 以下であることを表明する
+
+        with assert_query_budget(5, label="GET /workouts"):
+            ...
+    """
+    with capture_queries() as stats:
+        yield stats
+    check_query_budget(stats, max_queries, allow_n_plus_one, label)
+
+
+async def query_metrics_middleware(request, call_next):
+    """
+    デバッグモードではリクエストごとにSQLを集計し、ヘッダーとログに出力する
+
+    デバッグモードでなければ集計器を登録しない（SQLごとのパラメータの記録などを本番で行わない）。
+    テストやベンチマークの capture_queries / assert_query_budget はこの設定にかかわらず集計する。
+    """
+    if not QUERY_DEBUG:
+        return await call_next(request)
+
+    with capture_queries() as stats:
+        response = await call_next(request)
+
+    repeated = stats.n_plus_one()
+    response.headers["X-Query-Count"] = str(stats.count)
+    response.headers["X-Query-Time-Ms"] = f"{stats.total_ms:.1f}"
+    response.headers["X-Query-N-Plus-One"] = str(len(repeated))
+    for statement, count in repeated.items():
+        logger.warning(
+            "N+1の疑い %s %s: %d回 %s",
+            request.method, request.url.path, count, " ".join(statement.split())[:200],
+        )
+    return response
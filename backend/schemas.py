@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Annotated, Any, Literal, Optional, Union
 from datetime import datetime, date
 
 # 認証関連スキーマ
@@ -91,6 +91,10 @@ class WorkoutResponse(BaseModel):
             datetime: lambda v: v.isoformat() if v else None
         }
 
+class WorkoutPageResponse(BaseModel):
+    items: list[WorkoutResponse]
+    next_cursor: Optional[str] = None  # 次（古い側）のページのカーソル（最後のページなら None）
+
 # セット関連スキーマ
 class SetCreate(BaseModel):
     # 筋力トレーニング用フィールド
@@ -147,6 +151,11 @@ class SetResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SetCreateResponse(SetResponse):
+    """セット追加の結果（自己ベストを更新した場合はその種類）"""
+    is_personal_record: bool = False
+    new_records: list[str] = []  # "e1rm", "5rm", "session_volume" など
+
 
 # ワークアウト種目関連スキーマ
 class WorkoutExerciseCreate(BaseModel):
@@ -200,6 +209,48 @@ class WorkoutDetailResponse(BaseModel):
 
 
 
+# ワークアウトの一括更新（POST /workouts/{id}/batch）
+# ref はクライアントが付ける一時的な名前で、同じバッチ内の後の操作から新しい種目・セットを参照できる
+class BatchAddExercise(WorkoutExerciseCreate):
+    op: Literal["add_exercise"]
+    ref: Optional[str] = None
+    order_index: Optional[int] = None  # 省略時は末尾
+
+class BatchAddSet(SetCreate):
+    op: Literal["add_set"]
+    ref: Optional[str] = None
+    workout_exercise_id: Optional[int] = None
+    workout_exercise_ref: Optional[str] = None
+
+class BatchUpdateSet(SetUpdate):
+    op: Literal["update_set"]
+    set_id: Optional[int] = None
+    set_ref: Optional[str] = None
+
+class BatchDeleteSet(BaseModel):
+    op: Literal["delete_set"]
+    set_id: Optional[int] = None
+    set_ref: Optional[str] = None
+
+class BatchReorder(BaseModel):
+    """ワークアウトの全種目を新しい順番で並べる（ワークアウト種目ID または ref）"""
+    op: Literal["reorder"]
+    workout_exercises: list[Union[int, str]]
+
+BatchOperation = Annotated[
+    Union[BatchAddExercise, BatchAddSet, BatchUpdateSet, BatchDeleteSet, BatchReorder],
+    Field(discriminator="op")
+]
+
+class WorkoutBatchRequest(BaseModel):
+    operations: list[BatchOperation]
+
+class WorkoutBatchResponse(BaseModel):
+    workout: WorkoutDetailResponse
+    refs: dict[str, int] = {}  # ref → 作成した種目・セットのID
+    new_records: dict[int, list[str]] = {}  # 自己ベストを更新したセットのID → 記録の種類
+
+
 # 身体データ関連スキーマ
 class BodyMetricCreate(BaseModel):
     date: datetime
@@ -219,10 +270,19 @@ class BodyMetricResponse(BaseModel):
     body_weight: Optional[float]
     body_fat_percent: Optional[float]
     note: Optional[str]
+    # 指数平滑化したトレンドと1週間あたりの変化量
+    trend_weight: Optional[float] = None
+    weight_trend_per_week: Optional[float] = None
+    trend_body_fat: Optional[float] = None
+    body_fat_trend_per_week: Optional[float] = None
     
     class Config:
         from_attributes = True
 
+class BodyMetricPageResponse(BaseModel):
+    items: list[BodyMetricResponse]
+    next_cursor: Optional[str] = None
+
 # 身長データ用スキーマ
 class HeightRecordCreate(BaseModel):
     height_cm: float
@@ -239,6 +299,10 @@ class HeightRecordResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class HeightRecordPageResponse(BaseModel):
+    items: list[HeightRecordResponse]
+    next_cursor: Optional[str] = None
+
 # BMI・体脂肪率分析用スキーマ
 class BodyAnalysisResponse(BaseModel):
     date: datetime
@@ -248,6 +312,8 @@ class BodyAnalysisResponse(BaseModel):
     body_fat_percent: Optional[float]
     estimated_body_fat: Optional[float]  # 推定体脂肪率
     note: Optional[str]
+    trend_weight: Optional[float] = None      # 指数平滑化した体重
+    trend_body_fat: Optional[float] = None    # 指数平滑化した体脂肪率
 
 class BodyAnalyticsSummaryResponse(BaseModel):
     latest_weight: Optional[float]
@@ -255,7 +321,11 @@ class BodyAnalyticsSummaryResponse(BaseModel):
     latest_bmi: Optional[float]
     weight_change_30days: Optional[float]
     bmi_change_30days: Optional[float]
-    body_fat_trend: str  # "improving", "stable", "concerning"
+    body_fat_trend: str  # "improving", "stable", "concerning"（体脂肪率のトレンド値の30日間の変化で判定）
+    trend_weight: Optional[float] = None
+    weight_trend_per_week: Optional[float] = None   # kg / 週
+    trend_body_fat: Optional[float] = None
+    body_fat_trend_per_week: Optional[float] = None  # ポイント / 週
     total_records: int
     history: list[BodyAnalysisResponse]
 
@@ -265,6 +335,7 @@ class UserProfileUpdate(BaseModel):
     username: Optional[str] = None
     birth_date: Optional[date] = None
     gender: Optional[str] = None  # "male", "female", "other"
+    timezone: Optional[str] = None  # IANAタイムゾーン名（例: "Asia/Tokyo"）
 
 class UserProfileResponse(BaseModel):
     id: int
@@ -272,6 +343,7 @@ class UserProfileResponse(BaseModel):
     username: Optional[str] = None
     birth_date: Optional[date]
     gender: Optional[str]
+    timezone: str
     age: Optional[int]  # 計算される年齢
     created_at: datetime
     
@@ -289,6 +361,8 @@ class AdvancedBodyAnalysisResponse(BaseModel):
     ideal_weight_range: Optional[dict]  # {"min": 60.0, "max": 70.0}
     bmr: Optional[float]  # 基礎代謝率
     note: Optional[str]
+    trend_weight: Optional[float] = None
+    trend_body_fat: Optional[float] = None
 
 class AdvancedBodyAnalyticsSummaryResponse(BaseModel):
     # 基本データ
@@ -303,6 +377,12 @@ class AdvancedBodyAnalyticsSummaryResponse(BaseModel):
     bmi_change_30days: Optional[float]
     body_fat_trend: str
     
+    # トレンド（指数平滑化）
+    trend_weight: Optional[float] = None
+    weight_trend_per_week: Optional[float] = None   # kg / 週
+    trend_body_fat: Optional[float] = None
+    body_fat_trend_per_week: Optional[float] = None  # ポイント / 週
+    
     # 高度な分析
     ideal_weight_range: Optional[dict]
     bmr: Optional[float]  # 基礎代謝率
@@ -330,4 +410,17 @@ class UserSettingsResponse(BaseModel):
     updated_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# 同期（差分取得）関連スキーマ
+class SyncTableChanges(BaseModel):
+    columns: list[str]  # rows の各行の列名（1回だけ）
+    rows: list[list[Any]] = []  # 作成・更新された行
+    deleted: list[int] = []  # 削除された行のID（墓石）
+
+class SyncResponse(BaseModel):
+    version: int  # 次の since に渡すバージョン
+    has_more: bool  # 続きがある（version を since にしてもう一度取得する）
+    reset: bool = False  # since が不正で最初から返した（ローカルの複製を破棄してから適用する）
+    domains: dict[str, int]  # 領域ごとのデータバージョン（集計を読み直すかの判断用）
+    tables: dict[str, SyncTableChanges]  # テーブル名 → 変更（変更のないテーブルは含まない）
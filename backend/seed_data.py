@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine
 from models import Exercise
+from comprehensive_seed_data import get_builtin_exercise_mets
 import sys
 
 def get_builtin_exercises():
@@ -59,6 +60,7 @@ def create_builtin_exercises():
                 muscle_group=exercise_data["muscle_group"],
                 exercise_type=exercise_data["exercise_type"],
                 is_builtin=True,
+                builtin_mets_value=get_builtin_exercise_mets(exercise_data["name"]),
                 user_id=None  # 内蔵種目はuser_idがNone
             )
             db.add(exercise)
@@ -92,6 +94,7 @@ def update_builtin_exercises():
                 # 既存種目の更新
                 existing.muscle_group = exercise_data["muscle_group"]
                 existing.exercise_type = exercise_data["exercise_type"]
+                existing.builtin_mets_value = get_builtin_exercise_mets(exercise_data["name"])
                 updated_count += 1
                 print(f"更新: {exercise_data['name']}")
             else:
@@ -101,6 +104,7 @@ def update_builtin_exercises():
                     muscle_group=exercise_data["muscle_group"],
                     exercise_type=exercise_data["exercise_type"],
                     is_builtin=True,
+                    builtin_mets_value=get_builtin_exercise_mets(exercise_data["name"]),
                     user_id=None
                 )
                 db.add(exercise)
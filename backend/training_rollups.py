@@ -0,0 +1,365 @@
+"""
+トレーニング集計（training_rollups）の差分更新・再構築・整合性チェック
+
+日・週（月曜始まり）・月の期間 × 部位 × 種目ごとに、ウォームアップを除くセット数・回数・
+ボリューム（筋力トレーニング）・推定1RMの最高値・時間（有酸素運動）を保持し、
+GET /analytics/timeseries はこの表だけを読む。
+セット追加・更新・削除、ワークアウト種目削除の各エンドポイントは同じトランザクション内でここの関数を呼ぶ。
+推定1RMの最高値を持つセットが消える場合だけ、その期間の最高値を履歴から求め直す。
+
+    cd backend
+    python training_rollups.py rebuild [--user-id ID]   # 履歴から再構築（バックフィル）
+    python training_rollups.py check [--user-id ID]     # 全件再計算と比較（不一致があれば終了コード1）
+"""
+
+import math
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, case, delete, false, func, insert, literal, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import max_of, run_read_model_cli
+import models
+import one_rep_max
+from personal_records import FORMULA
+
+GRANULARITIES = ("day", "week", "month")
+
+# ワークアウト日時から期間の開始日 'YYYY-MM-DD' を求めるSQL式
+BUCKET_STARTS = {
+    "day": lambda column: func.date(column),
+    "week": lambda column: func.date(column, 'weekday 0', '-6 days'),
+    "month": lambda column: func.date(column, 'start of month'),
+}
+
+
+def bucket_start(granularity: str, value) -> date:
+    """日時が属する期間の開始日"""
+    day = value.date() if isinstance(value, datetime) else value
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_keys(workout_date) -> list:
+    return [(granularity, bucket_start(granularity, workout_date)) for granularity in GRANULARITIES]
+
+
+def set_contribution(exercise_type: Optional[str], set_data) -> Optional[dict]:
+    """セット1件分の集計値（集計対象外なら None）"""
+    if set_data.is_warmup or exercise_type is None:
+        return None
+    strength = exercise_type == 'strength' and set_data.weight is not None and set_data.reps is not None
+    e1rm = None
+    if strength and set_data.weight > 0 and set_data.reps > 0:
+        e1rm = one_rep_max.estimated_1rm(FORMULA, set_data.weight, set_data.reps)
+    return {
+        "set_count": 1,
+        "total_reps": set_data.reps or 0,
+        "volume": set_data.weight * set_data.reps if strength else 0.0,
+        "top_e1rm": e1rm,
+        "duration_seconds": (set_data.duration_seconds or 0) if exercise_type == 'cardio' else 0,
+    }
+
+
+def add_contribution(total: Optional[dict], contribution: Optional[dict]) -> Optional[dict]:
+    """集計値を合計する（top_e1rm は大きい方、どちらかが None ならもう一方をそのまま返す）"""
+    if total is None or contribution is None:
+        return total if contribution is None else dict(contribution)
+    summed = {name: total[name] + contribution[name] for name in ("set_count", "total_reps", "volume", "duration_seconds")}
+    tops = [top for top in (total["top_e1rm"], contribution["top_e1rm"]) if top is not None]
+    summed["top_e1rm"] = max(tops) if tops else None
+    return summed
+
+
+async def apply_rollup_delta(
+    db: AsyncSession,
+    user_id: int,
+    workout_date,
+    muscle_group: str,
+    exercise_id: int,
+    set_count: int = 0,
+    total_reps: int = 0,
+    volume: float = 0.0,
+    duration_seconds: int = 0,
+    top_e1rm: Optional[float] = None,
+) -> list:
+    """
+    日・週・月の3行に差分を加算する（行がなければ作成、top_e1rm は大きい方を残す、コミットは呼び出し側）
+
+    更新後の (granularity, set_count, top_e1rm) のリストを返す。
+    """
+    statement = sqlite_insert(models.TrainingRollup).values([
+        {
+            "user_id": user_id,
+            "granularity": granularity,
+            "bucket_start": start,
+            "muscle_group": muscle_group,
+            "exercise_id": exercise_id,
+            "set_count": set_count,
+            "total_reps": total_reps,
+            "volume": volume,
+            "top_e1rm": top_e1rm,
+            "duration_seconds": duration_seconds,
+        }
+        for granularity, start in _bucket_keys(workout_date)
+    ])
+    current_top = models.TrainingRollup.top_e1rm
+    result = await db.execute(statement.on_conflict_do_update(
+        index_elements=[
+            models.TrainingRollup.user_id,
+            models.TrainingRollup.granularity,
+            models.TrainingRollup.bucket_start,
+            models.TrainingRollup.muscle_group,
+            models.TrainingRollup.exercise_id,
+        ],
+        set_={
+            "set_count": models.TrainingRollup.set_count + set_count,
+            "total_reps": models.TrainingRollup.total_reps + total_reps,
+            "volume": models.TrainingRollup.volume + volume,
+            "duration_seconds": models.TrainingRollup.duration_seconds + duration_seconds,
+            "top_e1rm": max_of(current_top, statement.excluded.top_e1rm),
+            "updated_at": func.now(),
+        },
+    ).returning(models.TrainingRollup.granularity, models.TrainingRollup.set_count, current_top))
+    return result.all()
+
+
+async def _remove_from_buckets(
+    db: AsyncSession,
+    user_id: int,
+    workout_date,
+    muscle_group: str,
+    exercise_id: int,
+    removed: dict,
+    excluded,
+    added: Optional[dict] = None,
+):
+    """
+    集計値を差し引き、最高値のセットが消える期間だけ excluded（除外条件）を付けて最高値を求め直す
+
+    added を渡すと同じ1回の加算で足し合わせる（加算後の最高値が消える値以下なら同様に求め直す）。
+    """
+    added = added or {"set_count": 0, "total_reps": 0, "volume": 0.0, "duration_seconds": 0, "top_e1rm": None}
+    updated = await apply_rollup_delta(
+        db, user_id, workout_date, muscle_group, exercise_id,
+        set_count=added["set_count"] - removed["set_count"],
+        total_reps=added["total_reps"] - removed["total_reps"],
+        volume=added["volume"] - removed["volume"],
+        duration_seconds=added["duration_seconds"] - removed["duration_seconds"],
+        top_e1rm=added["top_e1rm"],
+    )
+    keys = _bucket_keys(workout_date)
+    rows = models.TrainingRollup
+    in_buckets = and_(
+        rows.user_id == user_id,
+        rows.muscle_group == muscle_group,
+        rows.exercise_id == exercise_id,
+        tuple_(rows.granularity, rows.bucket_start).in_(keys),
+    )
+
+    removed_top = removed["top_e1rm"]
+    if removed_top is not None and any(
+        set_count > 0 and top is not None and top <= removed_top + 1e-9 for _, set_count, top in updated
+    ):
+        tops = await _top_e1rm_excluding(db, user_id, workout_date, exercise_id, excluded)
+        await db.execute(
+            update(rows)
+            .where(in_buckets)
+            .values(top_e1rm=case(
+                *((rows.granularity == granularity, literal(tops[granularity])) for granularity in GRANULARITIES),
+                else_=rows.top_e1rm,
+            ))
+        )
+
+    # セットがなくなった期間の行は削除する
+    if any(set_count <= 0 for _, set_count, _ in updated):
+        await db.execute(delete(rows).where(in_buckets, rows.set_count <= 0))
+
+
+async def _top_e1rm_excluding(db: AsyncSession, user_id: int, workout_date, exercise_id: int, excluded) -> dict:
+    """ワークアウト日時を含む日・週・月それぞれの推定1RMの最高値（excluded に当たるセットを除く）"""
+    keys = dict(_bucket_keys(workout_date))
+    month_end = (keys["month"] + timedelta(days=32)).replace(day=1)
+    range_start = min(keys["week"], keys["month"])
+    range_end = max(keys["week"] + timedelta(days=7), month_end)
+
+    e1rm = one_rep_max.estimated_1rm_sql(FORMULA, models.Set.weight, models.Set.reps)
+    row = (await db.execute(
+        select(*(
+            func.max(e1rm).filter(BUCKET_STARTS[granularity](models.Workout.date) == keys[granularity].isoformat())
+            for granularity in GRANULARITIES
+        ))
+        .select_from(models.Set)
+        .join(models.WorkoutExercise)
+        .join(models.Workout)
+        .join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .where(
+            models.Workout.user_id == user_id,
+            models.WorkoutExercise.exercise_id == exercise_id,
+            models.Workout.date >= range_start,
+            models.Workout.date < range_end,
+            models.Exercise.exercise_type == 'strength',
+            models.Set.is_warmup == False,
+            models.Set.weight > 0,
+            models.Set.reps > 0,
+            ~excluded
+        )
+    )).one()
+    return dict(zip(GRANULARITIES, row))
+
+
+async def record_set_added(db: AsyncSession, user_id: int, workout_date, exercise_id: int, muscle_group: str,
+                           exercise_type: Optional[str], set_data):
+    contribution = set_contribution(exercise_type, set_data)
+    if contribution is not None:
+        await apply_rollup_delta(db, user_id, workout_date, muscle_group, exercise_id, **contribution)
+
+
+async def record_set_removed(db: AsyncSession, user_id: int, workout_date, exercise_id: int, muscle_group: str,
+                             exercise_type: Optional[str], set_data, pending: Optional[dict] = None):
+    """
+    セットの削除前に呼ぶ
+
+    pending はまだ加算していない同じ種目の集計値（一括更新で合計している分）で、差し引きと同じ1回で加算する。
+    """
+    contribution = set_contribution(exercise_type, set_data)
+    if contribution is not None:
+        await _remove_from_buckets(db, user_id, workout_date, muscle_group, exercise_id, contribution,
+                                   excluded=models.Set.id == set_data.id, added=pending)
+    elif pending is not None:
+        await apply_rollup_delta(db, user_id, workout_date, muscle_group, exercise_id, **pending)
+
+
+async def record_set_updated(db: AsyncSession, user_id: int, workout_date, exercise_id: int, muscle_group: str,
+                             exercise_type: Optional[str], old_set, set_data, pending: Optional[dict] = None):
+    """
+    セットの更新後（変更を flush した後）に呼び、変更前の値を差し引いて変更後の値を1回の加算で反映する
+
+    old_set は変更前の値。最高値を求め直す場合は更新後のセットも含める。pending は record_set_removed と同じ。
+    """
+    removed = set_contribution(exercise_type, old_set)
+    added = add_contribution(pending, set_contribution(exercise_type, set_data))
+    if removed is not None:
+        await _remove_from_buckets(db, user_id, workout_date, muscle_group, exercise_id, removed,
+                                   excluded=false(), added=added)
+    elif added is not None:
+        await apply_rollup_delta(db, user_id, workout_date, muscle_group, exercise_id, **added)
+
+
+async def record_workout_exercise_removed(db: AsyncSession, user_id: int, workout_exercise_id: int):
+    """ワークアウト種目の削除前に呼び、対象セットの合計を差し引く"""
+    strength = models.Exercise.exercise_type == 'strength'
+    e1rm = one_rep_max.estimated_1rm_sql(FORMULA, models.Set.weight, models.Set.reps)
+    row = (await db.execute(
+        select(
+            models.Workout.date,
+            models.Exercise.id,
+            models.Exercise.muscle_group,
+            func.count(models.Set.id),
+            func.coalesce(func.sum(models.Set.reps), 0),
+            func.coalesce(func.sum(case((strength, models.Set.weight * models.Set.reps))), 0),
+            func.max(case((and_(strength, models.Set.weight > 0, models.Set.reps > 0), e1rm))),
+            func.coalesce(func.sum(case((models.Exercise.exercise_type == 'cardio', models.Set.duration_seconds))), 0),
+        )
+        .select_from(models.Set)
+        .join(models.WorkoutExercise)
+        .join(models.Workout)
+        .join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .where(models.Set.workout_exercise_id == workout_exercise_id, models.Set.is_warmup == False)
+        .group_by(models.Workout.date, models.Exercise.id, models.Exercise.muscle_group)
+    )).first()
+    if row:
+        workout_date, exercise_id, muscle_group, set_count, total_reps, volume, top_e1rm, duration_seconds = row
+        removed = {
+            "set_count": set_count,
+            "total_reps": total_reps,
+            "volume": volume,
+            "top_e1rm": top_e1rm,
+            "duration_seconds": duration_seconds,
+        }
+        await _remove_from_buckets(db, user_id, workout_date, muscle_group, exercise_id, removed,
+                                   excluded=models.Set.workout_exercise_id == workout_exercise_id)
+
+
+def _rollup_source(user_id: int, granularity: str):
+    """履歴から1つの粒度の集計行を求めるクエリ（再構築・整合性チェック用）"""
+    strength = models.Exercise.exercise_type == 'strength'
+    start = BUCKET_STARTS[granularity](models.Workout.date)
+    e1rm = one_rep_max.estimated_1rm_sql(FORMULA, models.Set.weight, models.Set.reps)
+    return (
+        select(
+            models.Workout.user_id,
+            literal(granularity).label("granularity"),
+            start.label("bucket_start"),
+            models.Exercise.muscle_group,
+            models.Exercise.id.label("exercise_id"),
+            func.count(models.Set.id).label("set_count"),
+            func.coalesce(func.sum(models.Set.reps), 0).label("total_reps"),
+            func.coalesce(func.sum(case((strength, models.Set.weight * models.Set.reps))), 0).label("volume"),
+            func.max(case((and_(strength, models.Set.weight > 0, models.Set.reps > 0), e1rm))).label("top_e1rm"),
+            func.coalesce(
+                func.sum(case((models.Exercise.exercise_type == 'cardio', models.Set.duration_seconds))), 0
+            ).label("duration_seconds"),
+        )
+        .select_from(models.Set)
+        .join(models.WorkoutExercise)
+        .join(models.Workout)
+        .join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .where(models.Workout.user_id == user_id, models.Set.is_warmup == False)
+        .group_by(models.Workout.user_id, start, models.Exercise.muscle_group, models.Exercise.id)
+    )
+
+
+async def rebuild_rollups(db: AsyncSession, user_id: int):
+    """ユーザーの集計を履歴から作り直す（コミットは呼び出し側）"""
+    await db.execute(delete(models.TrainingRollup).where(models.TrainingRollup.user_id == user_id))
+    columns = ["user_id", "granularity", "bucket_start", "muscle_group", "exercise_id",
+               "set_count", "total_reps", "volume", "top_e1rm", "duration_seconds"]
+    for granularity in GRANULARITIES:
+        await db.execute(insert(models.TrainingRollup).from_select(columns, _rollup_source(user_id, granularity)))
+
+
+async def check_rollups(db: AsyncSession, user_id: int) -> list:
+    """保存されている集計と全件再計算を比較し、不一致の説明のリストを返す"""
+    expected = {}
+    for granularity in GRANULARITIES:
+        for row in (await db.execute(_rollup_source(user_id, granularity))).all():
+            key = (granularity, date.fromisoformat(row.bucket_start), row.muscle_group, row.exercise_id)
+            expected[key] = row
+    stored = {
+        (row.granularity, row.bucket_start, row.muscle_group, row.exercise_id): row
+        for row in (await db.scalars(
+            select(models.TrainingRollup).where(models.TrainingRollup.user_id == user_id)
+        )).all()
+    }
+
+    problems = []
+    for key in sorted(set(expected) | set(stored)):
+        if key not in stored:
+            problems.append(f"{key}: 集計行がありません")
+            continue
+        if key not in expected:
+            problems.append(f"{key}: 対象セットのない集計行が残っています")
+            continue
+        for name in ("set_count", "total_reps", "volume", "top_e1rm", "duration_seconds"):
+            expected_value, stored_value = getattr(expected[key], name), getattr(stored[key], name)
+            if isinstance(expected_value, float) or isinstance(stored_value, float):
+                if expected_value is not None and stored_value is not None and \
+                        math.isclose(expected_value, stored_value, rel_tol=1e-9, abs_tol=1e-6):
+                    continue
+            if expected_value != stored_value:
+                problems.append(f"{key} {name}: 期待値 {expected_value} / 保存値 {stored_value}")
+    return problems
+
+
+def main():
+    run_read_model_cli(__doc__, rebuild=rebuild_rollups, check=check_rollups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+トレーニングボリュームの内訳（種目・バリエーション別と部位別）
+
+対象セット（筋力トレーニングの本番セット）を種目ID・バリエーションで GROUP BY する1クエリで集計し、
+部位別の合計は種目別の集計行から求める。1回のワークアウトにも期間（複数ワークアウト）にも使う。
+"""
+
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from personal_records import VARIANT_FIELDS, parse_variant_key, variant_key_from_values
+
+
+async def volume_breakdown(
+    db: AsyncSession,
+    user_id: int,
+    workout_id: Optional[int] = None,
+    date_from=None,
+    date_to=None,
+) -> dict:
+    """
+    ボリュームの内訳を返す
+
+    workout_id を指定するとそのワークアウト、date_from（以上）/ date_to（未満）で期間内のワークアウトを対象にする。
+    種目別の行は最初に行った順（期間ならワークアウト日時、同じワークアウト内は種目の順番）で並ぶ。
+    """
+    variant_columns = [getattr(models.ExerciseVariant, name) for name in VARIANT_FIELDS]
+    query = (
+        select(
+            models.Exercise.id,
+            models.Exercise.name,
+            models.Exercise.muscle_group,
+            *variant_columns,
+            func.count(models.Set.id).label("sets"),
+            func.sum(models.Set.reps).label("total_reps"),
+            func.sum(models.Set.weight * models.Set.reps).label("total_volume"),
+            func.sum(models.Set.weight).label("total_weight"),
+            func.max(models.Set.weight).label("top_weight"),
+        )
+        .select_from(models.Set)
+        .join(models.WorkoutExercise)
+        .join(models.Workout)
+        .join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .outerjoin(models.ExerciseVariant, models.ExerciseVariant.workout_exercise_id == models.WorkoutExercise.id)
+        .where(
+            models.Workout.user_id == user_id,
+            models.Set.is_warmup == False,  # ウォームアップは除く
+            models.Exercise.exercise_type == 'strength',  # 筋力トレーニングのみ
+            models.Set.weight.isnot(None),
+            models.Set.reps.isnot(None),
+            models.Set.weight != 0,
+            models.Set.reps != 0
+        )
+        .group_by(models.Exercise.id, *variant_columns)
+        .order_by(func.min(models.Workout.date), func.min(models.WorkoutExercise.order_index), models.Exercise.id)
+    )
+    if workout_id is not None:
+        query = query.where(models.Workout.id == workout_id)
+    if date_from is not None:
+        query = query.where(models.Workout.date >= date_from)
+    if date_to is not None:
+        query = query.where(models.Workout.date < date_to)
+
+    exercises = []
+    muscle_groups = {}
+    for row in (await db.execute(query)).all():
+        exercise_id, name, muscle_group, *variant = row[:3 + len(VARIANT_FIELDS)]
+        key = variant_key_from_values(variant)
+        exercises.append({
+            "exercise_id": exercise_id,
+            "exercise_name": name,
+            "muscle_group": muscle_group,
+            "variant_key": key,
+            "variant": parse_variant_key(key),
+            "sets": row.sets,
+            "total_reps": row.total_reps,
+            "total_volume": round(row.total_volume, 1),
+            "avg_weight": round(row.total_weight / row.sets, 1),
+            "top_weight": row.top_weight,
+        })
+
+        group = muscle_groups.setdefault(muscle_group, {
+            "muscle_group": muscle_group, "sets": 0, "total_reps": 0, "total_volume": 0.0,
+            "total_weight": 0.0, "top_weight": None,
+        })
+        group["sets"] += row.sets
+        group["total_reps"] += row.total_reps
+        group["total_volume"] += row.total_volume
+        group["total_weight"] += row.total_weight
+        group["top_weight"] = row.top_weight if group["top_weight"] is None else max(group["top_weight"], row.top_weight)
+
+    muscle_group_breakdown = [
+        {
+            "muscle_group": group["muscle_group"],
+            "sets": group["sets"],
+            "total_reps": group["total_reps"],
+            "total_volume": round(group["total_volume"], 1),
+            "avg_weight": round(group["total_weight"] / group["sets"], 1),
+            "top_weight": group["top_weight"],
+        }
+        for group in sorted(muscle_groups.values(), key=lambda g: g["total_volume"], reverse=True)
+    ]
+
+    return {
+        "total_volume": round(sum(group["total_volume"] for group in muscle_groups.values()), 1),
+        "total_sets": sum(group["sets"] for group in muscle_groups.values()),
+        "total_reps": sum(group["total_reps"] for group in muscle_groups.values()),
+        "exercise_breakdown": exercises,
+        "muscle_group_breakdown": muscle_group_breakdown,
+    }
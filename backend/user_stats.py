@@ -0,0 +1,248 @@
+"""
+ユーザー統計（user_stats / user_weekly_stats）の差分更新・再構築・整合性チェック
+
+ダッシュボードは履歴を集計せず、この読み取りモデルを主キーで参照する。
+セット追加・削除、ワークアウト種目削除、ワークアウト完了の各エンドポイントは
+同じトランザクション内でここの関数を呼び、差分を加算する。週の統計はワークアウトのローカル日付
+（workouts.local_date、ユーザーのタイムゾーンでの日付）の週に集計する。
+
+    cd backend
+    python user_stats.py rebuild [--user-id ID]   # 履歴から再構築（バックフィル）
+    python user_stats.py check [--user-id ID]     # 全件再計算と比較（不一致があれば終了コード1）
+"""
+
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import local_time
+from database import max_of, run_read_model_cli
+import models
+
+# 浮動小数点の加減算による誤差の許容値（整合性チェック用）
+VOLUME_TOLERANCE = 1e-6
+
+
+def counts_toward_stats(exercise_type: str, set_data) -> bool:
+    """統計の対象となるセット（筋力トレーニングの本番セット）か"""
+    return exercise_type == 'strength' and not set_data.is_warmup
+
+
+def set_volume(set_data) -> float:
+    """セットのボリューム（重量・回数が未入力なら0）"""
+    if set_data.weight is None or set_data.reps is None:
+        return 0.0
+    return set_data.weight * set_data.reps
+
+
+async def apply_stats_delta(
+    db: AsyncSession,
+    user_id: int,
+    local_date: date,
+    workouts: int = 0,
+    sets: int = 0,
+    volume: float = 0.0,
+    latest: Optional[datetime] = None,
+):
+    """
+    累計とワークアウトのローカル日付（local_date）の週の統計に差分を加算する（行がなければ作成、コミットは呼び出し側）
+
+    latest は完了したワークアウトの日時（最新のワークアウト日時の更新用）。
+    """
+
+    stats = sqlite_insert(models.UserStats).values(
+        user_id=user_id,
+        total_completed_workouts=workouts,
+        total_sets=sets,
+        total_volume=volume,
+        latest_workout_date=latest,
+    )
+    current_latest = models.UserStats.latest_workout_date
+    await db.execute(stats.on_conflict_do_update(
+        index_elements=[models.UserStats.user_id],
+        set_={
+            "total_completed_workouts": models.UserStats.total_completed_workouts + workouts,
+            "total_sets": models.UserStats.total_sets + sets,
+            "total_volume": models.UserStats.total_volume + volume,
+            "latest_workout_date": max_of(current_latest, stats.excluded.latest_workout_date),
+            "updated_at": func.now(),
+        },
+    ))
+
+    weekly = sqlite_insert(models.UserWeeklyStats).values(
+        user_id=user_id,
+        week_start=local_time.week_start(local_date),
+        workout_count=workouts,
+        set_count=sets,
+        volume=volume,
+    )
+    await db.execute(weekly.on_conflict_do_update(
+        index_elements=[models.UserWeeklyStats.user_id, models.UserWeeklyStats.week_start],
+        set_={
+            "workout_count": models.UserWeeklyStats.workout_count + workouts,
+            "set_count": models.UserWeeklyStats.set_count + sets,
+            "volume": models.UserWeeklyStats.volume + volume,
+        },
+    ))
+
+
+async def record_set_added(db: AsyncSession, user_id: int, local_date: date, exercise_type: str, set_data):
+    if counts_toward_stats(exercise_type, set_data):
+        await apply_stats_delta(db, user_id, local_date, sets=1, volume=set_volume(set_data))
+
+
+async def record_set_removed(db: AsyncSession, user_id: int, local_date: date, exercise_type: str, set_data):
+    if counts_toward_stats(exercise_type, set_data):
+        await apply_stats_delta(db, user_id, local_date, sets=-1, volume=-set_volume(set_data))
+
+
+async def record_workout_exercise_removed(db: AsyncSession, user_id: int, workout_exercise_id: int):
+    """ワークアウト種目の削除前に呼び、対象セットの合計を差し引く"""
+    row = (await db.execute(
+        select(
+            models.Workout.local_date,
+            func.count(models.Set.id),
+            func.coalesce(func.sum(models.Set.weight * models.Set.reps), 0),
+        )
+        .select_from(models.Set)
+        .join(models.WorkoutExercise)
+        .join(models.Workout)
+        .join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .where(
+            models.Set.workout_exercise_id == workout_exercise_id,
+            models.Set.is_warmup == False,
+            models.Exercise.exercise_type == 'strength'
+        )
+        .group_by(models.Workout.local_date)
+    )).first()
+    if row:
+        local_date, set_count, volume = row
+        await apply_stats_delta(db, user_id, local_date, sets=-set_count, volume=-volume)
+
+
+async def record_workout_completed(db: AsyncSession, user_id: int, workout_date: datetime, local_date: date):
+    await apply_stats_delta(db, user_id, local_date, workouts=1, latest=workout_date)
+
+
+async def get_dashboard_stats(db: AsyncSession, user_id: int, week_start: date):
+    """累計統計と指定週の統計を1クエリで取得し (UserStats | None, UserWeeklyStats | None) を返す"""
+    row = (await db.execute(
+        select(models.UserStats, models.UserWeeklyStats)
+        .outerjoin(models.UserWeeklyStats, and_(
+            models.UserWeeklyStats.user_id == models.UserStats.user_id,
+            models.UserWeeklyStats.week_start == week_start
+        ))
+        .where(models.UserStats.user_id == user_id)
+    )).first()
+    return (row[0], row[1]) if row else (None, None)
+
+
+async def compute_user_stats(db: AsyncSession, user_id: int) -> dict:
+    """履歴から統計を全件再計算する（整合性チェック・再構築用）"""
+    week = func.date(models.Workout.local_date, 'weekday 0', '-6 days')
+    weeks = {}
+
+    def week_entry(week_key: str) -> dict:
+        return weeks.setdefault(date.fromisoformat(week_key), {"workout_count": 0, "set_count": 0, "volume": 0.0})
+
+    latest_workout_date = None
+    workout_rows = await db.execute(
+        select(week, func.count(models.Workout.id), func.max(models.Workout.date))
+        .where(models.Workout.user_id == user_id, models.Workout.is_completed == True)
+        .group_by(week)
+    )
+    for week_key, workout_count, latest in workout_rows:
+        week_entry(week_key)["workout_count"] = workout_count
+        if latest_workout_date is None or latest > latest_workout_date:
+            latest_workout_date = latest
+
+    set_rows = await db.execute(
+        select(week, func.count(models.Set.id), func.coalesce(func.sum(models.Set.weight * models.Set.reps), 0))
+        .select_from(models.Set)
+        .join(models.WorkoutExercise)
+        .join(models.Workout)
+        .join(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .where(
+            models.Workout.user_id == user_id,
+            models.Set.is_warmup == False,
+            models.Exercise.exercise_type == 'strength'
+        )
+        .group_by(week)
+    )
+    for week_key, set_count, volume in set_rows:
+        entry = week_entry(week_key)
+        entry["set_count"] = set_count
+        entry["volume"] = float(volume)
+
+    return {
+        "total_completed_workouts": sum(w["workout_count"] for w in weeks.values()),
+        "total_sets": sum(w["set_count"] for w in weeks.values()),
+        "total_volume": sum(w["volume"] for w in weeks.values()),
+        "latest_workout_date": latest_workout_date,
+        "weeks": weeks,
+    }
+
+
+async def rebuild_user_stats(db: AsyncSession, user_id: int):
+    """ユーザーの統計を履歴から作り直す（コミットは呼び出し側）"""
+    computed = await compute_user_stats(db, user_id)
+    await db.execute(delete(models.UserWeeklyStats).where(models.UserWeeklyStats.user_id == user_id))
+    await db.execute(delete(models.UserStats).where(models.UserStats.user_id == user_id))
+    db.add(models.UserStats(
+        user_id=user_id,
+        total_completed_workouts=computed["total_completed_workouts"],
+        total_sets=computed["total_sets"],
+        total_volume=computed["total_volume"],
+        latest_workout_date=computed["latest_workout_date"],
+    ))
+    db.add_all([
+        models.UserWeeklyStats(user_id=user_id, week_start=week_start, **values)
+        for week_start, values in computed["weeks"].items()
+    ])
+    await db.flush()
+
+
+async def check_user_stats(db: AsyncSession, user_id: int) -> list:
+    """保存されている統計と全件再計算を比較し、不一致の説明のリストを返す"""
+    computed = await compute_user_stats(db, user_id)
+    stored = await db.get(models.UserStats, user_id)
+    stored_weeks = {
+        row.week_start: row
+        for row in (await db.scalars(
+            select(models.UserWeeklyStats).where(models.UserWeeklyStats.user_id == user_id)
+        )).all()
+    }
+
+    problems = []
+
+    def compare(label, expected, actual):
+        if isinstance(expected, float) or isinstance(actual, float):
+            if abs((expected or 0) - (actual or 0)) > VOLUME_TOLERANCE * max(1.0, abs(expected or 0)):
+                problems.append(f"{label}: 期待値 {expected} / 保存値 {actual}")
+        elif expected != actual:
+            problems.append(f"{label}: 期待値 {expected} / 保存値 {actual}")
+
+    compare("total_completed_workouts", computed["total_completed_workouts"],
+            stored.total_completed_workouts if stored else 0)
+    compare("total_sets", computed["total_sets"], stored.total_sets if stored else 0)
+    compare("total_volume", computed["total_volume"], stored.total_volume if stored else 0.0)
+    compare("latest_workout_date", computed["latest_workout_date"], stored.latest_workout_date if stored else None)
+
+    for week_start in sorted(set(computed["weeks"]) | set(stored_weeks)):
+        expected = computed["weeks"].get(week_start, {"workout_count": 0, "set_count": 0, "volume": 0.0})
+        row = stored_weeks.get(week_start)
+        compare(f"{week_start} workout_count", expected["workout_count"], row.workout_count if row else 0)
+        compare(f"{week_start} set_count", expected["set_count"], row.set_count if row else 0)
+        compare(f"{week_start} volume", expected["volume"], row.volume if row else 0.0)
+    return problems
+
+
+def main():
+    run_read_model_cli(__doc__, rebuild=rebuild_user_stats, check=check_user_stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+ワークアウトの一括更新（POST /workouts/{id}/batch、PUT /sets/{id}）
+
+種目の追加・セットの追加 / 更新 / 削除・種目の並べ替えを、指定された順に1つのトランザクションで適用する。
+途中の操作が失敗した場合は全体をロールバックする（呼び出し側がコミットしない）。
+
+- 最初にデータバージョンを更新して書き込みロックを取り、以降の読み取り（セット番号の最大値など）と
+  書き込みを他のリクエストと直列化する。セット番号は種目ごとの MAX(set_index) + 1 から順に振る。
+- 追加したセットはまとめて1回の INSERT（RETURNING 付きの一括挿入）で挿入し、トレーニング集計（training_rollups）は
+  差分を種目ごとに合計して1回ずつ加算する。自己ベスト（personal_records）は追加順に比較する。
+- セットの更新・削除の前には、それまでの追加分を挿入してから各エンドポイントと同じ手順で差し引く。
+  その種目の未反映の集計の加算は、差し引きと同じ1回の加算にまとめる。
+- 統計（user_stats）は更新・削除の分も含めて差分を合計し、最後に1回だけ加算する。
+- 関係する種目の自己ベストは最初にまとめて読み込み、参照を保持して比較のたびに読み直さない。
+- 消費カロリー台帳（calorie_ledger）の更新と変更ログ（change_log）の記録は最後に1回だけ行う。
+"""
+
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Optional
+
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import calorie_ledger
+import change_log
+import data_versions
+import models
+import personal_records
+import schemas
+import training_rollups
+import user_stats
+
+# 1回のバッチで受け付ける操作の最大数
+BATCH_MAX_OPERATIONS = 500
+
+# 操作から書き込むセットの列
+SET_FIELDS = (
+    "weight", "reps", "rpe",
+    "duration_seconds", "distance_km", "incline_percent", "avg_heart_rate",
+    "is_warmup", "note",
+)
+VARIANT_FIELDS = ("selected_angle", "selected_grip", "selected_stance")
+
+
+class BatchError(Exception):
+    """
+    操作を適用できない（status_code と detail は HTTPException にそのまま渡す）
+
+    reason は操作の位置を付ける前の理由（単一の操作を適用するエンドポイント用）。
+    """
+
+    def __init__(self, status_code: int, detail: str, reason: Optional[str] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.reason = reason or detail
+
+
+def _session_volume(set_data) -> float:
+    """自己ベストのワークアウト種目ボリュームに数えるボリューム（本番セットで重量・回数の記録があるもの）"""
+    if set_data.is_warmup or not (set_data.weight or 0) > 0 or not (set_data.reps or 0) > 0:
+        return 0.0
+    return set_data.weight * set_data.reps
+
+
+@dataclass
+class _ExerciseState:
+    workout_exercise: models.WorkoutExercise
+    exercise_type: Optional[str]
+    muscle_group: Optional[str]
+    variant: Optional[models.ExerciseVariant]
+    next_set_index: int
+    volume: float
+    orphan: bool = False  # 種目が削除済み（ツリーには含まれない）
+
+
+class WorkoutBatch:
+    """1つのワークアウトへの一括更新（load → apply → finish の順に呼ぶ、コミットは呼び出し側）"""
+
+    def __init__(self, db: AsyncSession, user_id: int, workout: models.Workout):
+        self.db = db
+        self.user_id = user_id
+        self.workout = workout
+        self.refs = {}
+        self.new_records = {}
+        self._exercises = {}        # ワークアウト種目ID → _ExerciseState
+        self._exercise_refs = {}    # ref → ワークアウト種目ID
+        self._catalog = {}          # 追加する種目 ID → Exercise
+        self._sets = {}             # セットID → Set（更新・削除の対象）
+        self._set_refs = {}         # ref → Set
+        self._deleted_sets = set()
+        self._next_order_index = 0
+        self._pending = []          # 未挿入の追加セット (_ExerciseState, 列の値, ワークアウト種目のボリューム, ref)
+        self._pending_refs = set()
+        self._records = []          # 読み込んだ自己ベスト（identity map に残すための参照）
+        self._stats_sets = 0
+        self._stats_volume = 0.0
+        self._rollups = {}          # (種目ID, 部位) → 集計値の合計
+        self._version = None        # 変更ログのバージョン（data_versions.bump の戻り値）
+        self._upserted = {"workout_exercises": set(), "sets": set()}  # 変更ログに記録する行のID
+        self._new_variants = []     # 作成したバリエーション（ID は flush 後に決まる）
+
+    async def load(self, operations: list):
+        """書き込みロックを取り、ワークアウトの種目と操作が参照する種目・セットを読み込む"""
+        db = self.db
+        self._version = await data_versions.bump(db, self.user_id, "workouts")
+
+        working = (models.Set.is_warmup == False) & (models.Set.weight > 0) & (models.Set.reps > 0)
+        set_totals = (
+            select(
+                models.Set.workout_exercise_id,
+                func.max(models.Set.set_index).label("max_index"),
+                func.coalesce(func.sum(case((working, models.Set.weight * models.Set.reps))), 0).label("volume"),
+            )
+            .join(models.WorkoutExercise)
+            .where(models.WorkoutExercise.workout_id == self.workout.id)
+            .group_by(models.Set.workout_exercise_id)
+            .subquery()
+        )
+        rows = await db.execute(
+            select(models.WorkoutExercise, models.Exercise.id, models.Exercise.exercise_type,
+                   models.Exercise.muscle_group, models.ExerciseVariant,
+                   set_totals.c.max_index, set_totals.c.volume)
+            .outerjoin(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+            .outerjoin(models.ExerciseVariant, models.ExerciseVariant.workout_exercise_id == models.WorkoutExercise.id)
+            .outerjoin(set_totals, set_totals.c.workout_exercise_id == models.WorkoutExercise.id)
+            .where(models.WorkoutExercise.workout_id == self.workout.id)
+        )
+        for workout_exercise, exercise_id, exercise_type, muscle_group, variant, max_index, volume in rows:
+            self._exercises[workout_exercise.id] = _ExerciseState(
+                workout_exercise, exercise_type, muscle_group, variant,
+                next_set_index=(max_index or 0) + 1, volume=volume or 0.0, orphan=exercise_id is None,
+            )
+            self._next_order_index = max(self._next_order_index, workout_exercise.order_index + 1)
+
+        set_ids = {op.set_id for op in operations if getattr(op, "set_id", None) is not None}
+        if set_ids:
+            sets = await db.scalars(
+                select(models.Set).join(models.WorkoutExercise)
+                .where(models.Set.id.in_(set_ids), models.WorkoutExercise.workout_id == self.workout.id)
+            )
+            self._sets.update((set_data.id, set_data) for set_data in sets)
+
+        exercise_ids = {op.exercise_id for op in operations if op.op == "add_exercise"}
+        if exercise_ids:
+            exercises = await db.scalars(select(models.Exercise).where(models.Exercise.id.in_(exercise_ids)))
+            self._catalog.update((exercise.id, exercise) for exercise in exercises)
+
+        self._records = await personal_records.load_records(db, self.user_id, {
+            *(state.workout_exercise.exercise_id for state in self._exercises.values() if not state.orphan),
+            *self._catalog,
+        })
+
+    async def apply(self, operations: list):
+        """操作を順に適用する（失敗した操作の位置を detail に含めて BatchError を送出）"""
+        handlers = {
+            "add_exercise": self._add_exercise,
+            "add_set": self._add_set,
+            "update_set": self._update_set,
+            "delete_set": self._delete_set,
+            "reorder": self._reorder,
+        }
+        for index, op in enumerate(operations):
+            try:
+                await handlers[op.op](op)
+            except BatchError as e:
+                raise BatchError(e.status_code, f"operations[{index}] ({op.op}): {e.detail}", e.reason) from e
+
+    async def finish(self):
+        """残りの追加分・統計・消費カロリーを反映し、ref と作成したIDの対応を作る"""
+        await self._flush_pending()
+        await self._apply_rollups()
+        if self._stats_sets or self._stats_volume:
+            await user_stats.apply_stats_delta(
+                self.db, self.user_id, self.workout.local_date, sets=self._stats_sets, volume=self._stats_volume
+            )
+        await calorie_ledger.refresh_if_completed(
+            self.db, self.user_id, self.workout.id, self.workout.date, self.workout.is_completed
+        )
+        # 作成したバリエーションは _flush_pending の flush で ID が決まっている
+        await change_log.record(self.db, self.user_id, self._version, upserted={
+            **self._upserted,
+            "exercise_variants": [variant.id for variant in self._new_variants],
+        }, deleted={"sets": self._deleted_sets})
+        self.refs = {
+            **self._exercise_refs,
+            **{ref: set_data.id for ref, set_data in self._set_refs.items() if set_data.id not in self._deleted_sets},
+        }
+
+    def _register_ref(self, ref: Optional[str]):
+        if ref is not None and (ref in self._exercise_refs or ref in self._set_refs or ref in self._pending_refs):
+            raise BatchError(400, f"ref '{ref}' が重複しています")
+
+    def _resolve_exercise(self, workout_exercise_id: Optional[int], ref: Optional[str]) -> _ExerciseState:
+        if ref is not None:
+            workout_exercise_id = self._exercise_refs.get(ref)
+        state = self._exercises.get(workout_exercise_id)
+        if state is None:
+            raise BatchError(404, "ワークアウト種目が見つかりません")
+        return state
+
+    def _resolve_set(self, set_id: Optional[int], ref: Optional[str]) -> models.Set:
+        set_data = self._set_refs.get(ref) if ref is not None else self._sets.get(set_id)
+        if set_data is None or set_data.id in self._deleted_sets:
+            raise BatchError(404, "セットが見つかりません")
+        return set_data
+
+    async def _add_exercise(self, op: schemas.BatchAddExercise):
+        self._register_ref(op.ref)
+        exercise = self._catalog.get(op.exercise_id)
+        if exercise is None:
+            raise BatchError(404, "種目が見つかりません")
+        if not exercise.is_builtin and exercise.user_id != self.user_id:
+            raise BatchError(403, "この種目にはアクセスできません")
+
+        order_index = op.order_index if op.order_index is not None else self._next_order_index
+        self._next_order_index = max(self._next_order_index, order_index + 1)
+        workout_exercise = models.WorkoutExercise(
+            workout_id=self.workout.id, exercise_id=exercise.id, order_index=order_index
+        )
+        self.db.add(workout_exercise)
+        await self.db.flush()
+
+        variant = None
+        if any(getattr(op, name) for name in VARIANT_FIELDS):
+            variant = models.ExerciseVariant(
+                workout_exercise_id=workout_exercise.id, **{name: getattr(op, name) for name in VARIANT_FIELDS}
+            )
+            self.db.add(variant)
+            self._new_variants.append(variant)
+        self._upserted["workout_exercises"].add(workout_exercise.id)
+        self._exercises[workout_exercise.id] = _ExerciseState(
+            workout_exercise, exercise.exercise_type, exercise.muscle_group, variant, next_set_index=1, volume=0.0
+        )
+        if op.ref is not None:
+            self._exercise_refs[op.ref] = workout_exercise.id
+
+    async def _add_set(self, op: schemas.BatchAddSet):
+        self._register_ref(op.ref)
+        if (op.workout_exercise_id is None) == (op.workout_exercise_ref is None):
+            raise BatchError(400, "workout_exercise_id か workout_exercise_ref のどちらか一方を指定してください")
+        # このワークアウトの種目で、種目が削除されていないものだけに追加する（一括挿入の前に確認）
+        state = self._resolve_exercise(op.workout_exercise_id, op.workout_exercise_ref)
+        if state.orphan or state.workout_exercise.workout_id != self.workout.id:
+            raise BatchError(404, "ワークアウト種目が見つかりません")
+        values = {
+            "workout_exercise_id": state.workout_exercise.id,
+            "set_index": state.next_set_index,
+            **{name: getattr(op, name) for name in SET_FIELDS},
+        }
+        set_data = SimpleNamespace(**values)
+        state.next_set_index += 1
+        state.volume += _session_volume(set_data)
+        self._pending.append((state, values, state.volume, op.ref))
+        if op.ref is not None:
+            self._pending_refs.add(op.ref)
+
+        self._add_stats(state, set_data, 1)
+        self._add_rollup(state, set_data)
+
+    def _add_stats(self, state: _ExerciseState, set_data, sign: int):
+        """統計の差分を合計する（finish でまとめて加算）"""
+        if user_stats.counts_toward_stats(state.exercise_type, set_data):
+            self._stats_sets += sign
+            self._stats_volume += sign * user_stats.set_volume(set_data)
+
+    def _add_rollup(self, state: _ExerciseState, set_data):
+        """トレーニング集計への加算を種目ごとに合計する（_apply_rollups でまとめて加算）"""
+        key = (state.workout_exercise.exercise_id, state.muscle_group)
+        total = training_rollups.add_contribution(
+            self._rollups.get(key), training_rollups.set_contribution(state.exercise_type, set_data)
+        )
+        if total is not None:
+            self._rollups[key] = total
+
+    async def _update_set(self, op: schemas.BatchUpdateSet):
+        # ref で追加したばかりのセットを指せるよう、先に追加分を挿入する
+        await self._flush_pending()
+        set_data = self._resolve_set(op.set_id, op.set_ref)
+        # 未入力（None）の項目は変更しない
+        changes = {name: getattr(op, name) for name in SET_FIELDS if getattr(op, name) is not None}
+        if not changes:
+            return
+        state = self._exercises[set_data.workout_exercise_id]
+        exercise_id = state.workout_exercise.exercise_id
+        date = self.workout.date
+        old = SimpleNamespace(
+            id=set_data.id, workout_exercise_id=set_data.workout_exercise_id,
+            **{name: getattr(set_data, name) for name in SET_FIELDS},
+        )
+        for name, value in changes.items():
+            setattr(set_data, name, value)
+        self._add_stats(state, old, -1)
+        self._add_stats(state, set_data, 1)
+        state.volume += _session_volume(set_data) - _session_volume(old)
+        self._upserted["sets"].add(set_data.id)
+        await self.db.flush()
+
+        # 変更前の値の差し引きと変更後の値の加算を、この種目の未反映の加算とあわせて1回で反映する
+        # （集計の行がまだない場合や、最高値を求め直す場合があるため）
+        await training_rollups.record_set_updated(
+            self.db, self.user_id, date, exercise_id, state.muscle_group, state.exercise_type, old, set_data,
+            pending=self._rollups.pop((exercise_id, state.muscle_group), None),
+        )
+
+        new_records = await personal_records.record_set_updated(
+            self.db, self.user_id, exercise_id, state.variant, state.exercise_type, old, set_data, date, state.volume
+        )
+        if new_records:
+            self.new_records[set_data.id] = new_records
+        else:
+            self.new_records.pop(set_data.id, None)
+
+    async def _delete_set(self, op: schemas.BatchDeleteSet):
+        await self._flush_pending()
+        set_data = self._resolve_set(op.set_id, op.set_ref)
+        state = self._exercises[set_data.workout_exercise_id]
+        exercise_id = state.workout_exercise.exercise_id
+        date = self.workout.date
+        self._add_stats(state, set_data, -1)
+        await training_rollups.record_set_removed(
+            self.db, self.user_id, date, exercise_id, state.muscle_group, state.exercise_type, set_data,
+            pending=self._rollups.pop((exercise_id, state.muscle_group), None),
+        )
+        await self.db.delete(set_data)
+        await personal_records.record_set_removed(
+            self.db, self.user_id, exercise_id, state.variant, state.exercise_type, set_data
+        )
+        state.volume -= _session_volume(set_data)
+        self._deleted_sets.add(set_data.id)
+        self.new_records.pop(set_data.id, None)
+
+    async def _reorder(self, op: schemas.BatchReorder):
+        ids = [
+            self._resolve_exercise(None, item).workout_exercise.id if isinstance(item, str)
+            else self._resolve_exercise(item, None).workout_exercise.id
+            for item in op.workout_exercises
+        ]
+        visible = {workout_exercise_id for workout_exercise_id, state in self._exercises.items() if not state.orphan}
+        if len(ids) != len(set(ids)) or set(ids) != visible:
+            raise BatchError(400, "ワークアウトの全種目を1回ずつ指定してください")
+        for order_index, workout_exercise_id in enumerate(ids):
+            self._exercises[workout_exercise_id].workout_exercise.order_index = order_index
+        self._upserted["workout_exercises"].update(ids)
+        self._next_order_index = max(self._next_order_index, len(ids))
+
+    async def _apply_rollups(self):
+        """合計したトレーニング集計の差分を加算する"""
+        for (exercise_id, muscle_group), total in self._rollups.items():
+            await training_rollups.apply_rollup_delta(
+                self.db, self.user_id, self.workout.date, muscle_group, exercise_id, **total
+            )
+        self._rollups = {}
+
+    async def _flush_pending(self):
+        """追加したセットをまとめて挿入し、自己ベストと比較する"""
+        date = self.workout.date
+        pending, self._pending = self._pending, []
+        self._pending_refs.clear()
+        await self.db.flush()
+        if not pending:
+            return
+        # SQLite では RETURNING の順序を指定すると1行ずつの INSERT になるため、(ワークアウト種目, セット番号) で対応づける
+        returned = (await self.db.scalars(
+            insert(models.Set).returning(models.Set), [values for _, values, _, _ in pending]
+        )).all()
+        by_index = {(set_data.workout_exercise_id, set_data.set_index): set_data for set_data in returned}
+        inserted = [by_index[values["workout_exercise_id"], values["set_index"]] for _, values, _, _ in pending]
+        for (_, _, _, ref), set_data in zip(pending, inserted):
+            self._sets[set_data.id] = set_data
+            self._upserted["sets"].add(set_data.id)
+            if ref is not None:
+                self._set_refs[ref] = set_data
+        self.new_records.update(await personal_records.record_sets_added(self.db, self.user_id, [
+            (state.workout_exercise.exercise_id, state.variant, state.exercise_type, set_data, date, volume)
+            for (state, _, volume, _), set_data in zip(pending, inserted)
+        ]))
+        # 新しく作った自己ベストの行を保存し、後の操作の db.get から見えるようにする
+        self._records += [obj for obj in self.db.new if isinstance(obj, models.PersonalRecord)]
+        await self.db.flush()
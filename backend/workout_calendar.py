@@ -0,0 +1,113 @@
+"""
+カレンダー表示用の日ごとのワークアウト集計（月表示と年間ヒートマップ）
+
+workouts.local_date（ワークアウトの日付、インデックスあり）で GROUP BY する1クエリで、日ごとの
+ワークアウトID・完了したワークアウトID・本番セット数・ボリューム・部位を求める。記録のない日は返さない。
+連続日数（その日で終わる、完了したワークアウトのある日の連続）のため、期間の STREAK_LOOKBACK_DAYS 日前から読む。
+それより前から続く連続は _streak_ending で空きの日までさかのぼって数える（履歴全体は読まない）。
+"""
+
+from datetime import date, timedelta
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+STREAK_LOOKBACK_DAYS = 31
+
+async def _streak_ending(db: AsyncSession, user_id: int, day: date) -> int:
+    """
+    day で終わる、完了したワークアウトのある日の連続日数
+
+    day からさかのぼって STREAK_LOOKBACK_DAYS 日ずつ（毎回2倍に広げて）読み、最初の空きの日で止める。
+    読む日数は連続日数に比例し、それより前の履歴は読まない。
+    """
+    streak, span = 0, STREAK_LOOKBACK_DAYS
+    while True:
+        until = day - timedelta(days=streak)
+        span = min(span, (until - date.min).days + 1)
+        since = until - timedelta(days=span - 1)
+        days = set((await db.scalars(
+            select(models.Workout.local_date)
+            .where(
+                models.Workout.user_id == user_id,
+                models.Workout.is_completed == True,
+                models.Workout.local_date >= since,
+                models.Workout.local_date <= until
+            )
+            .distinct()
+        )).all())
+        for offset in range(span):
+            if until - timedelta(days=offset) not in days:
+                return streak + offset
+        streak += span
+        if since == date.min:
+            return streak
+        span *= 2
+
+
+def _ids(value) -> list:
+    return sorted(int(item) for item in value.split(",")) if value else []
+
+
+async def calendar_days(db: AsyncSession, user_id: int, start: date, end: date) -> list:
+    """start〜end（両端を含む）の日ごとの集計（日付の古い順）"""
+    lookback_start = max(start, date.min + timedelta(days=STREAK_LOOKBACK_DAYS + 1)) - timedelta(days=STREAK_LOOKBACK_DAYS)
+    working = (models.Set.is_warmup == False) & (models.Set.id.isnot(None))
+    volume = case(
+        (working & (models.Exercise.exercise_type == 'strength'), models.Set.weight * models.Set.reps),
+        else_=0
+    )
+    rows = (await db.execute(
+        select(
+            models.Workout.local_date,
+            func.group_concat(models.Workout.id.distinct()).label("workout_ids"),
+            func.group_concat(case((models.Workout.is_completed == True, models.Workout.id)).distinct())
+            .label("completed_ids"),
+            func.count(case((working, models.Set.id))).label("set_count"),
+            func.coalesce(func.sum(volume), 0).label("volume"),
+            func.group_concat(models.Exercise.muscle_group.distinct()).label("muscle_groups"),
+        )
+        .select_from(models.Workout)
+        .outerjoin(models.WorkoutExercise, models.WorkoutExercise.workout_id == models.Workout.id)
+        .outerjoin(models.Exercise, models.WorkoutExercise.exercise_id == models.Exercise.id)
+        .outerjoin(models.Set, models.Set.workout_exercise_id == models.WorkoutExercise.id)
+        .where(
+            models.Workout.user_id == user_id,
+            models.Workout.local_date >= lookback_start,
+            models.Workout.local_date <= end
+        )
+        .group_by(models.Workout.local_date)
+        .order_by(models.Workout.local_date)
+    )).all()
+
+    days = []
+    # from_boundary: 現在の連続が読み込んだ範囲の初日から始まっている（それより前から続いている可能性がある）
+    streak, previous, from_boundary = 0, None, False
+    for row in rows:
+        completed_ids = _ids(row.completed_ids)
+        if completed_ids:
+            if previous is not None and row.local_date - previous == timedelta(days=1):
+                streak += 1
+            else:
+                streak = 1
+                from_boundary = row.local_date == lookback_start < start
+            previous = row.local_date
+        if row.local_date < start:
+            continue
+        if completed_ids and from_boundary:
+            # 期間の初日まで続いている連続だけ、読み込んだ範囲より前の分を足す
+            streak += await _streak_ending(db, user_id, lookback_start - timedelta(days=1))
+            from_boundary = False
+        days.append({
+            "date": row.local_date,
+            "workout_ids": _ids(row.workout_ids),
+            "completed_workout_ids": completed_ids,
+            "completed": bool(completed_ids),
+            "set_count": row.set_count,
+            "volume": round(row.volume, 1),
+            "muscle_groups": sorted(row.muscle_groups.split(",")) if row.muscle_groups else [],
+            "streak": streak if completed_ids else 0,
+        })
+    return days
@@ -0,0 +1,47 @@
+"""
+ワークアウトのツリー（種目・種目のバリエーション・セット）の読み込み
+
+joinedload で2つのコレクション（種目とセット）を同じクエリで結合すると行数が種目数×セット数に増え、
+LIMIT 付きではサブクエリで包む必要もある。ここでは件数によらず次の3クエリで読み込む。
+
+  1. ワークアウト（呼び出し側の絞り込み・並び順・LIMIT をそのまま使う）
+  2. ワークアウト種目（selectin、種目とバリエーションは多対一・一対一なので同じクエリで結合）
+  3. セット（selectin）
+
+種目が存在しない（削除済みの種目を参照する）ワークアウト種目は、種目との内部結合で SQL 側で除外する。
+種目は order_index、セットは set_index の順（models のリレーションの order_by）。
+selectin の IN 句は500件ずつに分かれるため、ワークアウト種目が500件を超えるとセットのクエリが増える。
+"""
+
+from typing import Optional
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+import models
+
+
+def tree_options() -> tuple:
+    """ワークアウトのツリーを読み込むローダーオプション"""
+    workout_exercises = selectinload(models.Workout.workout_exercises)
+    return (
+        # 内部結合で種目のないワークアウト種目を読み込まない
+        workout_exercises.joinedload(models.WorkoutExercise.exercise, innerjoin=True),
+        workout_exercises.joinedload(models.WorkoutExercise.exercise_variant),
+        workout_exercises.selectinload(models.WorkoutExercise.sets),
+    )
+
+
+async def load_workout_trees(db: AsyncSession, query: Select) -> list:
+    """select(models.Workout) のクエリの結果をツリーごと読み込む（クエリの並び順のまま）"""
+    return list((await db.scalars(query.options(*tree_options()))).all())
+
+
+async def load_workout_tree(db: AsyncSession, user_id: int, workout_id: int) -> Optional[models.Workout]:
+    """ユーザーのワークアウト1件をツリーごと読み込む（なければ None）"""
+    workouts = await load_workout_trees(db, select(models.Workout).where(
+        models.Workout.id == workout_id,
+        models.Workout.user_id == user_id
+    ))
+    return workouts[0] if workouts else None
@@ -2,25 +2,29 @@ import { useMemo, useState } from 'react';
 import { WorkoutDetailModal } from './WorkoutDetailModal';
 import { Button } from '../ui/button';
 import { ChevronLeft, ChevronRight } from 'lucide-react';
-import type { Workout as WorkoutType } from '../../types/workout';
+import type { WorkoutCalendarDay } from '../../types/workout';
 
 interface CalendarDay {
   date: Date;
   isCurrentMonth: boolean;
   hasWorkout: boolean;
-  workouts: WorkoutType[];
+  summary?: WorkoutCalendarDay;
 }
 
 interface WorkoutCalendarProps {
-  workouts: WorkoutType[];
+  days: WorkoutCalendarDay[];  // 表示月の日ごとの集計（GET /workouts/calendar）
   onWorkoutClick: (workoutId: number) => void;
   selectedMonth?: Date;
   onMonthChange?: (date: Date) => void;
 }
 
-export function WorkoutCalendar({ workouts, onWorkoutClick, selectedMonth, onMonthChange }: WorkoutCalendarProps) {
+// ローカル日付の YYYY-MM-DD
+const toDateKey = (date: Date) =>
+  `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}-${String(date.getDate()).padStart(2, '0')}`;
+
+export function WorkoutCalendar({ days, onWorkoutClick, selectedMonth, onMonthChange }: WorkoutCalendarProps) {
   const [selectedDate, setSelectedDate] = useState<string>('');
-  const [selectedWorkouts, setSelectedWorkouts] = useState<WorkoutType[]>([]);
+  const [selectedWorkoutIds, setSelectedWorkoutIds] = useState<number[]>([]);
   const [isModalOpen, setIsModalOpen] = useState(false);
   
   // 表示する月を管理（親コンポーネントから指定されるか、現在月をデフォルト）
@@ -46,106 +50,51 @@ export function WorkoutCalendar({ workouts, onWorkoutClick, selectedMonth, onMon
   };
 
   const calendarDays = useMemo(() => {
+    // 日付 → 集計（完了したワークアウトのある日のみ表示する）
+    const summaries = new Map(days.filter(day => day.completed).map(day => [day.date, day]));
     const firstDayOfMonth = new Date(currentYear, currentMonth, 1);
     const lastDayOfMonth = new Date(currentYear, currentMonth + 1, 0);
     const firstDayOfWeek = firstDayOfMonth.getDay();
     const daysInMonth = lastDayOfMonth.getDate();
 
-    const days: CalendarDay[] = [];
+    const result: CalendarDay[] = [];
 
     // 前月の日付を追加（カレンダーの空白を埋める）
     for (let i = firstDayOfWeek - 1; i >= 0; i--) {
-      const date = new Date(currentYear, currentMonth, -i);
-      const targetDateString = date.toISOString().split('T')[0];
-      
-      const dayWorkouts = workouts.filter(workout => {
-        if (!workout.date) return false;
-        const workoutDateString = new Date(workout.date).toISOString().split('T')[0];
-        return workoutDateString === targetDateString;
-      });
-      
-      days.push({
-        date,
+      result.push({
+        date: new Date(currentYear, currentMonth, -i),
         isCurrentMonth: false,
-        hasWorkout: dayWorkouts.length > 0,
-        workouts: dayWorkouts,
+        hasWorkout: false,
       });
     }
 
     // 当月の日付を追加
     for (let day = 1; day <= daysInMonth; day++) {
       const date = new Date(currentYear, currentMonth, day);
-      const targetDateString = date.toISOString().split('T')[0];
-      
-      const dayWorkouts = workouts.filter(workout => {
-        if (!workout.date) return false;
-        
-        const workoutDateString = new Date(workout.date).toISOString().split('T')[0];
-        return workoutDateString === targetDateString;
-      });
-
-      days.push({
+      const summary = summaries.get(toDateKey(date));
+      result.push({
         date,
         isCurrentMonth: true,
-        hasWorkout: dayWorkouts.length > 0,
-        workouts: dayWorkouts,
+        hasWorkout: summary !== undefined,
+        summary,
       });
     }
 
     // 次月の日付を追加（完全な週を作るために必要な分のみ）
-    const totalCells = days.length;
+    const totalCells = result.length;
     const weeksNeeded = Math.ceil(totalCells / 7);
-    const targetCells = weeksNeeded * 7;
-    const remainingDays = targetCells - totalCells;
+    const remainingDays = weeksNeeded * 7 - totalCells;
     
     for (let day = 1; day <= remainingDays; day++) {
-      const date = new Date(currentYear, currentMonth + 1, day);
-      const targetDateString = date.toISOString().split('T')[0];
-      
-      const dayWorkouts = workouts.filter(workout => {
-        if (!workout.date) return false;
-        const workoutDateString = new Date(workout.date).toISOString().split('T')[0];
-        return workoutDateString === targetDateString;
-      });
-      
-      days.push({
-        date,
+      result.push({
+        date: new Date(currentYear, currentMonth + 1, day),
         isCurrentMonth: false,
-        hasWorkout: dayWorkouts.length > 0,
-        workouts: dayWorkouts,
+        hasWorkout: false,
       });
     }
 
-    return days;
-  }, [workouts, currentMonth, currentYear]);
-
-  // 連続日数を計算する関数
-  const getConsecutiveDays = (targetDate: Date) => {
-    if (!workouts.length) return 0;
-    
-    let consecutiveDays = 0;
-    let currentDate = new Date(targetDate);
-    
-    // 対象日からさかのぼって連続日数を計算
-    while (true) {
-      const currentDateString = currentDate.toISOString().split('T')[0];
-      const hasWorkoutOnDate = workouts.some(workout => {
-        if (!workout.date) return false;
-        const workoutDateString = new Date(workout.date).toISOString().split('T')[0];
-        return workoutDateString === currentDateString;
-      });
-      
-      if (!hasWorkoutOnDate) break;
-      
-      consecutiveDays++;
-      currentDate.setDate(currentDate.getDate() - 1);
-      
-      // 無限ループ防止（最大30日まで）
-      if (consecutiveDays > 30) break;
-    }
-    
-    return consecutiveDays;
-  };
+    return result;
+  }, [days, currentMonth, currentYear]);
 
   const handleDayClick = (day: CalendarDay) => {
     // 前月・次月の日付がクリックされた場合、その月に移動
@@ -158,9 +107,9 @@ export function WorkoutCalendar({ workouts, onWorkoutClick, selectedMonth, onMon
     if (!day.isCurrentMonth) return;
     
     // ワークアウトがある場合はモーダルを表示
-    if (day.hasWorkout && day.workouts.length > 0) {
-      setSelectedDate(day.date.toISOString().split('T')[0]);
-      setSelectedWorkouts(day.workouts);
+    if (day.summary) {
+      setSelectedDate(day.summary.date);
+      setSelectedWorkoutIds(day.summary.completed_workout_ids);
       setIsModalOpen(true);
     }
     // ワークアウトがない場合は何もしない（将来的に新しいワークアウト作成などに使用可能）
@@ -169,7 +118,7 @@ export function WorkoutCalendar({ workouts, onWorkoutClick, selectedMonth, onMon
   const handleCloseModal = () => {
     setIsModalOpen(false);
     setSelectedDate('');
-    setSelectedWorkouts([]);
+    setSelectedWorkoutIds([]);
   };
 
   const handleWorkoutSelect = (workoutId: number) => {
@@ -239,20 +188,15 @@ export function WorkoutCalendar({ workouts, onWorkoutClick, selectedMonth, onMon
         {/* カレンダーの日付 */}
         {calendarDays.map((day, index) => {
           const isToday = today.toDateString() === day.date.toDateString();
-          const consecutiveDays = day.hasWorkout ? getConsecutiveDays(day.date) : 0;
+          const consecutiveDays = day.summary?.streak ?? 0;
           
           // 連続日数に応じてスタイルを決定
           const getDayStyle = () => {
             let baseStyle = 'h-12 border border-gray-200 flex flex-col items-center justify-center text-xs transition-all relative ';
             
             if (!day.isCurrentMonth) {
-              if (day.hasWorkout) {
-                const clickableStyle = onMonthChange ? 'cursor-pointer hover:bg-green-200 ' : 'cursor-default ';
-                return baseStyle + 'bg-green-100 text-green-700 ' + clickableStyle;
-              } else {
-                const clickableStyle = onMonthChange ? 'cursor-pointer hover:bg-gray-100 ' : 'cursor-default ';
-                return baseStyle + 'bg-gray-50 text-gray-400 ' + clickableStyle;
-              }
+              const clickableStyle = onMonthChange ? 'cursor-pointer hover:bg-gray-100 ' : 'cursor-default ';
+              return baseStyle + 'bg-gray-50 text-gray-400 ' + clickableStyle;
             }
             
             if (day.hasWorkout) {
@@ -279,6 +223,7 @@ export function WorkoutCalendar({ workouts, onWorkoutClick, selectedMonth, onMon
               key={index}
               onClick={() => handleDayClick(day)}
               className={getDayStyle()}
+              title={day.summary ? `${day.summary.set_count}セット / ${day.summary.volume}kg / ${day.summary.muscle_groups.join('・')}` : undefined}
             >
               <span className="text-sm">
                 {day.date.getDate()}
@@ -312,7 +257,7 @@ export function WorkoutCalendar({ workouts, onWorkoutClick, selectedMonth, onMon
 
       {/* ワークアウト詳細モーダル */}
       <WorkoutDetailModal
-        workouts={selectedWorkouts}
+        workoutIds={selectedWorkoutIds}
         date={selectedDate}
         isOpen={isModalOpen}
         onClose={handleCloseModal}
@@ -8,7 +8,7 @@ import { calculateOptimalCalories } from '../../lib/calorieCalculations';
 import { useCurrentWeight } from '../../hooks/useCurrentWeight';
 
 interface WorkoutDetailModalProps {
-  workouts: Workout[];
+  workoutIds: number[];
   date: string;
   isOpen: boolean;
   onClose: () => void;
@@ -16,13 +16,12 @@ interface WorkoutDetailModalProps {
 }
 
 export function WorkoutDetailModal({ 
-  workouts, 
+  workoutIds, 
   date, 
   isOpen, 
   onClose, 
   onWorkoutSelect 
 }: WorkoutDetailModalProps) {
-  const workoutIds = workouts.map(w => w.id);
   const { data: detailedWorkouts, isLoading } = useWorkoutDetails(workoutIds);
   const currentWeight = useCurrentWeight();
 
@@ -8,7 +8,7 @@ export const useBodyMetrics = () => {
     queryKey: ['body-metrics'],
     queryFn: async () => {
       const response = await bodyMetricsAPI.getBodyMetrics();
-      return response.data;
+      return response.data.items;
     },
   });
 };
@@ -39,36 +39,17 @@ export function useDashboard() {
     staleTime: 1000 * 60 * 2,
   });
 
-  // 選択された月のワークアウトを取得（カレンダー表示用）
+  // 選択された月の日ごとの集計を取得（カレンダー表示用）
   const {
-    data: monthlyWorkouts,
+    data: monthlyCalendar,
     isLoading: isMonthlyLoading,
     error: monthlyError,
   } = useQuery({
-    queryKey: ['dashboard', 'monthly-workouts', selectedMonth.getFullYear(), selectedMonth.getMonth()],
+    queryKey: ['dashboard', 'monthly-calendar', selectedMonth.getFullYear(), selectedMonth.getMonth()],
     queryFn: async () => {
-      const year = selectedMonth.getFullYear();
-      const month = selectedMonth.getMonth();
-      
-      // カレンダー表示のため、前月末と次月初も含める範囲を設定
-      const firstDayOfMonth = new Date(year, month, 1);
-      const firstDayOfWeek = firstDayOfMonth.getDay();
-      
-      // カレンダーの開始日（前月の日付含む）
-      const startDate = new Date(year, month, 1 - firstDayOfWeek);
-      
-      // カレンダーの終了日（次月の日付含む）
-      const lastDayOfMonth = new Date(year, month + 1, 0);
-      const daysInMonth = lastDayOfMonth.getDate();
-      const totalDaysFromStart = firstDayOfWeek + daysInMonth;
-      const weeksNeeded = Math.ceil(totalDaysFromStart / 7);
-      const endDate = new Date(year, month, daysInMonth + (weeksNeeded * 7 - totalDaysFromStart));
-      
-      const startDateString = startDate.toISOString().split('T')[0];
-      const endDateString = endDate.toISOString().split('T')[0];
-      
-      const response = await workoutAPI.getWorkouts(startDateString, endDateString, true);
-      return response.data.filter(workout => workout.is_completed);
+      const month = `${selectedMonth.getFullYear()}-${String(selectedMonth.getMonth() + 1).padStart(2, '0')}`;
+      const response = await workoutAPI.getMonthCalendar(month);
+      return response.data;
     },
     staleTime: 1000 * 60 * 2,
   });
@@ -77,7 +58,7 @@ export function useDashboard() {
     stats,
     calorieGoal,
     recentWorkouts,
-    monthlyWorkouts,
+    monthlyCalendar,
     selectedMonth,
     setSelectedMonth,
     isLoading: isStatsLoading || isWorkoutsLoading || isMonthlyLoading || isCalorieGoalLoading,
@@ -1,6 +1,6 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import type { HeightRecord, HeightRecordCreateRequest } from '../types/profile';
-import { api } from '../lib/api';
+import { heightRecordsAPI } from '../lib/api';
 
 interface UseHeightRecordsOptions {
   onSuccess?: () => void;
@@ -17,15 +17,15 @@ export const useHeightRecords = (options?: UseHeightRecordsOptions) => {
   } = useQuery({
     queryKey: ['height-records'],
     queryFn: async (): Promise<HeightRecord[]> => {
-      const response = await api.get('/height-records');
-      return response.data;
+      const response = await heightRecordsAPI.getHeightRecords();
+      return response.data.items;
     }
   });
 
   // 身長記録の作成
   const createHeightRecord = useMutation({
     mutationFn: async (data: HeightRecordCreateRequest): Promise<HeightRecord> => {
-      const response = await api.post('/height-records', data);
+      const response = await heightRecordsAPI.createHeightRecord(data);
       return response.data;
     },
     onSuccess: () => {
@@ -15,7 +15,7 @@ export function useWorkout(workoutDate?: string) {
     queryFn: async () => {
       // 未完了のワークアウトのみ取得
       const workouts = await workoutAPI.getWorkouts(targetDate, targetDate, false);
-      const dateWorkout = workouts.data[0];
+      const dateWorkout = workouts.data.items[0];
       
       if (dateWorkout) {
         // 詳細情報を取得
@@ -1,6 +1,6 @@
 import axios from 'axios';
 import type { User, AuthResponse } from '../types/auth';
-import type { Workout, DashboardStats, Exercise, DashboardConfig } from '../types/workout';
+import type { Workout, DashboardStats, Exercise, DashboardConfig, WorkoutCalendar, WorkoutBatchOperation, WorkoutBatchResponse } from '../types/workout';
 import type { 
   UserProfile, 
   ProfileUpdateRequest, 
@@ -11,6 +11,18 @@ import type {
   AdvancedAnalytics 
 } from '../types/profile';
 
+// 一覧APIのページ（(日時, ID) の新しい順。古いページは next_cursor を cursor に渡して取得）
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
+export interface PageParams {
+  limit?: number;
+  cursor?: string;
+  unbounded?: boolean;  // true なら条件に合う全件
+}
+
 export const api = axios.create({
   baseURL: 'http://localhost:8000',
   headers: {
@@ -83,17 +95,26 @@ export const dashboardAPI = {
 
 // ワークアウトAPI関数
 export const workoutAPI = {
-  getWorkouts: (from?: string, to?: string, includeCompleted: boolean = true) =>
-    api.get<Workout[]>('/workouts', { 
+  getWorkouts: (from?: string, to?: string, includeCompleted: boolean = true, page?: PageParams) =>
+    api.get<Page<Workout>>('/workouts', { 
       params: { 
         from_date: from, 
         to_date: to, 
-        include_completed: includeCompleted 
+        include_completed: includeCompleted,
+        ...page
       } 
     }),
   
   createWorkout: (date: string, note?: string) =>
     api.post<Workout>('/workouts', { date, note }),
+  
+  // 月（YYYY-MM）の日ごとの集計
+  getMonthCalendar: (month: string) =>
+    api.get<WorkoutCalendar>('/workouts/calendar', { params: { month } }),
+  
+  // 年間ヒートマップ用の日ごとの集計
+  getYearCalendar: (year: number) =>
+    api.get<WorkoutCalendar>('/workouts/calendar', { params: { year } }),
 };
 
 // 種目API関数
@@ -145,6 +166,10 @@ export const workoutDetailAPI = {
   deleteWorkoutExercise: (workoutExerciseId: number) =>
     api.delete(`/workout-exercises/${workoutExerciseId}`),
   
+  // 複数の操作を1つのトランザクションで適用し、更新後のワークアウトを返す（途中で失敗すると全体を取り消す）
+  applyBatch: (workoutId: number, operations: WorkoutBatchOperation[]) =>
+    api.post<WorkoutBatchResponse>(`/workouts/${workoutId}/batch`, { operations }),
+  
   completeWorkout: (workoutId: number) =>
     api.patch<{ message: string; workout_id: number }>(`/workouts/${workoutId}/complete`),
 };
@@ -160,8 +185,8 @@ export const profileAPI = {
 
 // 体重管理API
 export const bodyMetricsAPI = {
-  getBodyMetrics: () =>
-    api.get<BodyMetric[]>('/body-metrics'),
+  getBodyMetrics: (page?: PageParams) =>
+    api.get<Page<BodyMetric>>('/body-metrics', { params: page }),
   
   createBodyMetric: (data: BodyMetricCreateRequest) =>
     api.post<BodyMetric>('/body-metrics', data),
@@ -172,8 +197,8 @@ export const bodyMetricsAPI = {
 
 // 身長管理API
 export const heightRecordsAPI = {
-  getHeightRecords: () =>
-    api.get<HeightRecord[]>('/height-records'),
+  getHeightRecords: (page?: PageParams) =>
+    api.get<Page<HeightRecord>>('/height-records', { params: page }),
   
   createHeightRecord: (data: HeightRecordCreateRequest) =>
     api.post<HeightRecord>('/height-records', data),
@@ -200,4 +225,24 @@ export const userSettingsAPI = {
   
   updateDashboardConfig: (config: DashboardConfig) =>
     api.put<UserSettings>('/settings/dashboard', config),
+};
+
+// 同期API（since より後の変更だけを取得してローカルの複製に適用する）
+export interface SyncTableChanges {
+  columns: string[];        // rows の各行の列名
+  rows: unknown[][];        // 作成・更新された行
+  deleted: number[];        // 削除された行のID
+}
+
+export interface SyncResponse {
+  version: number;          // 次の since に渡す
+  has_more: boolean;        // true なら version を since にして続きを取得する
+  reset: boolean;           // true ならローカルの複製を破棄してから適用する
+  domains: Record<'workouts' | 'body' | 'settings', number>;  // 変わった領域の集計（統計・分析）だけ読み直す
+  tables: Record<string, SyncTableChanges>;
+}
+
+export const syncAPI = {
+  getChanges: (since: number = 0, limit?: number) =>
+    api.get<SyncResponse>('/sync', { params: { since, limit } }),
 };
\ No newline at end of file
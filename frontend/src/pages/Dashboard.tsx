@@ -24,7 +24,7 @@ export default function Dashboard() {
   const [viewMode, setViewMode] = useViewMode('dashboard-workout-view', 'list');
   const [isSettingsOpen, setIsSettingsOpen] = useState(false);
   
-  const { stats, recentWorkouts, monthlyWorkouts, selectedMonth, setSelectedMonth, isLoading, error } = useDashboard();
+  const { stats, recentWorkouts, monthlyCalendar, selectedMonth, setSelectedMonth, isLoading, error } = useDashboard();
 
   if (isLoading) {
     return (
@@ -133,7 +133,7 @@ export default function Dashboard() {
           <Card>
             <CardContent className="p-6">
               <WorkoutCalendar 
-                workouts={monthlyWorkouts || []} 
+                days={monthlyCalendar?.days || []} 
                 onWorkoutClick={(workoutId) => navigate(`/workout-history/${workoutId}`)}
                 selectedMonth={selectedMonth}
                 onMonthChange={setSelectedMonth}
@@ -4,6 +4,7 @@ export interface UserProfile {
   username: string | null;
   birth_date: string | null;
   gender: 'male' | 'female' | 'other' | null;
+  timezone: string;
   age: number | null;
   created_at: string;
 }
@@ -12,6 +13,7 @@ export interface ProfileUpdateRequest {
   username?: string | null;
   birth_date?: string | null;
   gender?: 'male' | 'female' | 'other' | null;
+  timezone?: string;
 }
 
 export interface BodyMetric {
@@ -21,6 +23,10 @@ export interface BodyMetric {
   body_weight: number | null;
   body_fat_percent: number | null;
   note: string | null;
+  trend_weight?: number | null;
+  weight_trend_per_week?: number | null;
+  trend_body_fat?: number | null;
+  body_fat_trend_per_week?: number | null;
 }
 
 export interface BodyMetricCreateRequest {
@@ -53,6 +59,10 @@ export interface AdvancedAnalytics {
   weight_change_30days: number | null;
   bmi_change_30days: number | null;
   body_fat_trend: string;
+  trend_weight?: number | null;
+  weight_trend_per_week?: number | null;
+  trend_body_fat?: number | null;
+  body_fat_trend_per_week?: number | null;
   ideal_weight_range: {
     min: number;
     max: number;
@@ -120,6 +120,22 @@ export interface CreateSetRequest {
   note?: string;
 }
 
+// ワークアウトの一括更新（POST /workouts/{id}/batch）の操作
+// ref は同じバッチ内で作成した種目・セットを後の操作から指すための任意の名前
+export type WorkoutBatchOperation =
+  | { op: 'add_exercise'; ref?: string; exercise_id: number; order_index?: number;
+      selected_angle?: string; selected_grip?: string; selected_stance?: string }
+  | ({ op: 'add_set'; ref?: string; workout_exercise_id?: number; workout_exercise_ref?: string } & CreateSetRequest)
+  | ({ op: 'update_set'; set_id?: number; set_ref?: string } & CreateSetRequest)
+  | { op: 'delete_set'; set_id?: number; set_ref?: string }
+  | { op: 'reorder'; workout_exercises: (number | string)[] };  // 全種目を新しい順番で（ID または ref）
+
+export interface WorkoutBatchResponse {
+  workout: Workout;
+  refs: Record<string, number>;                // ref → 作成した種目・セットのID
+  new_records: Record<number, string[]>;       // 自己ベストを更新したセットのID → 記録の種類
+}
+
 export interface WorkoutFormData {
   date: string;
   note: string;
@@ -145,4 +161,26 @@ export interface SetFormData {
 export interface OneRepMax {
   weight: number;
   formula: string; // "Epley", "Brzycki", etc.
-}
\ No newline at end of file
+}
+// カレンダーの日ごとの集計（GET /workouts/calendar、ワークアウトのある日のみ）
+export interface WorkoutCalendarDay {
+  date: string;                     // YYYY-MM-DD
+  workout_ids: number[];
+  completed_workout_ids: number[];
+  completed: boolean;
+  set_count: number;                // 本番セット数
+  volume: number;                   // 筋力トレーニングのボリューム（kg）
+  muscle_groups: string[];
+  streak: number;                   // この日で終わる連続日数（完了したワークアウトのある日）
+}
+
+export interface WorkoutCalendar {
+  month: string | null;             // YYYY-MM（月表示）
+  year: number | null;              // 年間ヒートマップ
+  start_date: string;
+  end_date: string;
+  active_days: number;
+  total_sets: number;
+  total_volume: number;
+  days: WorkoutCalendarDay[];
+}